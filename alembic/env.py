@@ -8,7 +8,7 @@ from alembic import context
 # Импорт настроек и моделей
 from app.config import settings
 from app.database import Base
-from app.models import Log  # Импорт всех моделей
+from app.models import DealIndexEntry, Log, WebhookAudit  # Импорт всех моделей
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
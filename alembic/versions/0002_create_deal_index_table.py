@@ -0,0 +1,37 @@
+"""create deal_index table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 10:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "deal_index",
+        sa.Column("contact_id", sa.Integer(), nullable=False),
+        sa.Column("program_id", sa.Integer(), nullable=False),
+        sa.Column("deal_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("contact_id", "program_id"),
+    )
+    op.create_index("ix_deal_index_deal_id", "deal_index", ["deal_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_deal_index_deal_id", table_name="deal_index")
+    op.drop_table("deal_index")
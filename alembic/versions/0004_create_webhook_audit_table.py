@@ -0,0 +1,60 @@
+"""create webhook_audit table
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "webhook_audit",
+        sa.Column(
+            "id",
+            sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            autoincrement=True,
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("answer_id", sa.BigInteger(), nullable=False),
+        sa.Column("poll_id", sa.BigInteger(), nullable=False),
+        sa.Column("email_hash", sa.String(length=64), nullable=True),
+        sa.Column("source", sa.String(length=16), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("contact_id", sa.Integer(), nullable=True),
+        sa.Column("deals_count", sa.Integer(), nullable=False),
+        sa.Column("bitrix_calls", sa.Integer(), nullable=True),
+        sa.Column("duration_ms", sa.Integer(), nullable=True),
+        sa.Column("error", sa.String(length=500), nullable=True),
+        sa.Column(
+            "details", sa.JSON().with_variant(postgresql.JSONB(), "postgresql"), nullable=True
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_webhook_audit_created_at", "webhook_audit", ["created_at"])
+    op.create_index("ix_webhook_audit_answer_id", "webhook_audit", ["answer_id"])
+    op.create_index("ix_webhook_audit_poll_id", "webhook_audit", ["poll_id"])
+    op.create_index("ix_webhook_audit_email_hash", "webhook_audit", ["email_hash"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_webhook_audit_email_hash", table_name="webhook_audit")
+    op.drop_index("ix_webhook_audit_poll_id", table_name="webhook_audit")
+    op.drop_index("ix_webhook_audit_answer_id", table_name="webhook_audit")
+    op.drop_index("ix_webhook_audit_created_at", table_name="webhook_audit")
+    op.drop_table("webhook_audit")
@@ -0,0 +1,114 @@
+"""
+Контейнер ресурсов приложения
+
+Импорт модулей сервиса не запускает фоновых потоков и не открывает
+соединений: HTTP клиент Bitrix24 и справочники создаются при первом
+обращении. Фоновые задачи запускаются и останавливаются здесь в явном
+порядке через lifespan FastAPI (см. main.py).
+
+Запуск:
+1. Восстановление снимка кеша
+2. Проверка доступности Bitrix24 (health)
+3. Сверка индекса сделок
+4. Очистка журнала обработки ответов
+
+Остановка (в обратном порядке зависимостей):
+1. Фоновые задачи, порождающие запросы к Bitrix24
+2. Пул обработки сделок (дожидаемся начатых сделок)
+3. Буферы записи в БД (журнал, логи)
+4. Снимок кеша
+5. HTTP клиент Bitrix24 и пул соединений БД
+"""
+
+import logging
+from typing import Any, Callable, List, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Container:
+    """
+    Упорядоченный запуск и остановка ресурсов приложения
+    """
+
+    def __init__(self):
+        self.started = False
+
+    def startup(self):
+        """Запустить фоновые задачи"""
+        if self.started:
+            return
+
+        # Импорт внутри метода: контейнер можно импортировать без загрузки сервисов
+        from app.services.health import health_monitor
+        from app.services.integration_service import integration_service
+        from app.services.schema_validator import schema_registry
+        from app.services.webhook_audit import webhook_audit
+        from app.utils.cache import cache_manager
+
+        if settings.CACHE_SNAPSHOT_PATH:
+            try:
+                cache_manager.load_snapshot(settings.CACHE_SNAPSHOT_PATH)
+            except Exception as e:
+                logger.warning(f"Failed to load cache snapshot: {e}")
+
+        # План маппинга полей и схемы полей Bitrix24 компилируются до первого запроса
+        integration_service.mapping_plan
+        schema_registry.load()
+
+        # Фоновая проверка доступности Bitrix24 для health эндпоинтов
+        health_monitor.start()
+
+        # Периодическая сверка локального индекса сделок с Bitrix24
+        if settings.DEAL_INDEX_ENABLED and settings.DEAL_INDEX_RECONCILE_INTERVAL > 0:
+            integration_service.deal_index.start()
+
+        # Очистка журнала обработки ответов по сроку хранения
+        if settings.WEBHOOK_AUDIT_ENABLED:
+            webhook_audit.start()
+
+        self.started = True
+        logger.info("🚀 Application resources started")
+
+    def shutdown(self):
+        """Остановить фоновые задачи, дописать буферы и освободить ресурсы"""
+        from app.database import engine
+        from app.services.bitrix24_client import bitrix24_client
+        from app.services.buffered_writer import log_writer
+        from app.services.health import health_monitor
+        from app.services.integration_service import integration_service, shutdown_deal_executor
+        from app.services.webhook_audit import webhook_audit
+        from app.utils.cache import cache_manager
+
+        steps: List[Tuple[str, Callable[[], Any]]] = [
+            ("deal index reconciler", integration_service.deal_index.stop),
+            ("health prober", health_monitor.stop),
+            ("deal executor", shutdown_deal_executor),
+            ("webhook audit", webhook_audit.stop),
+            ("log writer", log_writer.stop),
+        ]
+        if settings.CACHE_SNAPSHOT_PATH:
+            steps.append(
+                (
+                    "cache snapshot",
+                    lambda: cache_manager.save_snapshot(settings.CACHE_SNAPSHOT_PATH),
+                )
+            )
+        steps.append(("bitrix24 client", bitrix24_client.close))
+        steps.append(("database engine", engine.dispose))
+
+        # Ошибка одного шага не должна мешать остальным
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                logger.error(f"❌ Shutdown step '{name}' failed: {e}")
+
+        self.started = False
+        logger.info("🛑 Application resources stopped")
+
+
+# Глобальный контейнер приложения
+container = Container()
@@ -1,7 +1,20 @@
-from sqlalchemy import create_engine
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.config import settings
+from app.utils.metrics import metrics
+
+# Асинхронные драйверы для синхронных URL из DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
 
 # Базовый класс для моделей
@@ -9,12 +22,111 @@ class Base(DeclarativeBase):
     pass
 
 
-# Создание синхронного движка
-engine = create_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+def utcnow() -> datetime:
+    """
+    Текущее время UTC для колонок DateTime
+
+    Колонки хранят UTC без часового пояса (asyncpg не принимает aware-значения
+    для timestamp without time zone), поэтому tzinfo отбрасывается.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Привести время из запроса к формату колонок DateTime (UTC без часового пояса)
+
+    Время со смещением переводится в UTC; время без смещения считается UTC.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def get_async_database_url() -> str:
+    """
+    URL для асинхронного движка
+
+    DATABASE_ASYNC_URL, если задан, иначе DATABASE_URL с заменой драйвера
+    (postgresql+psycopg2 -> postgresql+asyncpg, sqlite -> sqlite+aiosqlite)
+    """
+    if settings.DATABASE_ASYNC_URL:
+        return settings.DATABASE_ASYNC_URL
+
+    url = make_url(settings.DATABASE_URL)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return settings.DATABASE_URL
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    """Параметры пула соединений для движка"""
+    options: Dict[str, Any] = {"echo": settings.DEBUG, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    # SQLite использует собственные пулы без настройки размера
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return options
+
+
+def _instrument_pool(sync_engine, name: str):
+    """Счетчики выдачи/возврата соединений пула"""
+    checkouts = metrics.counter("db_pool_checkouts_total", "Connections checked out of the pool")
+    checkins = metrics.counter("db_pool_checkins_total", "Connections returned to the pool")
+    connects = metrics.counter("db_pool_connects_total", "New DB connections opened by the pool")
+
+    event.listen(sync_engine, "checkout", lambda *args: checkouts.inc(engine=name))
+    event.listen(sync_engine, "checkin", lambda *args: checkins.inc(engine=name))
+    event.listen(sync_engine, "connect", lambda *args: connects.inc(engine=name))
+
+
+def _pool_status():
+    """Текущее состояние пулов соединений (collector для /metrics)"""
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        # Размеры есть только у QueuePool (не у пулов SQLite)
+        if not isinstance(pool, QueuePool):
+            continue
+        yield ("db_pool_size", "gauge", "Configured pool size", {"engine": name}, pool.size())
+        yield (
+            "db_pool_checked_out",
+            "gauge",
+            "Connections currently in use",
+            {"engine": name},
+            pool.checkedout(),
+        )
+        yield (
+            "db_pool_overflow",
+            "gauge",
+            "Connections opened above pool size",
+            {"engine": name},
+            max(0, pool.overflow()),
+        )
+
+
+# Синхронный движок (миграции, фоновые задачи в потоках)
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
 
 # Фабрика сессий
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# Асинхронный движок для обработчиков API
+_async_url = get_async_database_url()
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url))
+
+# Фабрика асинхронных сессий
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+_instrument_pool(engine, "sync")
+_instrument_pool(async_engine.sync_engine, "async")
+metrics.register_collector(_pool_status)
+
 
 # Dependency для получения сессии БД
 def get_db():
@@ -25,6 +137,12 @@ def get_db():
         db.close()
 
 
+# Dependency для получения асинхронной сессии БД
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # Функция для создания таблиц
 def create_tables():
     Base.metadata.create_all(bind=engine)
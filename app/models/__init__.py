@@ -1,3 +1,5 @@
+from app.models.deal_index import DealIndexEntry
 from app.models.log import Log
+from app.models.webhook_audit import WebhookAudit
 
-__all__ = ["Log"]
+__all__ = ["Log", "DealIndexEntry", "WebhookAudit"]
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base, utcnow
+
+
+class DealIndexEntry(Base):
+    """Локальный индекс сделок: (контакт, образовательная программа) -> сделка"""
+
+    __tablename__ = "deal_index"
+
+    contact_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # 0 - сделка без образовательной программы
+    program_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    deal_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=utcnow, onupdate=utcnow, nullable=False
+    )
+
+    def __repr__(self):
+        return (
+            f"<DealIndexEntry(contact_id={self.contact_id}, program_id={self.program_id}, "
+            f"deal_id={self.deal_id})>"
+        )
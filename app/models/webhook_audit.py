@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import JSON, BigInteger, DateTime, Index, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base, utcnow
+
+# BIGINT в PostgreSQL, INTEGER в SQLite (автоинкремент работает только для INTEGER PRIMARY KEY)
+BigIntegerId = BigInteger().with_variant(Integer, "sqlite")
+
+
+class WebhookAudit(Base):
+    """
+    Журнал обработки ответов: одна компактная строка на ответ
+
+    Фиксированные колонки - для поиска и агрегаций, переменная часть
+    (сделки, длительности этапов, вызовы API) - в details (JSONB в PostgreSQL).
+    """
+
+    __tablename__ = "webhook_audit"
+    __table_args__ = (Index("ix_webhook_audit_created_at", "created_at"),)
+
+    id: Mapped[int] = mapped_column(BigIntegerId, primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
+    answer_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    poll_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    # sha256 нормализованного email: поиск по email без хранения персональных данных
+    email_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    # answer - одиночный ответ, bulk - ответ из пакетной загрузки
+    source: Mapped[str] = mapped_column(String(16), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)
+    contact_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    deals_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    bitrix_calls: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    duration_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    details: Mapped[Optional[Dict[str, Any]]] = mapped_column(
+        JSON().with_variant(JSONB, "postgresql"), nullable=True
+    )
+
+    def __repr__(self):
+        return (
+            f"<WebhookAudit(id={self.id}, answer_id={self.answer_id}, "
+            f"status={self.status}, contact_id={self.contact_id})>"
+        )
@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, to_utc_naive
+from app.models.webhook_audit import WebhookAudit
+from app.services.webhook_audit import hash_email
+from app.utils.export import EXPORT_FORMAT_PATTERN, export_response
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+AUDIT_EXPORT_COLUMNS = [
+    "id",
+    "created_at",
+    "answer_id",
+    "poll_id",
+    "email_hash",
+    "source",
+    "status",
+    "contact_id",
+    "deals_count",
+    "bitrix_calls",
+    "duration_ms",
+    "error",
+    "details",
+]
+
+
+def _serialize_audit(record: WebhookAudit) -> dict:
+    row = {column: getattr(record, column) for column in AUDIT_EXPORT_COLUMNS}
+    row["created_at"] = record.created_at.isoformat()
+    return row
+
+
+@router.get("/export")
+async def export_audit(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    answer_id: Optional[int] = None,
+    poll_id: Optional[int] = None,
+    email: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(success|error)$"),
+    fmt: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    gzip: bool = False,
+):
+    """
+    Потоковая выгрузка журнала обработки ответов (старые записи первыми)
+
+    Args:
+        since: Записи, созданные не раньше указанного времени
+        until: Записи, созданные раньше указанного времени
+        answer_id: Фильтр по ID ответа
+        poll_id: Фильтр по ID опроса
+        email: Фильтр по email (сравнивается хеш)
+        status: Фильтр по статусу обработки (success / error)
+        format: Формат выгрузки: ndjson или csv
+        gzip: Сжать поток gzip
+    """
+    since, until = to_utc_naive(since), to_utc_naive(until)
+    query = select(WebhookAudit)
+    if since is not None:
+        query = query.where(WebhookAudit.created_at >= since)
+    if until is not None:
+        query = query.where(WebhookAudit.created_at < until)
+    if answer_id is not None:
+        query = query.where(WebhookAudit.answer_id == answer_id)
+    if poll_id is not None:
+        query = query.where(WebhookAudit.poll_id == poll_id)
+    if email:
+        query = query.where(WebhookAudit.email_hash == hash_email(email))
+    if status:
+        query = query.where(WebhookAudit.status == status)
+    query = query.order_by(WebhookAudit.created_at, WebhookAudit.id)
+
+    return export_response(
+        query, AUDIT_EXPORT_COLUMNS, _serialize_audit, fmt, gzip, "webhook_audit", AsyncSessionLocal
+    )
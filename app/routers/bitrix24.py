@@ -1,17 +1,72 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Literal, Optional
 
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+from app.config import settings
+from app.schemas.bitrix import BitrixBulkRequest, BitrixBulkResponse
 from app.services.bitrix24_client import bitrix24_client
+from app.services.bitrix_events import EventRejected, bitrix_event_handler, parse_event
+from app.services.entity_bulk import run_bulk
+from app.services.entity_cache import entity_cache
+from app.services.entity_export import export_select, iter_export
+from app.services.projection import parse_fields
+from app.services.schema_validator import SchemaValidationError
+from app.utils.export import NDJSON_MEDIA_TYPE
+from app.utils.fastjson import ORJSONResponse
+from app.utils.lanes import Lane, use_lane
+
+router = APIRouter(
+    prefix="/bitrix24", tags=["bitrix24"], dependencies=[Depends(use_lane(Lane.PROXY))]
+)
+
+# Ответы Bitrix24 - уже JSON-совместимые словари: эндпоинты возвращают ORJSONResponse
+# напрямую, без обхода страницы jsonable_encoder. GET по ID отдается через кеш
+# сущностей (ETag, If-None-Match, X-Cache), запись через клиент сбрасывает кеш
+
+
+# ==================== EXPORT ====================
+# Объявлен до GET /{entity}/{id}: иначе путь /contacts/export совпал бы с ним
+
+
+@router.get("/{entity}/export", dependencies=[Depends(use_lane(Lane.BACKGROUND))])
+def export_entities(
+    entity: Literal["contacts", "deals", "leads"],
+    cursor: int = Query(0, ge=0),
+    fields: Optional[str] = None,
+    modified_since: Optional[str] = None,
+):
+    """
+    Потоковая выгрузка всех контактов, сделок или лидов в NDJSON
+
+    Args:
+        cursor: ID, после которого продолжить выгрузку (из строки {"_cursor": ...})
+        fields: Поля через запятую (по умолчанию - основные поля сущности)
+        modified_since: Только сущности, измененные начиная с даты (>=DATE_MODIFY)
+    """
+    select = export_select(
+        entity, [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    )
+    filter_params = {">=DATE_MODIFY": modified_since} if modified_since else {}
 
-router = APIRouter(prefix="/bitrix24", tags=["bitrix24"])
+    return StreamingResponse(
+        iter_export(entity, filter_params, select, cursor),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{entity}.ndjson"'},
+    )
 
 
 # ==================== CONTACTS ====================
 
 
 @router.get("/contacts")
-def list_contacts(start: int = 0, name: Optional[str] = None, phone: Optional[str] = None):
+def list_contacts(
+    start: int = 0,
+    name: Optional[str] = None,
+    phone: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """Получить список контактов с фильтрацией"""
     try:
         filter_params = {}
@@ -21,19 +76,22 @@ def list_contacts(start: int = 0, name: Optional[str] = None, phone: Optional[st
             filter_params["PHONE"] = phone
 
         result = bitrix24_client.get_contacts(
-            filter=filter_params if filter_params else None, start=start
+            filter=filter_params if filter_params else None,
+            select=parse_fields(fields),
+            start=start,
         )
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/contacts/{contact_id}")
-def get_contact(contact_id: int):
+def get_contact(contact_id: int, request: Request):
     """Получить контакт по ID"""
     try:
-        result = bitrix24_client.get_contact(contact_id)
-        return result
+        return entity_cache.respond(
+            "contact", contact_id, request, lambda: bitrix24_client.get_contact(contact_id)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -53,7 +111,9 @@ def create_contact(fields: Dict[str, Any] = Body(...)):
     """
     try:
         result = bitrix24_client.create_contact(fields)
-        return result
+        return ORJSONResponse(result)
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -63,7 +123,9 @@ def update_contact(contact_id: int, fields: Dict[str, Any] = Body(...)):
     """Обновить контакт"""
     try:
         result = bitrix24_client.update_contact(contact_id, fields)
-        return result
+        return ORJSONResponse(result)
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -73,7 +135,7 @@ def delete_contact(contact_id: int):
     """Удалить контакт"""
     try:
         result = bitrix24_client.delete_contact(contact_id)
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -82,7 +144,12 @@ def delete_contact(contact_id: int):
 
 
 @router.get("/leads")
-def list_leads(start: int = 0, title: Optional[str] = None, status_id: Optional[str] = None):
+def list_leads(
+    start: int = 0,
+    title: Optional[str] = None,
+    status_id: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """Получить список лидов с фильтрацией"""
     try:
         filter_params = {}
@@ -92,19 +159,22 @@ def list_leads(start: int = 0, title: Optional[str] = None, status_id: Optional[
             filter_params["STATUS_ID"] = status_id
 
         result = bitrix24_client.get_leads(
-            filter=filter_params if filter_params else None, start=start
+            filter=filter_params if filter_params else None,
+            select=parse_fields(fields),
+            start=start,
         )
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/leads/{lead_id}")
-def get_lead(lead_id: int):
+def get_lead(lead_id: int, request: Request):
     """Получить лид по ID"""
     try:
-        result = bitrix24_client.get_lead(lead_id)
-        return result
+        return entity_cache.respond(
+            "lead", lead_id, request, lambda: bitrix24_client.get_lead(lead_id)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -125,7 +195,7 @@ def create_lead(fields: Dict[str, Any] = Body(...)):
     """
     try:
         result = bitrix24_client.create_lead(fields)
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -135,7 +205,7 @@ def update_lead(lead_id: int, fields: Dict[str, Any] = Body(...)):
     """Обновить лид"""
     try:
         result = bitrix24_client.update_lead(lead_id, fields)
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -145,7 +215,7 @@ def delete_lead(lead_id: int):
     """Удалить лид"""
     try:
         result = bitrix24_client.delete_lead(lead_id)
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -154,7 +224,12 @@ def delete_lead(lead_id: int):
 
 
 @router.get("/deals")
-def list_deals(start: int = 0, title: Optional[str] = None, stage_id: Optional[str] = None):
+def list_deals(
+    start: int = 0,
+    title: Optional[str] = None,
+    stage_id: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """Получить список сделок с фильтрацией"""
     try:
         filter_params = {}
@@ -164,19 +239,22 @@ def list_deals(start: int = 0, title: Optional[str] = None, stage_id: Optional[s
             filter_params["STAGE_ID"] = stage_id
 
         result = bitrix24_client.get_deals(
-            filter=filter_params if filter_params else None, start=start
+            filter=filter_params if filter_params else None,
+            select=parse_fields(fields),
+            start=start,
         )
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/deals/{deal_id}")
-def get_deal(deal_id: int):
+def get_deal(deal_id: int, request: Request):
     """Получить сделку по ID"""
     try:
-        result = bitrix24_client.get_deal(deal_id)
-        return result
+        return entity_cache.respond(
+            "deal", deal_id, request, lambda: bitrix24_client.get_deal(deal_id)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -196,7 +274,9 @@ def create_deal(fields: Dict[str, Any] = Body(...)):
     """
     try:
         result = bitrix24_client.create_deal(fields)
-        return result
+        return ORJSONResponse(result)
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -206,7 +286,9 @@ def update_deal(deal_id: int, fields: Dict[str, Any] = Body(...)):
     """Обновить сделку"""
     try:
         result = bitrix24_client.update_deal(deal_id, fields)
-        return result
+        return ORJSONResponse(result)
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -216,6 +298,61 @@ def delete_deal(deal_id: int):
     """Удалить сделку"""
     try:
         result = bitrix24_client.delete_deal(deal_id)
-        return result
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ==================== BULK ====================
+
+
+@router.post(
+    "/{entity}/bulk",
+    response_model=BitrixBulkResponse,
+    dependencies=[Depends(use_lane(Lane.BACKGROUND))],
+)
+def bulk_operations(entity: Literal["contacts", "deals", "leads"], body: BitrixBulkRequest):
+    """
+    Пакетное создание, обновление и удаление контактов, сделок или лидов
+
+    Операции выполняются batch запросами по BATCH_SIZE команд. Ошибка одной
+    операции не прерывает остальные: результат и ошибка возвращаются для каждой
+    операции в порядке запроса.
+    """
+    if len(body.operations) > settings.BULK_OPERATIONS_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Превышен лимит операций в запросе: {settings.BULK_OPERATIONS_MAX_ITEMS}",
+        )
+
+    try:
+        return run_bulk(entity, body.operations)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ==================== EVENTS ====================
+
+
+@router.post("/events")
+async def receive_event(request: Request):
+    """
+    Прием исходящего события Bitrix24 (ONCRMCONTACTUPDATE, ONCRMDEALDELETE, ...)
+
+    Тело - форма application/x-www-form-urlencoded от исходящего вебхука.
+    Событие сбрасывает кеши измененной сущности; неизвестные события
+    подтверждаются без действий.
+
+    Raises:
+        HTTPException 403: Неверный application_token или прием событий не настроен
+    """
+    event = parse_event(await request.body())
+    try:
+        bitrix_event_handler.verify(event)
+    except EventRejected as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+
+    applied = await run_in_threadpool(bitrix_event_handler.handle, event)
+    return ORJSONResponse(
+        {"event": event.get("event"), "status": "applied" if applied else "ignored"}
+    )
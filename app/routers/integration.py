@@ -4,13 +4,21 @@
 Реализует API согласно INTEGRATION_TASK.md:
 - POST /postPoll - Регистрация новой опросной формы
 - POST /postAnswer - Обработка ответа из опросной формы
+- POST /postAnswers - Пакетная обработка ответов (JSON массив или NDJSON поток)
 """
 
 import json
 import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Union
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
 
+from app.config import settings
 from app.schemas.integration import (
     PostAnswerResponse,
     PostPollRequest,
@@ -21,7 +29,15 @@ from app.schemas.integration import (
     create_success_poll_response,
 )
 from app.schemas.webhook import WebhookPayload
+from app.services.answer_extraction import WEBHOOK_PAYLOAD_ADAPTER, parse_webhook_payload
+from app.services.bulk_answer_service import bulk_answer_service, normalize_email
+from app.services.health import health_monitor
 from app.services.integration_service import integration_service
+from app.utils import fastjson
+from app.utils.admission import answer_admission, bulk_answer_admission
+from app.utils.export import NDJSON_MEDIA_TYPE
+from app.utils.lanes import Lane, use_lane
+from app.utils.sharding import answer_shards
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -30,7 +46,28 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/integration", tags=["integration"])
 
 
-@router.post("/postPoll", response_model=PostPollResponse)
+def _build_success_message(result: Dict[str, Any]) -> str:
+    """Сформировать сообщение об успешной обработке ответа по результату process_webhook"""
+    total_deals = result.get("total_deals", 0)
+
+    if total_deals > 0:
+        deals_info = []
+        for deal in result.get("deals", []):
+            status_text = "NEW" if deal["is_new"] else "EXISTING"
+            deals_info.append(f"{deal['program_name']} ({status_text})")
+
+        message = f"Успешно обработано. Создано сделок: {total_deals}"
+        if deals_info:
+            message += f" - {', '.join(deals_info)}"
+    else:
+        message = "Успешно обработано. Создана 1 общая сделка (без указания ОП)"
+
+    return message
+
+
+@router.post(
+    "/postPoll", response_model=PostPollResponse, dependencies=[Depends(use_lane(Lane.POLL))]
+)
 async def post_poll(request: PostPollRequest):
     """
     Регистрация новой опросной формы в Bitrix24
@@ -96,13 +133,14 @@ async def post_poll(request: PostPollRequest):
             pass
 
         # Создаем новую опросную форму в универсальном списке
+        plan = integration_service.mapping_plan
         fields = {
             "NAME": request.poll_name,
-            "PROPERTY_64": str(request.poll_id),  # POLL_ID
+            plan.poll_id_property: str(request.poll_id),
             "PREVIEW_TEXT": f"Язык: {request.poll_language}, Создан: {request.employee_email}",
             "CODE": str(request.poll_id),
-            "PROPERTY_65": f"https://portal.hse.ru/{str(request.poll_id)}",
-            "PROPERTY_66": 0,
+            plan.poll_url_property: f"https://portal.hse.ru/{str(request.poll_id)}",
+            plan.poll_responsible_property: 0,
         }
 
         result = integration_service.client.create_list_element(
@@ -124,8 +162,53 @@ async def post_poll(request: PostPollRequest):
         return create_error_poll_response(poll_id=request.poll_id, description=str(e))
 
 
-@router.post("/postAnswer", response_model=PostAnswerResponse)
-async def post_answer(payload: WebhookPayload):
+def _inline_refs(schema: Any, defs: Dict[str, Any]) -> Any:
+    """Подставить $defs в JSON схему (для схемы тела запроса в OpenAPI)"""
+    if isinstance(schema, dict):
+        ref = schema.get("$ref")
+        if ref is not None:
+            return _inline_refs(defs[ref.rsplit("/", 1)[-1]], defs)
+        return {key: _inline_refs(value, defs) for key, value in schema.items() if key != "$defs"}
+    if isinstance(schema, list):
+        return [_inline_refs(item, defs) for item in schema]
+    return schema
+
+
+def _webhook_payload_openapi() -> Dict[str, Any]:
+    """Описание тела /postAnswer: тело читается вручную, схему задаем явно"""
+    schema = WEBHOOK_PAYLOAD_ADAPTER.json_schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": _inline_refs(schema, schema.get("$defs", {}))}
+            },
+        }
+    }
+
+
+async def _read_webhook_payload(request: Request) -> WebhookPayload:
+    """
+    Валидация тела /postAnswer закешированным TypeAdapter прямо из байтов
+
+    Raises:
+        RequestValidationError: 422 в том же формате, что и при валидации FastAPI
+    """
+    try:
+        return parse_webhook_payload(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+
+@router.post(
+    "/postAnswer",
+    response_model=PostAnswerResponse,
+    openapi_extra=_webhook_payload_openapi(),
+    dependencies=[Depends(use_lane(Lane.WEBHOOK))],
+)
+async def post_answer(request: Request):
     """
     Обработка ответа из опросной формы
 
@@ -139,7 +222,7 @@ async def post_answer(payload: WebhookPayload):
        - Обогащение сделки (cookies, additional fields, question fields)
 
     Args:
-        payload: Полные данные webhook от системы опросов
+        request: Запрос с полными данными webhook от системы опросов (WebhookPayload)
 
     Returns:
         PostAnswerResponse: Результат обработки с poll_id, answer_id и статусом
@@ -148,6 +231,8 @@ async def post_answer(payload: WebhookPayload):
         HTTPException 404: Если опросная форма или образовательная программа не найдена
         HTTPException 400: Если данные невалидны (например, отсутствует email)
         HTTPException 500: При других ошибках обработки
+        HTTPException 429: Очередь обработки заполнена (Retry-After)
+        HTTPException 503: Превышено время ожидания в очереди (Retry-After)
 
     Example:
         POST /integration/postAnswer
@@ -198,6 +283,16 @@ async def post_answer(payload: WebhookPayload):
             "description": "Опросная форма с ID 430131691 не найдена в системе"
         }
     """
+    # Сверх лимита одновременных обработок запрос ждет в очереди или сразу
+    # получает 429/503 - до чтения тела
+    async with answer_admission.slot():
+        return await _handle_answer(request)
+
+
+async def _handle_answer(request: Request) -> PostAnswerResponse:
+    """Обработка /postAnswer внутри слота admission control"""
+    payload = await _read_webhook_payload(request)
+
     logger.info("=" * 70)
     logger.info(f"📨 Received POST /postAnswer request")
     logger.info(f"   Poll ID: {payload.header_data.poll_id}")
@@ -205,32 +300,22 @@ async def post_answer(payload: WebhookPayload):
     logger.info(f"   Email: {payload.data.email}")
     logger.info("=" * 70)
 
-    logger.info("Full request body:")
-    try:
-        payload_dict = payload.model_dump()
-        logger.info(json.dumps(payload_dict, ensure_ascii=False, indent=2, default=str))
-    except Exception as e:
-        logger.warning(f"Could not serialize request body: {e}")
-    logger.info("=" * 70)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Full request body:")
+        try:
+            logger.info(payload.model_dump_json(indent=2))
+        except Exception as e:
+            logger.warning(f"Could not serialize request body: {e}")
+        logger.info("=" * 70)
 
     try:
-        # Запускаем полный цикл обработки через integration_service
-        result = integration_service.process_webhook(payload)
+        # Полный цикл обработки блокируется на Bitrix24 - выполняем в пуле потоков
+        # в очереди email: ответы одного абитуриента обрабатываются строго по порядку
+        email = normalize_email(payload.data.email) if payload.data.email else None
+        result = await answer_shards.run(email, integration_service.process_webhook, payload)
 
         # Формируем сообщение о результате
-        total_deals = result.get("total_deals", 0)
-
-        if total_deals > 0:
-            deals_info = []
-            for deal in result.get("deals", []):
-                status_text = "NEW" if deal["is_new"] else "EXISTING"
-                deals_info.append(f"{deal['program_name']} ({status_text})")
-
-            message = f"Успешно обработано. Создано сделок: {total_deals}"
-            if deals_info:
-                message += f" - {', '.join(deals_info)}"
-        else:
-            message = "Успешно обработано. Создана 1 общая сделка (без указания ОП)"
+        message = _build_success_message(result)
 
         logger.info(f"✅ Webhook processed successfully")
         logger.info(f"   {message}")
@@ -261,13 +346,209 @@ async def post_answer(payload: WebhookPayload):
         )
 
 
+def _invalid_item_response(item: Any, error: Exception) -> PostAnswerResponse:
+    """Ответ с ошибкой для элемента пакета, не прошедшего валидацию"""
+    header = item.get("header_data") if isinstance(item, dict) else None
+    header = header if isinstance(header, dict) else {}
+
+    def as_int(value: Any) -> int:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+
+    return create_error_answer_response(
+        poll_id=as_int(header.get("poll_id")),
+        answer_id=as_int(header.get("answer_id")),
+        description=f"Невалидные данные ответа: {error}",
+    )
+
+
+def _too_many_items() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Превышен лимит ответов в запросе: {settings.BULK_ANSWERS_MAX_ITEMS}",
+    )
+
+
+def _append_ndjson_item(items: List[Any], line: bytes):
+    """Разобрать строку NDJSON: ошибка разбора сохраняется как исключение элемента"""
+    if not line.strip():
+        return
+    if len(items) >= settings.BULK_ANSWERS_MAX_ITEMS:
+        raise _too_many_items()
+    try:
+        items.append(fastjson.loads(line))
+    except ValueError as e:
+        items.append(e)
+
+
+async def _read_bulk_items(request: Request) -> List[Any]:
+    """
+    Прочитать и разобрать все элементы тела запроса /postAnswers
+
+    - application/x-ndjson: построчное чтение потока (по одному JSON объекту на строку)
+    - application/json: JSON массив объектов
+
+    Тело читается целиком до начала ответа: StreamingResponse сам вызывает
+    receive() (ожидание отключения клиента) и забрал бы остаток тела.
+    Ошибки разбора отдельных строк NDJSON возвращаются как исключения.
+
+    Raises:
+        HTTPException 400: Тело не является JSON массивом
+        HTTPException 413: Ответов больше BULK_ANSWERS_MAX_ITEMS
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if NDJSON_MEDIA_TYPE in content_type:
+        items: List[Any] = []
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                _append_ndjson_item(items, line)
+        _append_ndjson_item(items, buffer)
+        return items
+
+    try:
+        items = fastjson.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Невалидный JSON: {e}")
+
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ожидается JSON массив ответов или NDJSON поток",
+        )
+
+    if len(items) > settings.BULK_ANSWERS_MAX_ITEMS:
+        raise _too_many_items()
+
+    return items
+
+
+def _process_bulk_chunk(chunk: List[WebhookPayload]) -> List[PostAnswerResponse]:
+    """Обработать чанк ответов и сформировать PostAnswerResponse для каждого"""
+    responses = []
+    for payload, result in zip(chunk, bulk_answer_service.process_ordered(chunk)):
+        if isinstance(result, Exception):
+            responses.append(
+                create_error_answer_response(
+                    poll_id=payload.header_data.poll_id,
+                    answer_id=payload.header_data.answer_id,
+                    description=str(result),
+                )
+            )
+        else:
+            responses.append(
+                create_success_answer_response(
+                    poll_id=result["poll_id"],
+                    answer_id=result["answer_id"],
+                    message=_build_success_message(result),
+                )
+            )
+    return responses
+
+
+async def _flush_bulk_chunk(chunk: List[Union[WebhookPayload, PostAnswerResponse]]) -> bytes:
+    """
+    Обработать чанк в пуле потоков и закодировать результаты строками NDJSON
+
+    Элементы, отклоненные при разборе, уже содержат ответ и остаются на своих местах:
+    строка результата N соответствует элементу N тела запроса.
+    """
+    payloads = [item for item in chunk if isinstance(item, WebhookPayload)]
+    processed = iter(await run_in_threadpool(_process_bulk_chunk, payloads) if payloads else [])
+    responses = [
+        item if isinstance(item, PostAnswerResponse) else next(processed) for item in chunk
+    ]
+    return b"".join(response.model_dump_json().encode() + b"\n" for response in responses)
+
+
+def _parse_bulk_item(item: Any) -> Union[WebhookPayload, PostAnswerResponse]:
+    """Элемент тела как WebhookPayload или ответ с ошибкой разбора"""
+    if isinstance(item, Exception):
+        return _invalid_item_response(None, item)
+    try:
+        return WEBHOOK_PAYLOAD_ADAPTER.validate_python(item)
+    except ValidationError as e:
+        return _invalid_item_response(item, e)
+
+
+async def _stream_bulk_results(
+    items: List[Any], release: Callable[[], None]
+) -> AsyncIterator[bytes]:
+    """
+    NDJSON поток результатов /postAnswers по чанкам BULK_ANSWERS_CHUNK_SIZE
+
+    Args:
+        items: Разобранные элементы тела (словари или исключения разбора)
+        release: Освобождение слота пакетной обработки (в конце потока)
+    """
+    chunk: List[Union[WebhookPayload, PostAnswerResponse]] = []
+    try:
+        for item in items:
+            chunk.append(_parse_bulk_item(item))
+            if len(chunk) >= settings.BULK_ANSWERS_CHUNK_SIZE:
+                yield await _flush_bulk_chunk(chunk)
+                chunk = []
+
+        if chunk:
+            yield await _flush_bulk_chunk(chunk)
+
+        logger.info(f"✅ Bulk postAnswers finished: {len(items)} answers")
+    finally:
+        release()
+
+
+@router.post("/postAnswers", dependencies=[Depends(use_lane(Lane.BACKGROUND))])
+async def post_answers(request: Request):
+    """
+    Пакетная обработка ответов из опросных форм (backfill)
+
+    Принимает JSON массив WebhookPayload (Content-Type: application/json)
+    или поток NDJSON (Content-Type: application/x-ndjson, один WebhookPayload на строку).
+
+    Ответы обрабатываются чанками по BULK_ANSWERS_CHUNK_SIZE: поиски опросных форм,
+    программ, контактов (по email) и сделок (по контакту и программе) выполняются
+    один раз на чанк, работа с Bitrix24 идет через batch запросы.
+
+    Returns:
+        NDJSON поток PostAnswerResponse - по одной строке на каждый ответ
+        в порядке поступления (в том числе для невалидных строк и объектов),
+        по мере обработки чанков
+
+    Raises:
+        HTTPException 400: Невалидное тело запроса
+        HTTPException 413: Ответов больше BULK_ANSWERS_MAX_ITEMS
+        HTTPException 429/503: Нет свободного слота пакетной обработки (Retry-After)
+    """
+    # Слот занят до конца потока: освобождается в генераторе или фоновой задачей ответа
+    await bulk_answer_admission.acquire()
+    release = bulk_answer_admission.release_once()
+
+    try:
+        items = await _read_bulk_items(request)
+    except BaseException:
+        release()
+        raise
+
+    logger.info(f"📨 Received POST /postAnswers request: {len(items)} answers")
+    return StreamingResponse(
+        _stream_bulk_results(items, release),
+        media_type=NDJSON_MEDIA_TYPE,
+        background=BackgroundTask(release),
+    )
+
+
 @router.get("/health")
 async def health_check():
     """
     Проверка работоспособности интеграции
 
     Проверяет:
-    - Доступность Bitrix24 API
+    - Доступность Bitrix24 API (по результату фоновой проверки, без запроса к API)
     - Загрузку field_mapping.json
     - Наличие необходимых констант
 
@@ -288,12 +569,9 @@ async def health_check():
             ]
         )
 
-        # Простая проверка доступности Bitrix24 API (пробуем получить пустой список контактов)
-        try:
-            integration_service.client.get_contacts(filter={"ID": 999999999})
-            bitrix_available = True
-        except Exception:
-            bitrix_available = False
+        # Доступность Bitrix24 API - закешированный результат фоновой проверки
+        probe = health_monitor.snapshot()
+        bitrix_available = health_monitor.is_ready()
 
         return {
             "status": (
@@ -302,6 +580,8 @@ async def health_check():
             "field_mapping_loaded": has_mapping,
             "constants_configured": has_constants,
             "bitrix24_api_available": bitrix_available,
+            "bitrix24_checked_at": probe["checked_at"],
+            "bitrix24_check_age_seconds": probe["age_seconds"],
             "service": "integration",
             "version": "1.0.0",
         }
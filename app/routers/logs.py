@@ -1,63 +1,214 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import Session
-
-from app.database import get_db
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal, get_async_db, to_utc_naive, utcnow
 from app.models.log import Log
+from app.services.buffered_writer import BufferFullError, log_writer
+from app.utils.export import EXPORT_FORMAT_PATTERN, export_response
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
+# Заголовок с курсором следующей страницы GET /logs/
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+LOG_EXPORT_COLUMNS = ["id", "created_at", "message"]
+
+
+def _serialize_log(log: Log) -> dict:
+    return {"id": log.id, "created_at": log.created_at.isoformat(), "message": log.message}
+
+
+def _encode_cursor(log: Log) -> str:
+    """Непрозрачный курсор на позицию (created_at, id) последней записи страницы"""
+    raw = f"{log.created_at.isoformat()}|{log.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, log_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+def _filter_period(query, since: Optional[datetime], until: Optional[datetime]):
+    """Фильтр по created_at: границы со смещением приводятся к UTC колонки"""
+    since, until = to_utc_naive(since), to_utc_naive(until)
+    if since is not None:
+        query = query.where(Log.created_at >= since)
+    if until is not None:
+        query = query.where(Log.created_at < until)
+    return query
+
+
+def _build_logs_query(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    q: Optional[str],
+    after: Optional[Tuple[datetime, int]],
+    limit: int,
+):
+    """
+    Запрос страницы логов (новые первыми) по индексу ix_logs_created_at_id
+
+    Args:
+        since: Нижняя граница created_at (включительно)
+        until: Верхняя граница created_at (не включительно)
+        q: Подстрока для поиска в сообщении (без учета регистра)
+        after: Позиция (created_at, id), после которой начинается страница
+        limit: Размер страницы
+    """
+    query = _filter_period(select(Log), since, until)
+    if q:
+        query = query.where(Log.message.icontains(q, autoescape=True))
+    if after is not None:
+        created_at, log_id = after
+        # Эквивалент (created_at, id) < (:created_at, :id), переносимый между СУБД
+        query = query.where(
+            or_(
+                Log.created_at < created_at,
+                and_(Log.created_at == created_at, Log.id < log_id),
+            )
+        )
+    return query.order_by(Log.created_at.desc(), Log.id.desc()).limit(limit)
+
+
+async def _fetch_page(
+    db: AsyncSession,
+    since: Optional[datetime],
+    until: Optional[datetime],
+    q: Optional[str],
+    after: Optional[Tuple[datetime, int]],
+    limit: int,
+) -> Tuple[List[Log], Optional[str]]:
+    """
+    Получить страницу логов и курсор следующей страницы
+
+    Returns:
+        Кортеж (логи, курсор следующей страницы или None если страница последняя)
+    """
+    # Запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
+    logs = list((await db.scalars(_build_logs_query(since, until, q, after, limit + 1))).all())
+    if len(logs) > limit:
+        logs = logs[:limit]
+        return logs, _encode_cursor(logs[-1])
+    return logs, None
+
 
 @router.get("/")
-def get_logs(db: Session = Depends(get_db)):
-    """Получить список всех логов"""
-    logs = db.execute(select(Log)).scalars().all()
-    return {
-        "logs": [
-            {"id": log.id, "created_at": log.created_at.isoformat(), "message": log.message}
-            for log in logs
-        ]
-    }
+async def get_logs(
+    response: Response,
+    limit: int = Query(settings.LOGS_PAGE_DEFAULT_LIMIT, ge=1, le=settings.LOGS_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    q: Optional[str] = Query(None, max_length=500),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Получить список логов (новые первыми) с keyset пагинацией
+
+    Формат ответа прежний ({"logs": [...]}); курсор следующей страницы
+    передается в заголовке X-Next-Cursor (нет заголовка - страница последняя).
+    Полная выгрузка - GET /logs/export.
+
+    Args:
+        limit: Размер страницы (не больше LOGS_PAGE_MAX_LIMIT)
+        cursor: Курсор следующей страницы из заголовка X-Next-Cursor предыдущего ответа
+        since: Логи, созданные не раньше указанного времени
+        until: Логи, созданные раньше указанного времени
+        q: Поиск подстроки в сообщении
+    """
+    after = _decode_cursor(cursor) if cursor else None
+
+    logs, next_cursor = await _fetch_page(db, since, until, q, after, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return {"logs": [_serialize_log(log) for log in logs]}
+
+
+@router.get("/export")
+async def export_logs(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fmt: str = Query("ndjson", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    gzip: bool = False,
+):
+    """
+    Потоковая выгрузка логов за период (старые первыми)
+
+    Args:
+        since: Логи, созданные не раньше указанного времени
+        until: Логи, созданные раньше указанного времени
+        format: Формат выгрузки: ndjson или csv
+        gzip: Сжать поток gzip
+    """
+    query = _filter_period(select(Log), since, until).order_by(Log.created_at, Log.id)
+
+    return export_response(
+        query, LOG_EXPORT_COLUMNS, _serialize_log, fmt, gzip, "logs", AsyncSessionLocal
+    )
 
 
 @router.get("/{log_id}")
-def get_log(log_id: int, db: Session = Depends(get_db)):
+async def get_log(log_id: int, db: AsyncSession = Depends(get_async_db)):
     """Получить лог по ID"""
-    log = db.execute(select(Log).where(Log.id == log_id)).scalar_one_or_none()
+    log = await db.get(Log, log_id)
 
     if not log:
         raise HTTPException(status_code=404, detail="Лог не найден")
 
-    return {"id": log.id, "created_at": log.created_at.isoformat(), "message": log.message}
+    return _serialize_log(log)
 
 
 @router.post("/")
-def create_log(message: str, db: Session = Depends(get_db)):
-    """Создать новый лог"""
+async def create_log(
+    message: str, deferred: bool = False, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Создать новый лог
+
+    Args:
+        message: Текст лога
+        deferred: Записать через буфер пакетной записи (ответ 202 без ID лога)
+    """
+    if deferred:
+        try:
+            await run_in_threadpool(log_writer.add, {"message": message, "created_at": utcnow()})
+        except BufferFullError:
+            raise HTTPException(status_code=503, detail="Буфер записи логов переполнен")
+        return JSONResponse(status_code=202, content={"message": "Лог принят"})
+
     new_log = Log(message=message)
     db.add(new_log)
-    db.commit()
-    db.refresh(new_log)
+    await db.commit()
+    await db.refresh(new_log)
 
     return {
         "message": "Лог создан",
-        "log": {
-            "id": new_log.id,
-            "created_at": new_log.created_at.isoformat(),
-            "message": new_log.message,
-        },
+        "log": _serialize_log(new_log),
     }
 
 
 @router.delete("/{log_id}")
-def delete_log(log_id: int, db: Session = Depends(get_db)):
+async def delete_log(log_id: int, db: AsyncSession = Depends(get_async_db)):
     """Удалить лог"""
-    log = db.execute(select(Log).where(Log.id == log_id)).scalar_one_or_none()
+    log = await db.get(Log, log_id)
 
     if not log:
         raise HTTPException(status_code=404, detail="Лог не найден")
 
-    db.delete(log)
-    db.commit()
+    await db.delete(log)
+    await db.commit()
 
     return {"message": "Лог удален"}
@@ -10,6 +10,10 @@ Pydantic схемы для валидации данных
 # Bitrix24 schemas
 from .bitrix import (
     BitrixApiResponse,
+    BitrixBulkItemResult,
+    BitrixBulkOperation,
+    BitrixBulkRequest,
+    BitrixBulkResponse,
     BitrixContactCreate,
     BitrixContactUpdate,
     BitrixDealCreate,
@@ -64,5 +68,9 @@ __all__ = [
     "BitrixDealUpdate",
     "BitrixListElementCreate",
     "BitrixListElementFilter",
+    "BitrixBulkOperation",
+    "BitrixBulkRequest",
+    "BitrixBulkItemResult",
+    "BitrixBulkResponse",
     "BitrixApiResponse",
 ]
@@ -4,9 +4,9 @@ Pydantic модели для работы с Bitrix24 API
 Схемы для контактов, сделок, списков и других сущностей Bitrix24
 """
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 # ==================== Multifield Schemas ====================
 
@@ -226,6 +226,68 @@ class BitrixListElementFilter(BaseModel):
         }
 
 
+# ==================== Bulk Schemas ====================
+
+
+class BitrixBulkOperation(BaseModel):
+    """
+    Операция над сущностью в пакетном запросе /bitrix24/{entity}/bulk
+
+    - create: нужны fields
+    - update: нужны id и fields
+    - delete: нужен id
+    """
+
+    action: Literal["create", "update", "delete"] = Field(..., description="Операция")
+    id: Optional[int] = Field(None, description="ID сущности (update, delete)")
+    fields: Optional[Dict[str, Any]] = Field(None, description="Поля сущности (create, update)")
+
+    @model_validator(mode="after")
+    def check_required(self) -> "BitrixBulkOperation":
+        if self.action in ("update", "delete") and self.id is None:
+            raise ValueError(f"id обязателен для {self.action}")
+        if self.action in ("create", "update") and not self.fields:
+            raise ValueError(f"fields обязательны для {self.action}")
+        return self
+
+
+class BitrixBulkRequest(BaseModel):
+    """Пакет операций над контактами, сделками или лидами"""
+
+    operations: List[BitrixBulkOperation] = Field(..., description="Операции (порядок сохраняется)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "operations": [
+                    {"action": "create", "fields": {"NAME": "Иван", "LAST_NAME": "Иванов"}},
+                    {"action": "update", "id": 123, "fields": {"COMMENTS": "Импорт"}},
+                    {"action": "delete", "id": 456},
+                ]
+            }
+        }
+
+
+class BitrixBulkItemResult(BaseModel):
+    """Результат одной операции пакета"""
+
+    index: int = Field(..., description="Позиция операции в запросе")
+    action: str = Field(..., description="Операция")
+    id: Optional[int] = Field(None, description="ID сущности (для create - ID созданной)")
+    success: bool = Field(..., description="Операция выполнена")
+    result: Optional[Any] = Field(None, description="Результат метода Bitrix24")
+    error: Optional[str] = Field(None, description="Описание ошибки")
+
+
+class BitrixBulkResponse(BaseModel):
+    """Результат пакетного запроса с отчетом о частичных ошибках"""
+
+    total: int = Field(..., description="Всего операций")
+    succeeded: int = Field(..., description="Успешных операций")
+    failed: int = Field(..., description="Проваленных операций")
+    results: List[BitrixBulkItemResult] = Field(..., description="Результаты в порядке операций")
+
+
 # ==================== Response Schemas ====================
 
 
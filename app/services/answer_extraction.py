@@ -0,0 +1,153 @@
+"""
+Разбор ответа из опросной формы за один проход
+
+- Тело запроса валидируется закешированным TypeAdapter прямо из байтов
+  (validate_json), без промежуточного словаря json.loads
+- Поля формы за один обход делятся на типовые и дополнительные (additional
+  fields и question fields) без model_dump
+- Cookies сериализуются один раз, JSON комментарий и поля обогащения сделки
+  строятся один раз на ответ и переиспользуются для всех сделок
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pydantic import TypeAdapter
+
+from app.schemas.webhook import Analytics, WebhookData, WebhookPayload
+from app.services.field_mapping import FieldMappingPlan
+from app.utils import fastjson
+
+# Схема валидации собирается один раз на процесс
+WEBHOOK_PAYLOAD_ADAPTER: TypeAdapter[WebhookPayload] = TypeAdapter(WebhookPayload)
+
+# Типовые поля формы (не попадают в additional_fields).
+# hse_school - дополнительное поле, которое должно сохраняться в JSON
+STANDARD_FIELDS = frozenset(
+    {
+        "firstname",
+        "lastname",
+        "middlename",
+        "email",
+        "telephone",
+        "birthdate",
+        "address",
+        "city",
+        "country",
+        "educational_program_1",
+    }
+)
+
+
+@dataclass(frozen=True)
+class ExtractedAnswer:
+    """Данные ответа, подготовленные для всех сделок"""
+
+    standard_fields: Dict[str, Any]  # Заполненные типовые поля формы
+    additional_fields: Dict[str, Any]  # Дополнительные поля и ответы на вопросы
+    programs: List[str]  # Названия образовательных программ
+    analytics: Optional[Analytics]
+    comment: str  # JSON для поля COMMENTS
+    enrich_fields: Dict[str, Any]  # Поля crm.deal.update, общие для всех сделок ответа
+
+
+def parse_webhook_payload(body: Union[bytes, str]) -> WebhookPayload:
+    """
+    Валидация тела запроса /postAnswer
+
+    Args:
+        body: JSON тело запроса
+
+    Returns:
+        WebhookPayload
+
+    Raises:
+        pydantic.ValidationError: Если JSON невалиден или не соответствует схеме
+    """
+    return WEBHOOK_PAYLOAD_ADAPTER.validate_json(body)
+
+
+def split_form_fields(data: WebhookData) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Разделить заполненные поля формы на типовые и дополнительные
+
+    Эквивалент data.model_dump(exclude_none=True) с фильтрацией по STANDARD_FIELDS,
+    но без сериализации модели: значения полей уже JSON-совместимые.
+
+    Args:
+        data: Данные из формы опроса
+
+    Returns:
+        Tuple[типовые поля, дополнительные поля]
+    """
+    standard: Dict[str, Any] = {}
+    additional: Dict[str, Any] = {}
+
+    for values in (data.__dict__, data.__pydantic_extra__ or {}):
+        for key, value in values.items():
+            if value is None:
+                continue
+            if key in STANDARD_FIELDS:
+                standard[key] = value
+            else:
+                additional[key] = value
+
+    return standard, additional
+
+
+def build_deal_comment(analytics: Optional[Analytics], additional_fields: Dict[str, Any]) -> str:
+    """
+    JSON комментарий для сделки (cookies, дополнительные поля, ip/url/date)
+
+    Args:
+        analytics: Аналитические данные
+        additional_fields: Дополнительные поля из формы
+
+    Returns:
+        JSON строка для поля COMMENTS
+    """
+    comment_data: Dict[str, Any] = {}
+
+    if analytics and analytics.cookies:
+        comment_data["cookies"] = analytics.cookies.model_dump(exclude_none=True)
+
+    if additional_fields:
+        comment_data["additional_fields"] = additional_fields
+
+    if analytics:
+        comment_data["analytics"] = {
+            "ip": analytics.ip,
+            "url": analytics.url,
+            "date": analytics.date,
+            "timeZone": analytics.timeZone,
+        }
+
+        if analytics.mailingListSubscription is not None:
+            comment_data["mailingListSubscription"] = analytics.mailingListSubscription
+
+    return fastjson.dumps_str(comment_data, indent=True, default=str)
+
+
+def extract_answer(payload: WebhookPayload, plan: FieldMappingPlan) -> ExtractedAnswer:
+    """
+    Подготовить данные ответа для обработки всех сделок
+
+    Args:
+        payload: Ответ из опросной формы
+        plan: План маппинга полей
+
+    Returns:
+        ExtractedAnswer
+    """
+    standard, additional = split_form_fields(payload.data)
+    analytics = payload.header_data.analytics
+    comment = build_deal_comment(analytics, additional)
+
+    return ExtractedAnswer(
+        standard_fields=standard,
+        additional_fields=additional,
+        programs=list(standard.get("educational_program_1") or []),
+        analytics=analytics,
+        comment=comment,
+        enrich_fields=plan.build_enrich_fields(analytics, comment),
+    )
@@ -1,32 +1,150 @@
+import itertools
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
 
 import httpx
 
 from app.config import settings
+from app.services.entity_cache import entity_cache
+from app.services.projection import EDUCATIONAL_PROGRAM
+from app.services.schema_validator import SchemaValidationError, schema_registry
+from app.utils import fastjson
+from app.utils.lanes import EXEMPT_LANES, current_lane
+from app.utils.rate_limit import bitrix24_concurrency_limiter, bitrix24_rate_limiter
 from app.utils.retry import retry_on_network_error
+from app.utils.singleflight import SingleFlight
+from app.utils.tracing import record_bitrix_call
 
 logger = logging.getLogger(__name__)
 
+# Тело запроса сериализуется заранее (fastjson), заголовок задается явно
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Методы чтения: одинаковые параллельные вызовы объединяются в один HTTP запрос
+COALESCED_METHOD_SUFFIXES = (".get", ".list", ".fields")
+
+
+# Сигналы перегрузки Bitrix24 для адаптивного лимита одновременных запросов
+THROTTLE_ERRORS = frozenset({"QUERY_LIMIT_EXCEEDED", "OPERATION_TIME_LIMIT"})
+THROTTLE_STATUS_CODES = frozenset({429, 503})
+
+
+def request_fingerprint(method: str, params: Optional[Dict[str, Any]]) -> Tuple[str, bytes]:
+    """Отпечаток запроса: метод и параметры в каноническом виде (ключи отсортированы)"""
+    return method, fastjson.dumps(params or {}, sort_keys=True, default=str)
+
+
+def build_query(params: Dict[str, Any], prefix: Optional[str] = None) -> str:
+    """
+    Сформировать строку параметров в формате PHP http_build_query
+
+    Bitrix24 batch ожидает команды вида "crm.deal.list?filter[CONTACT_ID]=1&select[0]=ID",
+    поэтому вложенные словари и списки разворачиваются в ключи с квадратными скобками.
+
+    Args:
+        params: Параметры метода
+        prefix: Префикс ключа (для вложенных структур)
+
+    Returns:
+        Строка параметров без ведущего '?'
+    """
+    parts = []
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else str(key)
+
+        if isinstance(value, dict):
+            nested = build_query(value, name)
+        elif isinstance(value, (list, tuple)):
+            nested = build_query(dict(enumerate(value)), name)
+        else:
+            if value is None:
+                value = ""
+            elif isinstance(value, bool):
+                value = "Y" if value else "N"
+            nested = f"{quote(name, safe='[]')}={quote(str(value), safe='')}"
+
+        if nested:
+            parts.append(nested)
+
+    return "&".join(parts)
+
 
 class Bitrix24Client:
     """Клиент для работы с Bitrix24 REST API"""
 
     def __init__(self):
         self.base_url = settings.BITRIX24_WEBHOOK_URL
-        self.client = httpx.Client(timeout=30.0)
+        # HTTP клиент создается при первом запросе (SSL контекст и пул соединений
+        # не нужны процессам, которые только импортируют модуль)
+        self._client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+        self._reads = SingleFlight("bitrix24_reads")
+        # Поколение записей: меняется после каждого запроса, кроме объединяемых чтений
+        self._generations = itertools.count(1)
+        self._write_generation = 0
+
+    @property
+    def client(self) -> httpx.Client:
+        """HTTP клиент (создается лениво)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(timeout=30.0)
+        return self._client
+
+    @client.setter
+    def client(self, value: httpx.Client):
+        self._client = value
+
+    def close(self):
+        """Закрыть HTTP клиент (повторный запрос создаст новый)"""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
 
     def __del__(self):
         """Закрываем клиент при удалении объекта"""
-        if hasattr(self, "client"):
-            self.client.close()
+        if getattr(self, "_client", None) is not None:
+            self._client.close()
+
+    def _make_request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Выполнить запрос к Bitrix24 API
+
+        Одинаковые параллельные запросы чтения (*.get, *.list, *.fields) с теми же
+        параметрами делят один HTTP вызов (вместе с его повторами). Чтение после
+        завершенной записи (add/update/batch...) не присоединяется к запросу, начатому
+        до нее: ключ объединения включает поколение записей, иначе повторное чтение
+        только что созданной сущности могло бы получить ответ без нее.
+
+        Args:
+            method: Название метода API (например, 'crm.contact.list')
+            params: Параметры запроса
+
+        Returns:
+            Ответ от API в виде словаря
+        """
+        if settings.BITRIX24_COALESCE_READS and method.endswith(COALESCED_METHOD_SUFFIXES):
+            return self._reads.do(
+                (self._write_generation, request_fingerprint(method, params)),
+                lambda: self._send(method, params),
+                label=method,
+            )
+        try:
+            return self._send(method, params)
+        finally:
+            self._write_generation = next(self._generations)
 
     @retry_on_network_error(
         max_attempts=settings.BITRIX24_RETRY_MAX_ATTEMPTS, delay=settings.BITRIX24_RETRY_DELAY
     )
-    def _make_request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def _send(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Выполнить запрос к Bitrix24 API
+        HTTP запрос к Bitrix24 API (с повторами при сетевых ошибках)
 
         Args:
             method: Название метода API (например, 'crm.contact.list')
@@ -37,18 +155,41 @@ class Bitrix24Client:
         """
         url = f"{self.base_url}{method}"
 
+        # Адаптивный лимит одновременных запросов: слоты выдаются по полосам
+        # приоритета (current_lane), лимит подстраивается по исходу и задержке.
+        # Токен частоты берется после слота, чтобы приоритет определял и порядок токенов.
+        # Служебные полосы (EXEMPT_LANES) общие лимиты не проходят
+        limited = current_lane.get() not in EXEMPT_LANES
+        if limited:
+            bitrix24_concurrency_limiter.acquire()
+        outcome = "error"
+        started = time.monotonic()
+
         try:
+            # Общий лимит частоты запросов для всех потоков
+            if limited:
+                bitrix24_rate_limiter.acquire()
+            record_bitrix_call(method)
+            started = time.monotonic()
+
             logger.debug(f"Bitrix24 API: {method} with params: {params}")
-            response = self.client.post(url, json=params or {})
+            response = self.client.post(
+                url, content=fastjson.dumps(params or {}), headers=JSON_HEADERS
+            )
+            if response.status_code in THROTTLE_STATUS_CODES:
+                outcome = "throttled"
             response.raise_for_status()
-            data = response.json()
+            data = fastjson.loads(response.content)
 
             if "error" in data:
+                if data["error"] in THROTTLE_ERRORS:
+                    outcome = "throttled"
                 error_msg = f"Bitrix24 API Error: {data.get('error_description', data['error'])}"
                 logger.error(error_msg)
                 raise Exception(error_msg)
 
             logger.debug(f"Bitrix24 API: {method} success")
+            outcome = "ok"
             return data
         except httpx.HTTPStatusError as e:
             error_msg = f"HTTP Error: {e.response.status_code} - {e.response.text}"
@@ -58,6 +199,33 @@ class Bitrix24Client:
             error_msg = f"Request failed: {str(e)}"
             logger.error(error_msg)
             raise Exception(error_msg)
+        finally:
+            if limited:
+                # batch сравнивается с baseline по задержке на одну команду
+                commands = len((params or {}).get("cmd") or {}) if method == "batch" else 1
+                bitrix24_concurrency_limiter.release(
+                    time.monotonic() - started, outcome, method, commands
+                )
+
+    def _write(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Запрос, изменяющий сущность: после него сбрасывается её запись в кеше прокси"""
+        try:
+            return self._make_request(method, params)
+        finally:
+            entity_cache.invalidate_command(method, params)
+
+    # ==================== SERVER ====================
+
+    def get_server_time(self) -> Dict[str, Any]:
+        """
+        Получить текущее время сервера Bitrix24
+
+        Самый легкий метод API - используется для проверки доступности.
+
+        Returns:
+            Ответ API с временем сервера
+        """
+        return self._make_request("server.time")
 
     # ==================== CONTACTS ====================
 
@@ -66,6 +234,7 @@ class Bitrix24Client:
         filter: Optional[Dict[str, Any]] = None,
         select: Optional[List[str]] = None,
         start: int = 0,
+        order: Optional[Dict[str, str]] = None,
     ) -> Dict[str, Any]:
         """
         Получить список контактов
@@ -74,6 +243,7 @@ class Bitrix24Client:
             filter: Фильтр (например, {'NAME': 'Иван'})
             select: Список полей для выборки
             start: Смещение для пагинации
+            order: Сортировка (например, {'ID': 'ASC'})
 
         Returns:
             Словарь с результатами
@@ -83,6 +253,8 @@ class Bitrix24Client:
             params["filter"] = filter
         if select:
             params["select"] = select
+        if order:
+            params["order"] = order
 
         return self._make_request("crm.contact.list", params)
 
@@ -109,7 +281,7 @@ class Bitrix24Client:
         Returns:
             ID созданного контакта
         """
-        params = {"fields": fields}
+        params = schema_registry.validate_command("crm.contact.add", {"fields": fields})
         return self._make_request("crm.contact.add", params)
 
     def update_contact(self, contact_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
@@ -123,8 +295,10 @@ class Bitrix24Client:
         Returns:
             Результат обновления
         """
-        params = {"id": contact_id, "fields": fields}
-        return self._make_request("crm.contact.update", params)
+        params = schema_registry.validate_command(
+            "crm.contact.update", {"id": contact_id, "fields": fields}
+        )
+        return self._write("crm.contact.update", params)
 
     def delete_contact(self, contact_id: int) -> Dict[str, Any]:
         """
@@ -137,7 +311,7 @@ class Bitrix24Client:
             Результат удаления
         """
         params = {"id": contact_id}
-        return self._make_request("crm.contact.delete", params)
+        return self._write("crm.contact.delete", params)
 
     # ==================== LEADS ====================
 
@@ -146,6 +320,7 @@ class Bitrix24Client:
         filter: Optional[Dict[str, Any]] = None,
         select: Optional[List[str]] = None,
         start: int = 0,
+        order: Optional[Dict[str, str]] = None,
     ) -> Dict[str, Any]:
         """
         Получить список лидов
@@ -154,6 +329,7 @@ class Bitrix24Client:
             filter: Фильтр
             select: Список полей для выборки
             start: Смещение для пагинации
+            order: Сортировка (например, {'ID': 'ASC'})
 
         Returns:
             Словарь с результатами
@@ -163,6 +339,8 @@ class Bitrix24Client:
             params["filter"] = filter
         if select:
             params["select"] = select
+        if order:
+            params["order"] = order
 
         return self._make_request("crm.lead.list", params)
 
@@ -204,7 +382,7 @@ class Bitrix24Client:
             Результат обновления
         """
         params = {"id": lead_id, "fields": fields}
-        return self._make_request("crm.lead.update", params)
+        return self._write("crm.lead.update", params)
 
     def delete_lead(self, lead_id: int) -> Dict[str, Any]:
         """
@@ -217,7 +395,7 @@ class Bitrix24Client:
             Результат удаления
         """
         params = {"id": lead_id}
-        return self._make_request("crm.lead.delete", params)
+        return self._write("crm.lead.delete", params)
 
     # ==================== DEALS ====================
 
@@ -226,6 +404,7 @@ class Bitrix24Client:
         filter: Optional[Dict[str, Any]] = None,
         select: Optional[List[str]] = None,
         start: int = 0,
+        order: Optional[Dict[str, str]] = None,
     ) -> Dict[str, Any]:
         """
         Получить список сделок
@@ -234,6 +413,7 @@ class Bitrix24Client:
             filter: Фильтр
             select: Список полей для выборки
             start: Смещение для пагинации
+            order: Сортировка (например, {'ID': 'ASC'})
 
         Returns:
             Словарь с результатами
@@ -243,6 +423,8 @@ class Bitrix24Client:
             params["filter"] = filter
         if select:
             params["select"] = select
+        if order:
+            params["order"] = order
 
         return self._make_request("crm.deal.list", params)
 
@@ -269,7 +451,7 @@ class Bitrix24Client:
         Returns:
             ID созданной сделки
         """
-        params = {"fields": fields}
+        params = schema_registry.validate_command("crm.deal.add", {"fields": fields})
         return self._make_request("crm.deal.add", params)
 
     def update_deal(self, deal_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
@@ -283,8 +465,10 @@ class Bitrix24Client:
         Returns:
             Результат обновления
         """
-        params = {"id": deal_id, "fields": fields}
-        return self._make_request("crm.deal.update", params)
+        params = schema_registry.validate_command(
+            "crm.deal.update", {"id": deal_id, "fields": fields}
+        )
+        return self._write("crm.deal.update", params)
 
     def delete_deal(self, deal_id: int) -> Dict[str, Any]:
         """
@@ -297,7 +481,7 @@ class Bitrix24Client:
             Результат удаления
         """
         params = {"id": deal_id}
-        return self._make_request("crm.deal.delete", params)
+        return self._write("crm.deal.delete", params)
 
     # ==================== UNIVERSAL LISTS ====================
 
@@ -343,6 +527,7 @@ class Bitrix24Client:
             "ELEMENT_CODE": fields.get("CODE"),
             "FIELDS": fields,
         }
+        params = schema_registry.validate_command("lists.element.add", params)
         return self._make_request("lists.element.add", params)
 
     def update_list_element(
@@ -365,11 +550,12 @@ class Bitrix24Client:
             "ELEMENT_ID": element_id,
             "FIELDS": fields,
         }
+        params = schema_registry.validate_command("lists.element.update", params)
         return self._make_request("lists.element.update", params)
 
     # ==================== BATCH OPERATIONS ====================
 
-    def batch(self, commands: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    def batch(self, commands: Dict[str, Dict[str, Any]], halt: bool = False) -> Dict[str, Any]:
         """
         Выполнить batch запрос к Bitrix24 API
 
@@ -381,6 +567,7 @@ class Bitrix24Client:
                     "cmd1": {"method": "crm.contact.get", "params": {"id": 1}},
                     "cmd2": {"method": "crm.deal.get", "params": {"id": 2}}
                 }
+            halt: Прерывать выполнение batch при первой ошибке
 
         Returns:
             Результаты всех команд
@@ -400,11 +587,22 @@ class Bitrix24Client:
             >>> contact = results["result"]["result"]["get_contact"]
             >>> deal = results["result"]["result"]["get_deal"]
         """
+        # Команды записи проверяются по схеме до отправки всего batch
+        commands = {
+            cmd_name: {
+                **cmd_data,
+                "params": schema_registry.validate_command(
+                    cmd_data["method"], cmd_data.get("params")
+                ),
+            }
+            for cmd_name, cmd_data in commands.items()
+        }
+
         if not settings.BATCH_ENABLED:
             logger.warning("Batch operations disabled, executing commands sequentially")
             results = {}
             for cmd_name, cmd_data in commands.items():
-                results[cmd_name] = self._make_request(cmd_data["method"], cmd_data.get("params"))
+                results[cmd_name] = self._write(cmd_data["method"], cmd_data.get("params"))
             return {"result": {"result": results}}
 
         if len(commands) > settings.BATCH_SIZE:
@@ -418,11 +616,88 @@ class Bitrix24Client:
 
             # Формируем строку вызова метода
             # Битрикс24 ожидает: "crm.contact.get?id=123"
-            param_str = "&".join([f"{k}={v}" for k, v in params.items()])
+            param_str = build_query(params or {})
             cmd_params[cmd_name] = f"{method}?{param_str}" if param_str else method
 
         logger.info(f"Batch request with {len(commands)} commands")
-        return self._make_request("batch", {"cmd": cmd_params})
+        try:
+            return self._make_request("batch", {"halt": 1 if halt else 0, "cmd": cmd_params})
+        finally:
+            for cmd_data in commands.values():
+                entity_cache.invalidate_command(cmd_data["method"], cmd_data.get("params"))
+
+    def call_batch(
+        self, commands: Dict[str, Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Выполнить произвольное количество команд, разбивая их на batch запросы
+
+        Команды делятся на чанки по BATCH_SIZE, ошибки отдельных команд
+        не прерывают выполнение остальных (halt=0).
+
+        Args:
+            commands: Словарь команд (формат как в batch)
+
+        Returns:
+            Tuple[results, errors]:
+                results - {cmd_name: значение поля "result" ответа метода}
+                errors - {cmd_name: описание ошибки}
+        """
+        results: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+
+        # Невалидные команды записи отклоняются локально, остальные выполняются
+        valid_commands = {}
+        for cmd_name, cmd_data in commands.items():
+            try:
+                params = schema_registry.validate_command(
+                    cmd_data["method"], cmd_data.get("params")
+                )
+            except SchemaValidationError as e:
+                errors[cmd_name] = str(e)
+                continue
+            valid_commands[cmd_name] = {**cmd_data, "params": params}
+        commands = valid_commands
+        names = list(commands.keys())
+
+        for offset in range(0, len(names), settings.BATCH_SIZE):
+            chunk = {name: commands[name] for name in names[offset : offset + settings.BATCH_SIZE]}
+
+            if not settings.BATCH_ENABLED:
+                for cmd_name, cmd_data in chunk.items():
+                    try:
+                        response = self._write(cmd_data["method"], cmd_data.get("params"))
+                        results[cmd_name] = response.get("result")
+                    except Exception as e:
+                        errors[cmd_name] = str(e)
+                continue
+
+            try:
+                response = self.batch(chunk)
+            except Exception as e:
+                # Весь чанк провален - помечаем ошибкой каждую команду
+                for cmd_name in chunk:
+                    errors[cmd_name] = str(e)
+                continue
+
+            batch_result = response.get("result") or {}
+            # Bitrix24 возвращает пустой список вместо пустого словаря
+            if isinstance(batch_result.get("result"), dict):
+                results.update(batch_result["result"])
+
+            batch_errors = batch_result.get("result_error")
+            if isinstance(batch_errors, dict):
+                for cmd_name, error in batch_errors.items():
+                    if isinstance(error, dict):
+                        error = error.get("error_description") or error.get("error")
+                    errors[cmd_name] = str(error)
+
+            # Команды без результата и без ошибки считаем проваленными
+            for cmd_name in chunk:
+                if cmd_name not in results and cmd_name not in errors:
+                    errors[cmd_name] = "Пустой ответ batch команды"
+
+        return results, errors
 
     def batch_get_educational_programs(self, program_names: List[str]) -> Dict[str, Dict[str, Any]]:
         """
@@ -443,7 +718,12 @@ class Bitrix24Client:
         for i, name in enumerate(program_names):
             commands[f"program_{i}"] = {
                 "method": "lists.element.get",
-                "params": {"IBLOCK_TYPE_ID": "lists", "IBLOCK_ID": "18", "FILTER": {"=NAME": name}},
+                "params": {
+                    "IBLOCK_TYPE_ID": "lists",
+                    "IBLOCK_ID": "18",
+                    "FILTER": {"=NAME": name},
+                    "SELECT": EDUCATIONAL_PROGRAM.select(),
+                },
             }
 
         result = self.batch(commands)
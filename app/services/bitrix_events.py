@@ -0,0 +1,152 @@
+"""
+Прием исходящих событий Bitrix24 (POST /bitrix24/events)
+
+Bitrix24 отправляет событие формой application/x-www-form-urlencoded:
+event=ONCRMDEALUPDATE, data[FIELDS][ID]=..., auth[application_token]=...
+Событие принимается только с application_token из BITRIX24_APPLICATION_TOKEN
+и точечно сбрасывает затронутые записи кешей и зеркал:
+- ONCRMCONTACTUPDATE / DELETE - кеш прокси и записи email -> ID контакта
+- ONCRMDEALUPDATE - кеш прокси сделки
+- ONCRMDEALDELETE - кеш прокси и записи индекса сделок
+- ONCRMLEADUPDATE / DELETE - кеш прокси лида
+- ONLISTSELEMENTUPDATE / DELETE - опросная форма (poll_id -> элемент) и
+  образовательная программа (название -> элемент) с ID элемента
+
+Обновление сделки индекс не меняет: пара (контакт, программа) у сделки почти не
+меняется, новые пары подхватывает сверка, а собственное обогащение сделок тоже
+возвращается событиями ONCRMDEALUPDATE.
+
+Неизвестные события подтверждаются без действий, чтобы Bitrix24 не повторял их.
+"""
+
+import hmac
+import logging
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qsl
+
+from app.config import settings
+from app.services.entity_cache import entity_cache
+from app.services.integration_service import integration_service
+from app.utils.cache import cache_manager
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_events = metrics.counter("bitrix_events_total", "Bitrix24 outbound events by outcome")
+
+# Событие -> (сущность, удаление)
+CRM_EVENTS = {
+    "ONCRMCONTACTUPDATE": ("contact", False),
+    "ONCRMCONTACTDELETE": ("contact", True),
+    "ONCRMDEALUPDATE": ("deal", False),
+    "ONCRMDEALDELETE": ("deal", True),
+    "ONCRMLEADUPDATE": ("lead", False),
+    "ONCRMLEADDELETE": ("lead", True),
+}
+
+LIST_EVENTS = {"ONLISTSELEMENTUPDATE", "ONLISTSELEMENTDELETE"}
+
+
+class EventRejected(Exception):
+    """Событие без верного application_token"""
+
+    pass
+
+
+def parse_event(body: bytes) -> Dict[str, str]:
+    """
+    Разбор тела события
+
+    Вложенные ключи остаются плоскими: data[FIELDS][ID], auth[application_token].
+    """
+    return dict(parse_qsl(body.decode("utf-8", errors="replace"), keep_blank_values=True))
+
+
+def _has_id(entity_id: int) -> Callable[[Any], bool]:
+    """Условие для invalidate_where: значение кеша - ID или элемент с этим ID"""
+
+    def matches(value: Any) -> bool:
+        if isinstance(value, dict):
+            value = value.get("ID")
+        try:
+            return int(value) == entity_id
+        except (TypeError, ValueError):
+            return False
+
+    return matches
+
+
+class BitrixEventHandler:
+    """
+    Инвалидация кешей по исходящим событиям Bitrix24
+    """
+
+    def verify(self, event: Dict[str, str]):
+        """
+        Проверить application_token события
+
+        Raises:
+            EventRejected: Токен не совпадает или прием событий не настроен
+        """
+        expected = settings.BITRIX24_APPLICATION_TOKEN
+        token = event.get("auth[application_token]", "")
+        if not expected:
+            _events.inc(event=event.get("event", ""), outcome="rejected")
+            raise EventRejected("Прием событий Bitrix24 не настроен")
+        if not hmac.compare_digest(token.encode(), expected.encode()):
+            _events.inc(event=event.get("event", ""), outcome="rejected")
+            logger.warning(f"🚫 Bitrix24 event {event.get('event')} with invalid token")
+            raise EventRejected("Неверный application_token")
+
+    def handle(self, event: Dict[str, str]) -> bool:
+        """
+        Применить проверенное событие
+
+        Args:
+            event: Разобранное тело события (parse_event)
+
+        Returns:
+            True если событие сбросило кеши, False если событие не обрабатывается
+        """
+        name = event.get("event", "").upper()
+        entity_id = self._entity_id(event)
+
+        if entity_id is None or (name not in CRM_EVENTS and name not in LIST_EVENTS):
+            _events.inc(event=name, outcome="ignored")
+            logger.debug(f"Bitrix24 event ignored: {name}")
+            return False
+
+        if name in CRM_EVENTS:
+            entity, deleted = CRM_EVENTS[name]
+            self._crm_changed(entity, entity_id, deleted)
+        else:
+            self._list_element_changed(entity_id)
+
+        _events.inc(event=name, outcome="applied")
+        logger.info(f"🔔 Bitrix24 event {name}: ID={entity_id}")
+        return True
+
+    @staticmethod
+    def _entity_id(event: Dict[str, str]) -> Optional[int]:
+        try:
+            return int(event.get("data[FIELDS][ID]", ""))
+        except ValueError:
+            return None
+
+    def _crm_changed(self, entity: str, entity_id: int, deleted: bool):
+        entity_cache.invalidate(entity, entity_id)
+
+        if entity == "contact":
+            # Кеш контактов по email: email мог измениться или контакт удален
+            cache_manager.invalidate_where("contact", _has_id(entity_id))
+        elif entity == "deal" and deleted and settings.DEAL_INDEX_ENABLED:
+            integration_service.deal_index.remove_deal(entity_id)
+
+    def _list_element_changed(self, element_id: int):
+        # ID элементов инфоблоков уникальны между списками: IBLOCK_ID не нужен
+        cache_manager.invalidate_where("poll_form", _has_id(element_id))
+        cache_manager.invalidate_where("educational_program", _has_id(element_id))
+
+
+# Глобальный обработчик событий
+bitrix_event_handler = BitrixEventHandler()
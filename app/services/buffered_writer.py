@@ -0,0 +1,202 @@
+"""
+Буферизованная запись append-only моделей в БД (write-behind)
+
+Запись каждой строки отдельной транзакцией (add + commit + refresh)
+упирается в round-trip до БД. BufferedWriter копит строки в памяти и
+записывает их фоновым потоком пачками одним многострочным INSERT:
+- по размеру пачки (batch_size)
+- по времени (flush_interval)
+- синхронно через flush() (тесты, остановка сервиса)
+
+Буфер ограничен (max_pending): при заполнении add() ждет освобождения
+места и выбрасывает BufferFullError по таймауту (backpressure).
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.log import Log
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_written = metrics.counter("buffered_writer_rows_written_total", "Rows flushed to the DB")
+_failed = metrics.counter("buffered_writer_flush_failures_total", "Failed batch writes")
+_dropped = metrics.counter(
+    "buffered_writer_rows_dropped_total", "Rows dropped after a failed write"
+)
+_pending = metrics.gauge("buffered_writer_pending_rows", "Rows waiting in the buffer")
+
+
+class BufferFullError(Exception):
+    """Буфер заполнен и не освободился за время ожидания"""
+
+    pass
+
+
+class BufferedWriter:
+    """
+    Фоновая пакетная запись строк одной модели
+    """
+
+    def __init__(
+        self,
+        model,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        session_factory: Callable = SessionLocal,
+    ):
+        """
+        Инициализация буфера
+
+        Args:
+            model: SQLAlchemy модель (append-only таблица)
+            batch_size: Строк в одном INSERT (по умолчанию BUFFERED_WRITER_BATCH_SIZE)
+            flush_interval: Максимальная задержка записи в секундах
+                            (по умолчанию BUFFERED_WRITER_FLUSH_INTERVAL)
+            max_pending: Максимум строк в буфере (по умолчанию BUFFERED_WRITER_MAX_PENDING)
+            session_factory: Фабрика синхронных сессий
+        """
+        self.model = model
+        self.name = model.__tablename__
+        self.batch_size = batch_size or settings.BUFFERED_WRITER_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.BUFFERED_WRITER_FLUSH_INTERVAL
+        self.max_pending = max_pending or settings.BUFFERED_WRITER_MAX_PENDING
+        self.session_factory = session_factory
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        # Сериализует запись: flush() из теста и фоновый поток не пишут одновременно
+        self._write_lock = threading.Lock()
+        self._stopping = False
+        self._last_flush_failed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, row: Dict[str, Any], timeout: Optional[float] = None):
+        """
+        Добавить строку в буфер
+
+        Args:
+            row: Значения колонок модели
+            timeout: Ожидание места в буфере в секундах
+                     (по умолчанию BUFFERED_WRITER_PUT_TIMEOUT)
+
+        Raises:
+            BufferFullError: Буфер не освободился за время ожидания
+        """
+        self._ensure_started()
+        timeout = settings.BUFFERED_WRITER_PUT_TIMEOUT if timeout is None else timeout
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._buffer) < self.max_pending, timeout):
+                raise BufferFullError(
+                    f"Buffer {self.name} is full ({self.max_pending} rows pending)"
+                )
+            self._buffer.append(row)
+            _pending.set(len(self._buffer), table=self.name)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def pending(self) -> int:
+        """Количество строк, ожидающих записи"""
+        return len(self._buffer)
+
+    def flush(self) -> int:
+        """
+        Синхронно записать все строки из буфера
+
+        Returns:
+            Количество записанных строк
+        """
+        with self._write_lock:
+            with self._cond:
+                rows, self._buffer = self._buffer, []
+                _pending.set(0, table=self.name)
+                # Освобождаем ожидающих add(): запись идет уже вне буфера
+                self._cond.notify_all()
+
+            written = 0
+            self._last_flush_failed = False
+            for offset in range(0, len(rows), self.batch_size):
+                batch = rows[offset : offset + self.batch_size]
+                try:
+                    self._write(batch)
+                    written += len(batch)
+                except Exception as e:
+                    _failed.inc(table=self.name)
+                    logger.error(f"❌ Buffered write to {self.name} failed: {e}")
+                    self._last_flush_failed = True
+                    self._requeue(rows[offset:])
+                    break
+
+            _written.inc(written, table=self.name)
+            return written
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        """Записать пачку одним многострочным INSERT"""
+        with self.session_factory() as db:
+            db.execute(insert(self.model), rows)
+            db.commit()
+
+    def _requeue(self, rows: List[Dict[str, Any]]):
+        """Вернуть незаписанные строки в начало буфера (сколько поместится)"""
+        with self._cond:
+            room = max(0, self.max_pending - len(self._buffer))
+            self._buffer[:0] = rows[:room]
+            _pending.set(len(self._buffer), table=self.name)
+        if len(rows) > room:
+            _dropped.inc(len(rows) - room, table=self.name)
+            logger.warning(f"Buffered writer {self.name}: dropped {len(rows) - room} rows")
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                if self._thread is None or not self._thread.is_alive():
+                    self.start()
+
+    def start(self):
+        """Запустить фоновую запись"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            while True:
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: len(self._buffer) >= self.batch_size or self._stopping,
+                        self.flush_interval,
+                    )
+                    stopping = self._stopping
+                self.flush()
+                if stopping:
+                    break
+                if self._last_flush_failed:
+                    # БД недоступна: не повторяем запись чаще, чем раз в flush_interval
+                    with self._cond:
+                        self._cond.wait_for(lambda: self._stopping, self.flush_interval)
+
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=run, name=f"buffered-writer-{self.name}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Остановить фоновую запись, предварительно записав буфер"""
+        if self._thread:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify_all()
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+
+# Глобальный буфер записи логов
+log_writer = BufferedWriter(Log)
@@ -0,0 +1,561 @@
+"""
+Сервис пакетной обработки ответов из опросных форм (POST /postAnswers)
+
+Используется для повторной загрузки (backfill) большого количества ответов.
+Ответы обрабатываются чанками, внутри чанка:
+1. Опросные формы ищутся один раз для каждого poll_id (с кешем)
+2. Образовательные программы ищутся один раз для каждого названия (batch)
+3. Контакты группируются по email: поиск и создание через batch
+4. Сделки группируются по (контакт, программа): поиск и создание через batch
+5. Обогащение всех сделок чанка одним набором batch запросов
+
+Результат для каждого ответа имеет тот же формат, что и process_webhook.
+
+process_ordered обрабатывает чанк в очереди email его ответов (app.utils.sharding):
+ответы одного абитуриента не обрабатываются параллельно с его же одиночными /postAnswer.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
+
+from app.config import settings
+from app.schemas.webhook import WebhookPayload
+from app.services.integration_service import BitrixIntegrationService, integration_service
+from app.services.projection import EDUCATIONAL_PROGRAM, ID_ONLY
+from app.services.webhook_audit import webhook_audit
+from app.utils.sharding import answer_shards
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+# Ключ сделки: (ID контакта, ID образовательной программы или None)
+DealKey = Tuple[int, Optional[int]]
+
+# Результат обработки ответа: словарь как у process_webhook или исключение
+AnswerResult = Union[Dict[str, Any], Exception]
+
+
+def normalize_email(email: Optional[str]) -> str:
+    """Нормализация email для группировки ответов одного контакта"""
+    return (email or "").strip().lower()
+
+
+class BulkAnswerService:
+    """
+    Пакетная обработка ответов с общими поисками и batch запросами к Bitrix24
+    """
+
+    GENERIC_DEAL_NAME = "Общая сделка"
+
+    def __init__(self, service: Optional[BitrixIntegrationService] = None):
+        """
+        Инициализация сервиса
+
+        Args:
+            service: Сервис интеграции (по умолчанию глобальный integration_service)
+        """
+        self.service = service or integration_service
+
+    @property
+    def client(self):
+        """Клиент Bitrix24 (общий с сервисом интеграции)"""
+        return self.service.client
+
+    # ==================== Main Flow ====================
+
+    def process_ordered(self, payloads: List[WebhookPayload]) -> List[AnswerResult]:
+        """
+        Обработать чанк в порядке очереди email его ответов (answer_shards)
+
+        Чанк ждет завершения более ранних ответов тех же абитуриентов, а одиночные
+        /postAnswer этих абитуриентов ждут чанк. Ответы других абитуриентов чанк
+        не задерживает; batch запросы внутри чанка сохраняются.
+
+        Args:
+            payloads: Список ответов (порядок сохраняется в результате)
+
+        Returns:
+            Список результатов той же длины (как process_chunk)
+        """
+        emails = [normalize_email(payload.data.email) for payload in payloads]
+        return answer_shards.call(emails, self.process_chunk, payloads)
+
+    def process_chunk(self, payloads: List[WebhookPayload]) -> List[AnswerResult]:
+        """
+        Обработать чанк ответов
+
+        Args:
+            payloads: Список ответов (порядок сохраняется в результате)
+
+        Returns:
+            Список результатов той же длины: словарь с результатом обработки
+            (формат process_webhook) или исключение для неуспешного ответа
+        """
+        logger.info(f"📦 Processing bulk chunk of {len(payloads)} answers")
+
+        results: List[Optional[AnswerResult]] = [None] * len(payloads)
+
+        # ========== ШАГ 1: Валидация ==========
+        pending = []
+        for index, payload in enumerate(payloads):
+            if not payload.data.email:
+                results[index] = Exception("Email обязателен для создания контакта")
+            else:
+                pending.append(index)
+
+        # ========== ШАГ 2: Опросные формы ==========
+        poll_forms: Dict[int, Any] = {}
+        for index in pending:
+            poll_id = payloads[index].header_data.poll_id
+            if poll_id in poll_forms:
+                continue
+            try:
+                poll_forms[poll_id] = self.service.find_poll_form(poll_id)
+            except Exception as e:
+                poll_forms[poll_id] = e
+
+        pending = self._reject(
+            pending, results, lambda i: poll_forms[payloads[i].header_data.poll_id]
+        )
+
+        # ========== ШАГ 3: Образовательные программы ==========
+        program_names = self._unique(
+            name for i in pending for name in (payloads[i].data.educational_program_1 or [])
+        )
+        programs = self._resolve_programs(program_names)
+
+        def programs_error(index: int) -> Optional[Exception]:
+            not_found = [
+                name
+                for name in self._unique(payloads[index].data.educational_program_1 or [])
+                if programs.get(name) is None
+            ]
+            if not_found:
+                return Exception(
+                    f"Образовательные программы не найдены в системе: {', '.join(not_found)}"
+                )
+            return None
+
+        pending = self._reject(pending, results, programs_error)
+        program_ids = {name: int(program["ID"]) for name, program in programs.items() if program}
+
+        # ========== ШАГ 4: Контакты (группировка по email) ==========
+        first_by_email: Dict[str, WebhookPayload] = {}
+        for index in pending:
+            email = normalize_email(payloads[index].data.email)
+            first_by_email.setdefault(email, payloads[index])
+
+        contacts = self._resolve_contacts(first_by_email)
+        pending = self._reject(
+            pending, results, lambda i: contacts[normalize_email(payloads[i].data.email)]
+        )
+
+        # ========== ШАГ 5: Сделки (группировка по контакту и программе) ==========
+        answer_deals: Dict[int, List[Tuple[str, DealKey]]] = {}
+        deal_titles: Dict[DealKey, Any] = {}
+        for index in pending:
+            payload = payloads[index]
+            contact_id = contacts[normalize_email(payload.data.email)]
+            poll_form_id = poll_forms[payload.header_data.poll_id].get("ID")
+
+            names = self._unique(payload.data.educational_program_1 or [])
+            keys: List[Tuple[str, DealKey]]
+            if names:
+                keys = [(name, (contact_id, program_ids[name])) for name in names]
+            else:
+                keys = [(self.GENERIC_DEAL_NAME, (contact_id, None))]
+
+            answer_deals[index] = keys
+            for _, key in keys:
+                deal_titles.setdefault(key, poll_form_id)
+
+        deals = self._resolve_deals(deal_titles)
+
+        def deals_error(index: int) -> Optional[Exception]:
+            for _, key in answer_deals[index]:
+                deal = deals[key]
+                if isinstance(deal, Exception):
+                    return deal
+            return None
+
+        pending = self._reject(pending, results, deals_error)
+
+        # ========== ШАГ 6: Обогащение сделок ==========
+        enrich_errors = self._enrich_deals(payloads, pending, answer_deals, deals, deal_titles)
+        pending = self._reject(pending, results, lambda i: enrich_errors.get(i))
+
+        # ========== ЗАВЕРШЕНИЕ ==========
+        for index in pending:
+            payload = payloads[index]
+            deal_results = []
+            for program_name, key in answer_deals[index]:
+                deal_id, is_new = deals[key]
+                deal_results.append(
+                    {
+                        "program_name": program_name,
+                        "program_id": key[1],
+                        "deal_id": deal_id,
+                        "is_new": is_new,
+                    }
+                )
+
+            results[index] = {
+                "poll_id": payload.header_data.poll_id,
+                "answer_id": payload.header_data.answer_id,
+                "poll_form_id": poll_forms[payload.header_data.poll_id].get("ID"),
+                "contact_id": contacts[normalize_email(payload.data.email)],
+                "deals": deal_results,
+                "total_deals": len(deal_results),
+            }
+
+        for payload, result in zip(payloads, results):
+            if isinstance(result, Exception):
+                webhook_audit.record(payload, error=result, source="bulk")
+            else:
+                webhook_audit.record(payload, result=result, source="bulk")
+
+        failed = sum(1 for result in results if isinstance(result, Exception))
+        logger.info(f"✅ Bulk chunk processed: {len(payloads) - failed} ok, {failed} failed")
+
+        # Все ответы получили результат или ошибку
+        return cast(List[AnswerResult], results)
+
+    # ==================== Lookups ====================
+
+    def _resolve_programs(self, program_names: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Поиск образовательных программ по названиям (кеш + batch)
+
+        Returns:
+            Словарь {название: {"ID", "NAME"} или None если не найдена}
+        """
+        programs: Dict[str, Optional[Dict[str, Any]]] = {}
+        to_search = []
+
+        for name in program_names:
+            cached = (
+                self.service.cache.get("educational_program", name)
+                if settings.CACHE_ENABLED
+                else None
+            )
+            if cached:
+                programs[name] = cached
+            else:
+                to_search.append(name)
+
+        if not to_search:
+            return programs
+
+        commands = {
+            f"program_{n}": {
+                "method": "lists.element.get",
+                "params": {
+                    "IBLOCK_TYPE_ID": "lists",
+                    "IBLOCK_ID": self.service.EDUCATIONAL_PROGRAMS_LIST_ID,
+                    "FILTER": {"NAME": name},
+                    "SELECT": EDUCATIONAL_PROGRAM.select(),
+                },
+            }
+            for n, name in enumerate(to_search)
+        }
+        found, errors = self.client.call_batch(commands)
+
+        for n, name in enumerate(to_search):
+            elements = found.get(f"program_{n}")
+            if not elements:
+                if f"program_{n}" in errors:
+                    logger.error(f"Error searching for program '{name}': {errors[f'program_{n}']}")
+                programs[name] = None
+                continue
+
+            program_data = EDUCATIONAL_PROGRAM.apply(elements[0])
+            programs[name] = program_data
+
+            if settings.CACHE_ENABLED:
+                self.service.cache.set(
+                    "educational_program",
+                    name,
+                    program_data,
+                    ttl=settings.CACHE_TTL_EDUCATIONAL_PROGRAMS,
+                )
+
+        return programs
+
+    def _resolve_contacts(self, first_by_email: Dict[str, WebhookPayload]) -> Dict[str, Any]:
+        """
+        Поиск/создание контактов по email через batch
+
+        Args:
+            first_by_email: {нормализованный email: первый ответ с этим email}
+
+        Returns:
+            Словарь {нормализованный email: ID контакта или исключение}
+        """
+        contacts: Dict[str, Any] = {}
+        emails = []
+
+        for email in first_by_email:
+            cached = self.service.cache.get("contact", email) if settings.CACHE_ENABLED else None
+            if cached:
+                contacts[email] = cached
+            else:
+                emails.append(email)
+
+        if not emails:
+            return contacts
+
+        # Поиск существующих контактов
+        search_commands = {
+            f"contact_{n}": {
+                "method": "crm.contact.list",
+                "params": {
+                    "filter": {"EMAIL": first_by_email[email].data.email},
+                    "select": ID_ONLY.select(),
+                },
+            }
+            for n, email in enumerate(emails)
+        }
+        found, errors = self.client.call_batch(search_commands)
+
+        create_commands = {}
+        for n, email in enumerate(emails):
+            items = found.get(f"contact_{n}")
+            if items:
+                contacts[email] = int(items[0]["ID"])
+                continue
+
+            if f"contact_{n}" in errors:
+                logger.warning(f"Error searching for contact {email}: {errors[f'contact_{n}']}")
+
+            payload = first_by_email[email]
+            create_commands[f"contact_{n}"] = {
+                "method": "crm.contact.add",
+                "params": {
+                    "fields": self.service._build_contact_fields(
+                        email=payload.data.email or email,
+                        firstname=payload.data.firstname,
+                        lastname=payload.data.lastname,
+                        middlename=payload.data.middlename,
+                        phone=payload.data.telephone,
+                        analytics=payload.header_data.analytics,
+                    )
+                },
+            }
+
+        # Создание недостающих контактов
+        if create_commands:
+            logger.info(f"Creating {len(create_commands)} contacts via batch")
+            created, errors = self.client.call_batch(create_commands)
+
+            for n, email in enumerate(emails):
+                cmd_name = f"contact_{n}"
+                if cmd_name not in create_commands:
+                    continue
+                if created.get(cmd_name):
+                    contacts[email] = int(created[cmd_name])
+                else:
+                    contacts[email] = Exception(
+                        f"Не удалось создать контакт: {errors.get(cmd_name, 'пустой ответ')}"
+                    )
+
+        if settings.CACHE_ENABLED:
+            for email in emails:
+                if not isinstance(contacts[email], Exception):
+                    self.service.cache.set(
+                        "contact", email, contacts[email], ttl=settings.CACHE_TTL_CONTACTS
+                    )
+
+        return contacts
+
+    def _resolve_deals(self, deal_titles: Dict[DealKey, Any]) -> Dict[DealKey, Any]:
+        """
+        Поиск/создание сделок по (контакт, программа) через batch
+
+        Args:
+            deal_titles: {(contact_id, program_id): ID опросной формы для названия сделки}
+
+        Returns:
+            Словарь {(contact_id, program_id): (deal_id, is_new) или исключение}
+        """
+        deals: Dict[DealKey, Any] = {}
+        keys = []
+        program_field = self.service.DEAL_EDUCATIONAL_PROGRAM_FIELD
+
+        # Сделки из локального индекса не требуют поиска в Bitrix24
+        for key in deal_titles:
+            deal_id = self.service.deal_index.get(*key) if settings.DEAL_INDEX_ENABLED else None
+            if deal_id is not None:
+                deals[key] = (deal_id, False)
+            else:
+                keys.append(key)
+
+        if not keys:
+            return deals
+
+        search_commands = {}
+        for n, (contact_id, program_id) in enumerate(keys):
+            filter_params: Dict[str, Any] = {"CONTACT_ID": contact_id}
+            if program_id:
+                filter_params[program_field] = program_id
+            search_commands[f"deal_{n}"] = {
+                "method": "crm.deal.list",
+                "params": {"filter": filter_params, "select": ID_ONLY.select()},
+            }
+
+        found, errors = self.client.call_batch(search_commands)
+
+        create_commands = {}
+        for n, key in enumerate(keys):
+            items = found.get(f"deal_{n}")
+            if items:
+                deals[key] = (int(items[0]["ID"]), False)
+                continue
+
+            if f"deal_{n}" in errors:
+                logger.warning(f"Error searching for deal {key}: {errors[f'deal_{n}']}")
+
+            contact_id, program_id = key
+            create_commands[f"deal_{n}"] = {
+                "method": "crm.deal.add",
+                "params": {
+                    "fields": self.service._build_deal_fields(
+                        contact_id, program_id, deal_titles[key]
+                    )
+                },
+            }
+
+        if create_commands:
+            logger.info(f"Creating {len(create_commands)} deals via batch")
+            created, errors = self.client.call_batch(create_commands)
+
+            for n, key in enumerate(keys):
+                cmd_name = f"deal_{n}"
+                if cmd_name not in create_commands:
+                    continue
+                if created.get(cmd_name):
+                    deals[key] = (int(created[cmd_name]), True)
+                else:
+                    deals[key] = Exception(
+                        f"Не удалось создать сделку: {errors.get(cmd_name, 'пустой ответ')}"
+                    )
+
+        if settings.DEAL_INDEX_ENABLED:
+            self.service.deal_index.put_many(
+                ((key[0], key[1] or 0), deals[key][0])
+                for key in keys
+                if not isinstance(deals[key], Exception)
+            )
+
+        return deals
+
+    def _enrich_deals(
+        self,
+        payloads: List[WebhookPayload],
+        pending: List[int],
+        answer_deals: Dict[int, List[Tuple[str, DealKey]]],
+        deals: Dict[DealKey, Any],
+        deal_titles: Dict[DealKey, Any],
+    ) -> Dict[int, Exception]:
+        """
+        Обогащение сделок всех ответов чанка через batch
+
+        Команды выполняются в порядке ответов, поэтому при повторе ответов
+        одного контакта последним применяется более поздний ответ.
+
+        Сделка из локального индекса могла быть удалена в Bitrix24: после ошибки
+        обогащения найденной (не созданной в этом чанке) сделки ответ повторяется
+        по одному через find_and_enrich_deal - с поиском/созданием в Bitrix24,
+        замена записывается в deals.
+
+        Returns:
+            Словарь {индекс ответа: исключение} для ответов с ошибкой обогащения
+        """
+        commands: Dict[str, Dict[str, Any]] = {}
+        owners: Dict[str, Tuple[int, DealKey, bool]] = {}
+        answers = {}
+
+        for index in pending:
+            payload = payloads[index]
+            # Поля обогащения общие для всех сделок ответа
+            answers[index] = self.service.extract_answer(payload)
+
+            for n, (_, key) in enumerate(answer_deals[index]):
+                cmd_name = f"enrich_{index}_{n}"
+                commands[cmd_name] = {
+                    "method": "crm.deal.update",
+                    "params": {"id": deals[key][0], "fields": answers[index].enrich_fields},
+                }
+                owners[cmd_name] = (index, key, deals[key][1])
+
+        if not commands:
+            return {}
+
+        _, errors = self.client.call_batch(commands)
+
+        failed: Dict[int, Exception] = {}
+        # В порядке команд: повторы применяются в том же порядке ответов
+        for cmd_name in [name for name in commands if name in errors]:
+            deal_id = commands[cmd_name]["params"]["id"]
+            # Сделка могла быть удалена - следующий поиск пойдет в Bitrix24
+            self.service.deal_index.remove_deal(deal_id)
+
+            index, key, is_new = owners[cmd_name]
+            if index in failed:
+                continue
+            error: Exception = Exception(f"Не удалось обогатить сделку: {errors[cmd_name]}")
+
+            if settings.DEAL_INDEX_ENABLED and not is_new:
+                logger.warning(
+                    f"⚠️ Existing deal {deal_id} enrichment failed, searching again: {error}"
+                )
+                try:
+                    found = self.service.find_and_enrich_deal(
+                        contact_id=key[0],
+                        program_id=key[1],
+                        poll_form_id=deal_titles[key],
+                        payload=payloads[index],
+                        answer=answers[index],
+                    )
+                    # Другие ответы с этой сделкой находят замену в индексе
+                    if found[0] != deals[key][0]:
+                        deals[key] = found
+                    continue
+                except Exception as e:
+                    error = e
+
+            failed[index] = error
+
+        return failed
+
+    # ==================== Helpers ====================
+
+    @staticmethod
+    def _unique(values) -> List[Any]:
+        """Уникальные значения с сохранением порядка"""
+        return list(dict.fromkeys(values))
+
+    @staticmethod
+    def _reject(pending: List[int], results: List[Any], get_error) -> List[int]:
+        """
+        Отсеять ответы с ошибкой
+
+        Args:
+            pending: Индексы ответов, которые ещё обрабатываются
+            results: Список результатов (заполняется исключениями)
+            get_error: Функция index -> значение; исключение означает ошибку
+
+        Returns:
+            Индексы ответов без ошибок
+        """
+        remaining = []
+        for index in pending:
+            error = get_error(index)
+            if isinstance(error, Exception):
+                results[index] = error
+            else:
+                remaining.append(index)
+        return remaining
+
+
+# Создаем глобальный экземпляр сервиса
+bulk_answer_service = BulkAnswerService()
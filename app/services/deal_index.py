@@ -0,0 +1,272 @@
+"""
+Локальный индекс сделок по (контакт, образовательная программа)
+
+Поиск сделки через crm.deal.list с фильтром по пользовательскому полю
+программы медленный на большой таблице сделок. Индекс хранит соответствие
+(CONTACT_ID, программа) -> ID сделки:
+- в памяти процесса
+- опционально в таблице deal_index (DEAL_INDEX_PERSIST=True), общей для всех воркеров
+
+Индекс заполняется при поиске/создании сделок и периодически сверяется
+с Bitrix24 постраничным обходом crm.deal.list по курсору DATE_MODIFY.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import SessionLocal, utcnow
+from app.models.deal_index import DealIndexEntry
+from app.utils.lanes import Lane, bitrix_lane
+
+logger = logging.getLogger(__name__)
+
+# Ключ индекса: (ID контакта, ID программы; 0 - сделка без программы)
+IndexKey = Tuple[int, int]
+
+
+class DealIndex:
+    """
+    Индекс сделок (контакт, программа) -> сделка
+    """
+
+    def __init__(self, client, program_field: str, persist: Optional[bool] = None):
+        """
+        Инициализация индекса
+
+        Args:
+            client: Клиент Bitrix24 (для сверки)
+            program_field: Код пользовательского поля сделки с образовательной программой
+            persist: Сохранять индекс в БД (по умолчанию settings.DEAL_INDEX_PERSIST)
+        """
+        self.client = client
+        self.program_field = program_field
+        self.persist = settings.DEAL_INDEX_PERSIST if persist is None else persist
+
+        self._entries: Dict[IndexKey, int] = {}
+        self._lock = threading.Lock()
+
+        # Курсор сверки: максимальный DATE_MODIFY из уже обработанных сделок
+        self.cursor: Optional[str] = None
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key(contact_id: int, program_id: Optional[int]) -> IndexKey:
+        return int(contact_id), int(program_id or 0)
+
+    # ==================== Lookup / Update ====================
+
+    def get(self, contact_id: int, program_id: Optional[int] = None) -> Optional[int]:
+        """
+        Найти сделку в индексе
+
+        Args:
+            contact_id: ID контакта
+            program_id: ID образовательной программы
+
+        Returns:
+            ID сделки или None если сделки нет в индексе
+        """
+        key = self._key(contact_id, program_id)
+
+        with self._lock:
+            deal_id = self._entries.get(key)
+        if deal_id is not None or not self.persist:
+            return deal_id
+
+        try:
+            with SessionLocal() as db:
+                deal_id = db.execute(
+                    select(DealIndexEntry.deal_id).where(
+                        DealIndexEntry.contact_id == key[0], DealIndexEntry.program_id == key[1]
+                    )
+                ).scalar_one_or_none()
+        except Exception as e:
+            logger.warning(f"Deal index DB lookup failed: {e}")
+            return None
+
+        if deal_id is not None:
+            with self._lock:
+                self._entries[key] = deal_id
+        return deal_id
+
+    def put(self, contact_id: int, program_id: Optional[int], deal_id: int):
+        """
+        Сохранить сделку в индекс
+
+        Args:
+            contact_id: ID контакта
+            program_id: ID образовательной программы
+            deal_id: ID сделки
+        """
+        self.put_many([(self._key(contact_id, program_id), int(deal_id))])
+
+    def put_many(self, items: Iterable[Tuple[IndexKey, int]]):
+        """Сохранить несколько записей индекса"""
+        items = list(items)
+        if not items:
+            return
+
+        with self._lock:
+            self._entries.update(items)
+
+        if self.persist:
+            try:
+                with SessionLocal() as db:
+                    for (contact_id, program_id), deal_id in items:
+                        db.merge(
+                            DealIndexEntry(
+                                contact_id=contact_id,
+                                program_id=program_id,
+                                deal_id=deal_id,
+                                updated_at=utcnow(),
+                            )
+                        )
+                    db.commit()
+            except Exception as e:
+                logger.warning(f"Deal index DB write failed: {e}")
+
+    def remove_deal(self, deal_id: int) -> int:
+        """
+        Удалить все записи индекса, указывающие на сделку
+
+        Args:
+            deal_id: ID сделки
+
+        Returns:
+            Количество удаленных записей в памяти
+        """
+        deal_id = int(deal_id)
+        with self._lock:
+            keys = [key for key, value in self._entries.items() if value == deal_id]
+            for key in keys:
+                del self._entries[key]
+
+        if self.persist:
+            try:
+                with SessionLocal() as db:
+                    db.query(DealIndexEntry).filter(DealIndexEntry.deal_id == deal_id).delete()
+                    db.commit()
+            except Exception as e:
+                logger.warning(f"Deal index DB delete failed: {e}")
+
+        if keys:
+            logger.info(f"Deal index: removed {len(keys)} entries for deal {deal_id}")
+        return len(keys)
+
+    def clear(self):
+        """Очистить индекс в памяти"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ==================== Reconciliation ====================
+
+    def _program_ids(self, value: Any) -> List[int]:
+        """Значение поля программы сделки -> список ID программ (0 - без программы)"""
+        values = value if isinstance(value, list) else [value]
+        program_ids = [int(v) for v in values if v not in (None, "", "0", 0)]
+        return program_ids or [0]
+
+    def reconcile(self, max_pages: Optional[int] = None) -> int:
+        """
+        Сверка индекса с Bitrix24
+
+        Постранично обходит сделки, измененные после курсора (DATE_MODIFY),
+        и добавляет их в индекс. Существующие записи не перезаписываются:
+        поиск по индексу должен возвращать ту же сделку, что и раньше.
+
+        Args:
+            max_pages: Максимум страниц за один вызов (None - до конца)
+
+        Returns:
+            Количество обработанных сделок
+        """
+        if self.cursor is None:
+            since = datetime.now(timezone.utc) - timedelta(days=settings.DEAL_INDEX_BOOTSTRAP_DAYS)
+            self.cursor = since.isoformat()
+
+        processed = 0
+        pages = 0
+        start = 0
+
+        while max_pages is None or pages < max_pages:
+            result = self.client.get_deals(
+                filter={">=DATE_MODIFY": self.cursor},
+                select=["ID", "CONTACT_ID", "DATE_MODIFY", self.program_field],
+                order={"DATE_MODIFY": "ASC", "ID": "ASC"},
+                start=start,
+            )
+            deals = result.get("result") or []
+            pages += 1
+
+            new_items = []
+            for deal in deals:
+                if not deal.get("CONTACT_ID"):
+                    continue
+                for program_id in self._program_ids(deal.get(self.program_field)):
+                    key = (int(deal["CONTACT_ID"]), program_id)
+                    if key not in self._entries:
+                        new_items.append((key, int(deal["ID"])))
+
+            self.put_many(new_items)
+            processed += len(deals)
+
+            if deals and deals[-1].get("DATE_MODIFY"):
+                last_modified = deals[-1]["DATE_MODIFY"]
+            else:
+                last_modified = None
+
+            if "next" not in result:
+                # Последняя страница: сдвигаем курсор на последнюю измененную сделку
+                if last_modified:
+                    self.cursor = last_modified
+                break
+
+            start = result["next"]
+
+        logger.info(
+            f"Deal index reconciled: {processed} deals, {len(self)} entries, cursor={self.cursor}"
+        )
+        return processed
+
+    def start(self, interval: Optional[float] = None):
+        """
+        Запустить периодическую сверку в фоновом потоке
+
+        Args:
+            interval: Интервал между сверками в секундах
+                      (по умолчанию settings.DEAL_INDEX_RECONCILE_INTERVAL)
+        """
+        interval = interval or settings.DEAL_INDEX_RECONCILE_INTERVAL
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    with bitrix_lane(Lane.BACKGROUND):
+                        self.reconcile()
+                except Exception as e:
+                    logger.error(f"Deal index reconcile failed: {e}")
+                self._stop_event.wait(interval)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=run, name="deal-index-reconciler", daemon=True)
+        self._thread.start()
+        logger.info(f"Deal index reconciler started (interval={interval}s)")
+
+    def stop(self):
+        """Остановить фоновую сверку"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
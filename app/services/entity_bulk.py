@@ -0,0 +1,102 @@
+"""
+Пакетные операции над контактами, сделками и лидами (/bitrix24/{entity}/bulk)
+
+Операции превращаются в команды crm.{entity}.add / update / delete и
+выполняются через call_batch: чанки по BATCH_SIZE команд, общий rate limiter,
+ошибка одной команды не прерывает остальные. Результат возвращается для
+каждой операции в исходном порядке.
+"""
+
+import logging
+from typing import Any, Dict, List
+
+from app.schemas.bitrix import BitrixBulkItemResult, BitrixBulkOperation, BitrixBulkResponse
+from app.services.bitrix24_client import bitrix24_client
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Сущность в пути эндпоинта -> префикс методов Bitrix24
+BULK_ENTITIES = {"contacts": "crm.contact", "deals": "crm.deal", "leads": "crm.lead"}
+
+# Операция -> метод Bitrix24
+BULK_ACTIONS = {"create": "add", "update": "update", "delete": "delete"}
+
+_operations = metrics.counter(
+    "bitrix_bulk_operations_total", "Bulk proxy operations by entity, action and outcome"
+)
+
+
+def build_command(entity: str, operation: BitrixBulkOperation) -> Dict[str, Any]:
+    """
+    Команда batch для операции
+
+    Args:
+        entity: Сущность (contacts, deals, leads)
+        operation: Операция
+
+    Returns:
+        {"method": ..., "params": ...}
+    """
+    params: Dict[str, Any] = {}
+    if operation.id is not None:
+        params["id"] = operation.id
+    if operation.action != "delete":
+        params["fields"] = operation.fields
+
+    return {
+        "method": f"{BULK_ENTITIES[entity]}.{BULK_ACTIONS[operation.action]}",
+        "params": params,
+    }
+
+
+def run_bulk(entity: str, operations: List[BitrixBulkOperation]) -> BitrixBulkResponse:
+    """
+    Выполнить пакет операций через batch запросы
+
+    Args:
+        entity: Сущность (contacts, deals, leads)
+        operations: Операции
+
+    Returns:
+        BitrixBulkResponse с результатом каждой операции
+    """
+    commands = {f"op_{index}": build_command(entity, op) for index, op in enumerate(operations)}
+    logger.info(f"📦 Bulk {entity}: {len(commands)} operations")
+
+    results, errors = bitrix24_client.call_batch(commands)
+
+    items = []
+    for index, operation in enumerate(operations):
+        cmd_name = f"op_{index}"
+        error = errors.get(cmd_name)
+        result = results.get(cmd_name)
+
+        entity_id = operation.id
+        if operation.action == "create" and result is not None:
+            entity_id = int(result)
+
+        items.append(
+            BitrixBulkItemResult(
+                index=index,
+                action=operation.action,
+                id=entity_id,
+                success=error is None,
+                result=result,
+                error=error,
+            )
+        )
+        _operations.inc(
+            entity=entity, action=operation.action, status="error" if error else "success"
+        )
+
+    failed = sum(1 for item in items if not item.success)
+    if failed:
+        logger.warning(f"⚠️ Bulk {entity}: {failed} of {len(items)} operations failed")
+
+    return BitrixBulkResponse(
+        total=len(items),
+        succeeded=len(items) - failed,
+        failed=failed,
+        results=items,
+    )
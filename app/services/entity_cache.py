@@ -0,0 +1,130 @@
+"""
+Кеш сущностей для прокси эндпоинтов GET /bitrix24/{contacts|deals|leads}/{id}
+
+- Read-through: промах читает сущность из Bitrix24 и сохраняет уже
+  сериализованный ответ (тело + ETag) на PROXY_CACHE_TTL_* секунд
+- Попадание отдает готовые байты без запроса к Bitrix24
+- ETag / If-None-Match: совпадение дает 304 без тела
+- Заголовок X-Cache: HIT, MISS или BYPASS (запрос с Cache-Control: no-cache
+  или кеш отключен)
+- Запись через клиент (crm.*.update / crm.*.delete, в том числе в batch)
+  инвалидирует запись сущности
+"""
+
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.utils import fastjson
+from app.utils.cache import cache_manager
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Сущность -> префикс методов Bitrix24
+ENTITY_METHODS = {"contact": "crm.contact", "deal": "crm.deal", "lead": "crm.lead"}
+
+# Методы записи -> сущность, запись которой нужно сбросить
+INVALIDATING_METHODS = {
+    f"{prefix}.{action}": entity
+    for entity, prefix in ENTITY_METHODS.items()
+    for action in ("update", "delete")
+}
+
+_requests = metrics.counter("proxy_cache_requests_total", "Proxy entity cache lookups by result")
+
+# Запись кеша: (тело ответа, ETag)
+Entry = Tuple[bytes, str]
+
+
+def _category(entity: str) -> str:
+    return f"proxy_{entity}"
+
+
+def _ttl(entity: str) -> int:
+    return {
+        "contact": settings.PROXY_CACHE_TTL_CONTACTS,
+        "deal": settings.PROXY_CACHE_TTL_DEALS,
+        "lead": settings.PROXY_CACHE_TTL_LEADS,
+    }[entity]
+
+
+def _make_entry(data: Any) -> Entry:
+    body = fastjson.dumps(data)
+    return body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Сравнение ETag с If-None-Match (список тегов, слабые теги W/, *)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class EntityCache:
+    """
+    Кеш сериализованных ответов прокси по (сущность, ID)
+    """
+
+    def respond(
+        self, entity: str, entity_id: int, request: Request, fetch: Callable[[], Any]
+    ) -> Response:
+        """
+        Ответ GET эндпоинта: из кеша или из Bitrix24 с сохранением в кеш
+
+        Args:
+            entity: Сущность (contact, deal, lead)
+            entity_id: ID сущности
+            request: Входящий запрос (If-None-Match, Cache-Control)
+            fetch: Получение сущности из Bitrix24 (вызывается при промахе)
+
+        Returns:
+            200 с телом или 304 при совпадении If-None-Match
+        """
+        bypass = (
+            not settings.PROXY_CACHE_ENABLED
+            or "no-cache" in request.headers.get("cache-control", "").lower()
+        )
+        category = _category(entity)
+
+        entry = None if bypass else cache_manager.get(category, str(entity_id))
+        if entry is not None:
+            cache_status = "HIT"
+        else:
+            entry = _make_entry(fetch())
+            cache_status = "BYPASS" if bypass else "MISS"
+            if settings.PROXY_CACHE_ENABLED:
+                cache_manager.set(category, str(entity_id), entry, ttl=_ttl(entity))
+
+        _requests.inc(entity=entity, status=cache_status.lower())
+        body, etag = entry
+        headers = {"ETag": etag, "X-Cache": cache_status, "Cache-Control": "private, no-cache"}
+
+        if _etag_matches(etag, request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def invalidate(self, entity: str, entity_id: Any):
+        """Сбросить закешированную сущность"""
+        cache_manager.invalidate(_category(entity), str(entity_id))
+
+    def invalidate_command(self, method: str, params: Optional[Dict[str, Any]]):
+        """
+        Сбросить запись сущности, которую изменяет команда
+
+        Args:
+            method: Метод API (crm.deal.update, crm.contact.delete, ...)
+            params: Параметры метода (id сущности)
+        """
+        entity = INVALIDATING_METHODS.get(method)
+        if entity is not None and params and params.get("id") is not None:
+            self.invalidate(entity, params["id"])
+
+
+# Глобальный кеш сущностей прокси
+entity_cache = EntityCache()
@@ -0,0 +1,139 @@
+"""
+Потоковая выгрузка контактов, сделок и лидов (/bitrix24/{entity}/export)
+
+- Keyset пагинация по ID: filter >ID последней сущности, order ID ASC и
+  start=-1 (Bitrix24 не считает total, глубина выгрузки не замедляет запрос)
+- Узкий select: только нужные поля (ID добавляется всегда)
+- Read-ahead: следующая страница запрашивается в фоне, пока текущая
+  кодируется и отдается клиенту
+- Поток NDJSON: сущности по строке, после каждой страницы строка курсора
+  {"_cursor": ID}; выгрузку можно продолжить с ?cursor=ID. Последняя строка
+  содержит "_complete": true, при ошибке Bitrix24 - "_error"
+
+В памяти держится не больше двух страниц независимо от размера выгрузки.
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config import settings
+from app.services.bitrix24_client import bitrix24_client
+from app.utils import fastjson
+from app.utils.lanes import Lane, bitrix_lane
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Размер страницы list методов Bitrix24
+PAGE_SIZE = 50
+
+# Сущность в пути эндпоинта -> метод клиента для list запроса
+EXPORT_METHODS = {"contacts": "get_contacts", "deals": "get_deals", "leads": "get_leads"}
+
+# Поля выгрузки по умолчанию
+DEFAULT_SELECT = {
+    "contacts": ["ID", "NAME", "LAST_NAME", "SECOND_NAME", "EMAIL", "PHONE", "DATE_MODIFY"],
+    "deals": ["ID", "TITLE", "STAGE_ID", "CONTACT_ID", "OPPORTUNITY", "DATE_MODIFY"],
+    "leads": ["ID", "TITLE", "STATUS_ID", "NAME", "LAST_NAME", "DATE_MODIFY"],
+}
+
+_exported = metrics.counter("bitrix_export_entities_total", "Entities streamed by /export")
+
+
+def export_select(entity: str, fields: Optional[List[str]] = None) -> List[str]:
+    """
+    Список полей выгрузки: запрошенные или по умолчанию, ID всегда первым
+
+    Args:
+        entity: Сущность (contacts, deals, leads)
+        fields: Запрошенные поля
+
+    Returns:
+        select для list запроса
+    """
+    select = fields or DEFAULT_SELECT[entity]
+    return ["ID"] + [field for field in select if field != "ID"]
+
+
+def _fetch_page(
+    entity: str, filter: Dict[str, Any], select: List[str], after_id: int
+) -> List[Dict[str, Any]]:
+    """Страница сущностей с ID больше after_id (в том числе в потоке read-ahead)"""
+    method = getattr(bitrix24_client, EXPORT_METHODS[entity])
+    with bitrix_lane(Lane.BACKGROUND):
+        result = method(
+            filter={**filter, ">ID": after_id}, select=select, order={"ID": "ASC"}, start=-1
+        )
+    return result.get("result") or []
+
+
+def iter_pages(
+    entity: str, filter: Dict[str, Any], select: List[str], cursor: int = 0
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Страницы выгрузки с чтением следующей страницы наперед
+
+    Args:
+        entity: Сущность (contacts, deals, leads)
+        filter: Фильтр list запроса
+        select: Поля выгрузки
+        cursor: ID, после которого начинается выгрузка
+
+    Yields:
+        Непустые страницы сущностей в порядке ID
+    """
+    if not settings.BITRIX_EXPORT_READ_AHEAD:
+        while True:
+            page = _fetch_page(entity, filter, select, cursor)
+            if page:
+                yield page
+            if len(page) < PAGE_SIZE:
+                return
+            cursor = int(page[-1]["ID"])
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bitrix-export") as executor:
+        pending: Optional[Future[List[Dict[str, Any]]]] = executor.submit(
+            _fetch_page, entity, filter, select, cursor
+        )
+        while pending is not None:
+            page = pending.result()
+            pending = None
+            if len(page) == PAGE_SIZE:
+                # Следующая страница грузится, пока текущая уходит клиенту
+                pending = executor.submit(_fetch_page, entity, filter, select, int(page[-1]["ID"]))
+            if page:
+                yield page
+
+
+def iter_export(
+    entity: str, filter: Dict[str, Any], select: List[str], cursor: int = 0
+) -> Iterator[bytes]:
+    """
+    NDJSON поток выгрузки со строками курсора после каждой страницы
+
+    Args:
+        entity: Сущность (contacts, deals, leads)
+        filter: Фильтр list запроса
+        select: Поля выгрузки
+        cursor: ID, после которого начинается выгрузка
+
+    Yields:
+        Закодированные страницы NDJSON
+    """
+    exported = 0
+    try:
+        for page in iter_pages(entity, filter, select, cursor):
+            cursor = int(page[-1]["ID"])
+            exported += len(page)
+            _exported.inc(len(page), entity=entity)
+            lines = [fastjson.dumps(item) for item in page]
+            lines.append(fastjson.dumps({"_cursor": cursor}))
+            yield b"\n".join(lines) + b"\n"
+    except Exception as e:
+        logger.error(f"❌ Export {entity} failed after {exported} entities (cursor={cursor}): {e}")
+        yield fastjson.dumps({"_cursor": cursor, "_error": str(e)}) + b"\n"
+        return
+
+    logger.info(f"📤 Export {entity}: {exported} entities, cursor={cursor}")
+    yield fastjson.dumps({"_cursor": cursor, "_complete": True}) + b"\n"
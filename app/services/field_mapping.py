@@ -0,0 +1,239 @@
+"""
+Скомпилированный план маппинга полей (field_mapping.json -> Bitrix24)
+
+field_mapping.json разбирается один раз: для каждого поля формы заранее
+вычисляются код поля Bitrix24 и функция получения значения, а для каждой
+сущности (контакт, сделка) - список полей, которые в неё попадают.
+Построение полей контакта и сделки - один проход по готовым спискам без
+обхода словарей маппинга на каждый запрос.
+
+Изменение кодов полей (PROPERTY_*, UF_CRM_*, UTM_*) делается в
+field_mapping.json, без правок кода. Если файл не загрузился или в нем нет
+нужного раздела, используются значения по умолчанию (текущая схема портала).
+"""
+
+import logging
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Префикс source_path, который разрешается относительно объекта Analytics
+ANALYTICS_ROOT = "header_data.analytics."
+
+# Получение значения из объекта (None, если по пути чего-то нет)
+Getter = Callable[[Any], Any]
+
+# Поле формы контакта: (атрибут формы, поле Bitrix24, формат мультиполя или None)
+ContactField = Tuple[str, str, Optional[Dict[str, str]]]
+
+DEFAULT_CONTACT_MAPPING: Dict[str, Dict[str, Any]] = {
+    "firstname": {"bitrix_field": "NAME", "required": True},
+    "lastname": {"bitrix_field": "LAST_NAME", "required": True},
+    "middlename": {"bitrix_field": "SECOND_NAME", "required": False},
+    "email": {
+        "bitrix_field": "EMAIL",
+        "required": True,
+        "is_multifield": True,
+        "format": {"VALUE": "{value}", "VALUE_TYPE": "WORK"},
+    },
+    "telephone": {
+        "bitrix_field": "PHONE",
+        "required": False,
+        "is_multifield": True,
+        "format": {"VALUE": "{value}", "VALUE_TYPE": "WORK"},
+    },
+}
+
+DEFAULT_ANALYTICS_MAPPING = {
+    name: {"bitrix_field": name.upper(), "source_path": f"{ANALYTICS_ROOT}params.{name}"}
+    for name in ("utm_source", "utm_medium", "utm_campaign", "utm_content", "utm_term")
+}
+DEFAULT_ANALYTICS_MAPPING["roistat_visit"] = {
+    "bitrix_field": "UF_CRM_1755626174",
+    "source_path": f"{ANALYTICS_ROOT}cookies.roistat_visit",
+}
+
+# Поля сущностей по умолчанию (для распределения аналитики по контакту и сделке)
+DEFAULT_CONTACT_FIELDS = {"UTM_SOURCE", "UTM_MEDIUM", "UTM_CAMPAIGN", "UTM_CONTENT", "UTM_TERM"}
+DEFAULT_DEAL_FIELDS = DEFAULT_CONTACT_FIELDS | {"UF_CRM_1755626174"}
+
+
+def compile_getter(path: str) -> Getter:
+    """
+    Функция получения значения по пути атрибутов ("params.utm_source")
+
+    Args:
+        path: Путь через точку
+
+    Returns:
+        Функция obj -> значение (None, если промежуточный объект отсутствует)
+    """
+    getters = [attrgetter(name) for name in path.split(".")]
+
+    def get(obj: Any) -> Any:
+        for getter in getters:
+            if obj is None:
+                return None
+            obj = getter(obj)
+        return obj
+
+    return get
+
+
+def _list_property(fields: Dict[str, Any], code: str, default: str) -> str:
+    """Код свойства универсального списка по символьному коду (POLL_ID -> PROPERTY_64)"""
+    for field_id, field in fields.items():
+        if field.get("code") == code:
+            return field_id
+    return default
+
+
+class FieldMappingPlan:
+    """
+    Предвычисленный план преобразования ответа формы в поля Bitrix24
+    """
+
+    def __init__(self, mapping: Optional[Dict[str, Any]] = None):
+        """
+        Компиляция плана
+
+        Args:
+            mapping: Содержимое field_mapping.json (None/{} - значения по умолчанию)
+        """
+        mapping = mapping or {}
+        form_mapping = mapping.get("poll_form_to_bitrix_mapping", {})
+        entities = mapping.get("bitrix24_entities", {})
+        lists = mapping.get("universal_lists", {})
+
+        # ---------- Коды свойств универсальных списков ----------
+        poll_fields = lists.get("polls", {}).get("fields", {})
+        self.poll_id_property = _list_property(poll_fields, "POLL_ID", "PROPERTY_64")
+        self.poll_url_property = _list_property(poll_fields, "POLL_URL", "PROPERTY_65")
+        self.poll_responsible_property = _list_property(
+            poll_fields, "REPONSIBLE_EMPLOYEE_ID", "PROPERTY_66"
+        )
+        program_fields = lists.get("educational_programs", {}).get("fields", {})
+        self.program_id_property = _list_property(
+            program_fields, "EDUCATIONAL_PROGRAM_ID", "PROPERTY_73"
+        )
+
+        # ---------- Пользовательские поля сделки ----------
+        program_mapping = form_mapping.get("deal_mapping", {}).get("educational_program_1", {})
+        self.deal_program_field = program_mapping.get("bitrix_field", "UF_CRM_1755626160")
+        self.deal_comment_field = form_mapping.get("cookies_storage", {}).get(
+            "bitrix_field", "COMMENTS"
+        )
+
+        # ---------- Поля формы -> контакт ----------
+        self.contact_fields: List[ContactField] = []
+        for form_field, spec in (
+            form_mapping.get("contact_mapping") or DEFAULT_CONTACT_MAPPING
+        ).items():
+            multifield_format = spec.get("format") if spec.get("is_multifield") else None
+            self.contact_fields.append((form_field, spec["bitrix_field"], multifield_format))
+
+        # ---------- Аналитика -> контакт / сделка ----------
+        # Поле аналитики попадает в сущность, если такое поле у неё есть
+        contact_entity_fields = self._entity_fields(
+            entities.get("contacts"), DEFAULT_CONTACT_FIELDS
+        )
+        deal_entity_fields = self._entity_fields(entities.get("deals"), DEFAULT_DEAL_FIELDS)
+
+        self.contact_analytics: List[Tuple[str, Getter]] = []
+        self.deal_analytics: List[Tuple[str, Getter]] = []
+        self.roistat_field: Optional[str] = None
+
+        for name, spec in (
+            form_mapping.get("analytics_mapping") or DEFAULT_ANALYTICS_MAPPING
+        ).items():
+            source_path = spec.get("source_path", "")
+            if not source_path.startswith(ANALYTICS_ROOT):
+                logger.warning(f"Field mapping: unsupported source_path for {name}: {source_path}")
+                continue
+
+            bitrix_field = spec["bitrix_field"]
+            getter = compile_getter(source_path[len(ANALYTICS_ROOT) :])
+            if bitrix_field in contact_entity_fields:
+                self.contact_analytics.append((bitrix_field, getter))
+            if bitrix_field in deal_entity_fields:
+                self.deal_analytics.append((bitrix_field, getter))
+            if name == "roistat_visit":
+                self.roistat_field = bitrix_field
+
+        logger.info(
+            f"Field mapping plan compiled: {len(self.contact_fields)} contact fields, "
+            f"{len(self.contact_analytics)} contact / {len(self.deal_analytics)} deal analytics fields"
+        )
+
+    @staticmethod
+    def _entity_fields(entity: Optional[Dict[str, Any]], default: set) -> set:
+        if not entity:
+            return default
+        return set(entity.get("standard_fields", {})) | set(entity.get("custom_fields", {}))
+
+    # ==================== Builders ====================
+
+    def build_contact_fields(self, values: Dict[str, Any], analytics: Any = None) -> Dict[str, Any]:
+        """
+        Поля для crm.contact.add
+
+        Args:
+            values: Значения полей формы (firstname, lastname, email, ...)
+            analytics: Аналитические данные (Analytics)
+
+        Returns:
+            Словарь полей контакта
+        """
+        fields: Dict[str, Any] = {}
+        for form_field, bitrix_field, multifield_format in self.contact_fields:
+            value = values.get(form_field)
+            if multifield_format is None:
+                # Строковые поля передаются всегда (пустая строка вместо None)
+                fields[bitrix_field] = value or ""
+            elif value:
+                fields[bitrix_field] = [
+                    {
+                        key: template.format(value=value)
+                        for key, template in multifield_format.items()
+                    }
+                ]
+
+        self._apply_analytics(fields, self.contact_analytics, analytics)
+        return fields
+
+    def build_deal_fields(
+        self, contact_id: int, program_id: Optional[int] = None, poll_form_id: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """Поля для crm.deal.add"""
+        fields: Dict[str, Any] = {
+            "TITLE": f"Регистрация на опрос #{poll_form_id}" if poll_form_id else "Регистрация",
+            "CONTACT_IDS": [contact_id],
+        }
+        if program_id:
+            fields[self.deal_program_field] = program_id
+        return fields
+
+    def build_enrich_fields(self, analytics: Any, comment: str) -> Dict[str, Any]:
+        """
+        Поля для обогащения сделки (crm.deal.update)
+
+        Args:
+            analytics: Аналитические данные (Analytics)
+            comment: JSON комментарий с cookies и дополнительными полями
+        """
+        fields: Dict[str, Any] = {}
+        self._apply_analytics(fields, self.deal_analytics, analytics)
+        fields[self.deal_comment_field] = comment
+        return fields
+
+    @staticmethod
+    def _apply_analytics(
+        fields: Dict[str, Any], plan: List[Tuple[str, Getter]], analytics: Any
+    ) -> None:
+        if analytics is None:
+            return
+        for bitrix_field, getter in plan:
+            value = getter(analytics)
+            if value not in (None, ""):
+                fields[bitrix_field] = value
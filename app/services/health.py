@@ -0,0 +1,162 @@
+"""
+Подсистема проверки состояния сервиса
+
+Доступность Bitrix24 проверяется фоновым потоком по расписанию
+(HEALTH_PROBE_INTERVAL), результат кешируется вместе с временем проверки.
+Эндпоинты health отдают закешированный результат без обращения к Bitrix24:
+- liveness: процесс жив и фоновая проверка не зависла
+- readiness: последняя проверка Bitrix24 успешна и не устарела
+
+Проверка выполняется в полосе Lane.HEALTH в обход общих лимитеров клиента:
+под нагрузкой и при троттлинге она не ждет в очереди за пакетной загрузкой,
+и readiness не падает на всех подах одновременно.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services.bitrix24_client import bitrix24_client
+from app.utils.lanes import Lane, bitrix_lane
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Фоновая проверка доступности Bitrix24 с кешированием результата
+    """
+
+    def __init__(
+        self,
+        client,
+        interval: Optional[float] = None,
+        max_age: Optional[float] = None,
+        liveness_deadline: Optional[float] = None,
+    ):
+        """
+        Инициализация монитора
+
+        Args:
+            client: Клиент Bitrix24
+            interval: Интервал проверки в секундах (по умолчанию HEALTH_PROBE_INTERVAL)
+            max_age: Максимальный возраст результата (по умолчанию HEALTH_PROBE_MAX_AGE)
+            liveness_deadline: Максимальное время без завершенной проверки
+                               (по умолчанию HEALTH_LIVENESS_DEADLINE)
+        """
+        self.client = client
+        self.interval = interval or settings.HEALTH_PROBE_INTERVAL
+        self.max_age = max_age or settings.HEALTH_PROBE_MAX_AGE
+        self.liveness_deadline = liveness_deadline or settings.HEALTH_LIVENESS_DEADLINE
+
+        self._result: Dict[str, Any] = {
+            "bitrix24_api_available": None,
+            "checked_at": None,
+            "latency_ms": None,
+            "error": None,
+        }
+        self._checked_monotonic: Optional[float] = None
+        self._started_monotonic: Optional[float] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def probe(self) -> Dict[str, Any]:
+        """
+        Выполнить проверку Bitrix24 и обновить закешированный результат
+
+        Returns:
+            Результат проверки
+        """
+        started = time.monotonic()
+        try:
+            with bitrix_lane(Lane.HEALTH):
+                self.client.get_server_time()
+            available, error = True, None
+        except Exception as e:
+            available, error = False, str(e)
+            logger.warning(f"Health probe: Bitrix24 unavailable: {e}")
+
+        finished = time.monotonic()
+        # Заменяем словарь целиком - читатели не видят частично обновленный результат
+        self._result = {
+            "bitrix24_api_available": available,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "latency_ms": round((finished - started) * 1000, 1),
+            "error": error,
+        }
+        self._checked_monotonic = finished
+        return self._result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Закешированный результат последней проверки (без обращения к Bitrix24)
+
+        Returns:
+            Словарь с результатом проверки и его возрастом в секундах
+        """
+        result = dict(self._result)
+        result["age_seconds"] = (
+            round(time.monotonic() - self._checked_monotonic, 1)
+            if self._checked_monotonic is not None
+            else None
+        )
+        return result
+
+    def is_fresh(self) -> bool:
+        """Результат последней проверки не устарел"""
+        return (
+            self._checked_monotonic is not None
+            and time.monotonic() - self._checked_monotonic <= self.max_age
+        )
+
+    def is_live(self) -> bool:
+        """
+        Liveness: фоновая проверка не запущена или её поток жив и последняя
+        проверка завершилась не раньше liveness_deadline назад (зависшая
+        проверка держит поток живым, но результат не обновляет)
+        """
+        if self._thread is None:
+            return True
+        if not self._thread.is_alive():
+            return False
+        last = self._checked_monotonic or self._started_monotonic
+        return last is None or time.monotonic() - last <= self.liveness_deadline
+
+    def is_ready(self) -> bool:
+        """
+        Readiness: Bitrix24 доступен по результату свежей проверки
+        """
+        return bool(self._result["bitrix24_api_available"]) and self.is_fresh()
+
+    def start(self):
+        """Запустить фоновую проверку"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    self.probe()
+                except Exception as e:
+                    logger.error(f"Health probe failed: {e}")
+                self._stop_event.wait(self.interval)
+
+        self._stop_event.clear()
+        self._started_monotonic = time.monotonic()
+        self._thread = threading.Thread(target=run, name="health-prober", daemon=True)
+        self._thread.start()
+        logger.info(f"Health prober started (interval={self.interval}s)")
+
+    def stop(self):
+        """Остановить фоновую проверку"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Глобальный монитор состояния Bitrix24
+health_monitor = HealthMonitor(bitrix24_client)
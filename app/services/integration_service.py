@@ -8,19 +8,86 @@
 4. Поиск/создание/обогащение сделки
 """
 
+import contextvars
 import json
 import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import cached_property
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 from app.config import settings
 from app.schemas.webhook import Analytics, WebhookData, WebhookPayload
+from app.services.answer_extraction import (
+    ExtractedAnswer,
+    build_deal_comment,
+    extract_answer,
+    split_form_fields,
+)
 from app.services.bitrix24_client import bitrix24_client
+from app.services.deal_index import DealIndex
+from app.services.field_mapping import FieldMappingPlan
+from app.services.poll_names_index import poll_names_index
+from app.services.projection import EDUCATIONAL_PROGRAM, ID_ONLY, POLL_FORM
+from app.services.webhook_audit import webhook_audit
 from app.utils.cache import cache_manager
+from app.utils.tracing import CallTrace, current_trace
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Общий пул потоков для параллельной обработки сделок (создается при первом использовании)
+_deal_executor: Optional[ThreadPoolExecutor] = None
+_deal_executor_lock = threading.Lock()
+
+
+def get_deal_executor() -> ThreadPoolExecutor:
+    """Получить общий пул потоков для обработки сделок"""
+    global _deal_executor
+    with _deal_executor_lock:
+        if _deal_executor is None:
+            _deal_executor = ThreadPoolExecutor(
+                max_workers=settings.DEAL_WORKERS, thread_name_prefix="deal-worker"
+            )
+        return _deal_executor
+
+
+def shutdown_deal_executor(wait: bool = True):
+    """
+    Остановить пул потоков обработки сделок
+
+    Args:
+        wait: Дождаться завершения уже запущенных сделок
+    """
+    global _deal_executor
+    with _deal_executor_lock:
+        executor, _deal_executor = _deal_executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+class DealProcessingError(Exception):
+    """
+    Ошибка обработки сделок по одной или нескольким программам ответа
+
+    Attributes:
+        deals: Успешно обработанные сделки (в порядке программ)
+        failures: Список (название программы, исключение)
+    """
+
+    def __init__(self, deals: List[Dict[str, Any]], failures: List[Tuple[str, Exception]]):
+        self.deals = deals
+        self.failures = failures
+        details = "; ".join(f"{name}: {error}" for name, error in failures)
+        super().__init__(f"Не удалось обработать сделки для программ ({details})")
+
+
+class DealEnrichmentError(Exception):
+    """Не удалось обновить сделку при обогащении (сделка могла быть удалена)"""
+
+    pass
+
 
 class BitrixIntegrationService:
     """
@@ -33,47 +100,59 @@ class BitrixIntegrationService:
     POLL_FORMS_LIST_ID = 17  # Опросные формы
     EDUCATIONAL_PROGRAMS_LIST_ID = 18  # Образовательные программы
 
-    # Коды свойств из field_mapping.json
-    POLL_ID_PROPERTY = "PROPERTY_64"  # Код для poll_id в списке опросных форм
-    PROGRAM_ID_PROPERTY = "PROPERTY_73"  # Код для program_id в списке ОП
-
-    # Пользовательские поля сделки
-    DEAL_EDUCATIONAL_PROGRAM_FIELD = "UF_CRM_1755626160"  # Образовательная программа
-    DEAL_ROISTAT_FIELD = "UF_CRM_1755626174"  # ID Roistat
-
     def __init__(self):
         """Инициализация сервиса"""
         self.client = bitrix24_client
         self.cache = cache_manager
-        self._load_field_mapping()
-        self._load_poll_id_names()
+        self.poll_names = poll_names_index
         logger.info("BitrixIntegrationService инициализирован")
 
-    def _load_field_mapping(self):
-        """Загрузить маппинг полей из field_mapping.json"""
+    # Справочник и план маппинга загружаются при первом обращении, а не при импорте модуля
+
+    @cached_property
+    def field_mapping(self) -> Dict[str, Any]:
+        """Маппинг полей из field_mapping.json"""
         try:
             mapping_path = Path(__file__).parent.parent.parent / "field_mapping.json"
             with open(mapping_path, "r", encoding="utf-8") as f:
-                self.field_mapping = json.load(f)
+                field_mapping = json.load(f)
             logger.info("Field mapping loaded successfully")
+            return field_mapping
         except Exception as e:
             logger.error(f"Failed to load field mapping: {e}")
-            self.field_mapping = {}
+            return {}
 
-    def _load_poll_id_names(self):
-        """Загрузить соответствие poll_id и названий из poll_id_names.json"""
-        try:
-            poll_names_path = Path(__file__).parent.parent.parent / "poll_id_names.json"
-            with open(poll_names_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                # Создаем словарь для быстрого поиска: poll_id -> title
-                self.poll_id_names = {
-                    record["poll_id"]: record["title"] for record in data.get("RECORDS", [])
-                }
-            logger.info(f"Poll ID names loaded successfully: {len(self.poll_id_names)} records")
-        except Exception as e:
-            logger.error(f"Failed to load poll_id_names.json: {e}")
-            self.poll_id_names = {}
+    @cached_property
+    def mapping_plan(self) -> FieldMappingPlan:
+        """Скомпилированный план маппинга полей"""
+        return FieldMappingPlan(self.field_mapping)
+
+    @cached_property
+    def deal_index(self) -> DealIndex:
+        """Индекс сделок (контакт, ОП) -> сделка"""
+        return DealIndex(self.client, self.DEAL_EDUCATIONAL_PROGRAM_FIELD)
+
+    # Коды свойств и полей из field_mapping.json
+
+    @property
+    def POLL_ID_PROPERTY(self) -> str:
+        """Код свойства poll_id в списке опросных форм"""
+        return self.mapping_plan.poll_id_property
+
+    @property
+    def PROGRAM_ID_PROPERTY(self) -> str:
+        """Код свойства program_id в списке ОП"""
+        return self.mapping_plan.program_id_property
+
+    @property
+    def DEAL_EDUCATIONAL_PROGRAM_FIELD(self) -> str:
+        """Пользовательское поле сделки: образовательная программа"""
+        return self.mapping_plan.deal_program_field
+
+    @property
+    def DEAL_ROISTAT_FIELD(self) -> Optional[str]:
+        """Пользовательское поле сделки: ID Roistat"""
+        return self.mapping_plan.roistat_field
 
     # ==================== STEP 1: Find Poll Form ====================
 
@@ -105,10 +184,11 @@ class BitrixIntegrationService:
             result = self.client.get_list_elements(
                 iblock_id=self.POLL_FORMS_LIST_ID,
                 filter={f"={self.POLL_ID_PROPERTY}": str(poll_id)},
+                select=POLL_FORM.select(),
             )
 
             if result.get("result") and len(result["result"]) > 0:
-                poll_form = result["result"][0]
+                poll_form = POLL_FORM.apply(result["result"][0])
                 logger.info(f"Poll form found: ID={poll_form.get('ID')}")
 
                 # Кешируем результат
@@ -146,7 +226,7 @@ class BitrixIntegrationService:
             Exception: Если не удалось создать форму
         """
         # Получаем название из загруженных данных
-        poll_name = self.poll_id_names.get(poll_id)
+        poll_name = self.poll_names.get(poll_id)
 
         if not poll_name:
             poll_name = f"Опросная форма #{poll_id}"
@@ -157,12 +237,13 @@ class BitrixIntegrationService:
         logger.info(f"Creating new poll form: poll_id={poll_id}, name={poll_name}")
 
         # Создаем поля для новой формы
+        plan = self.mapping_plan
         fields = {
             "NAME": poll_name,
-            "PROPERTY_64": str(poll_id),  # POLL_ID
+            plan.poll_id_property: str(poll_id),
             "CODE": str(poll_id),
-            "PROPERTY_65": f"https://portal.hse.ru/{str(poll_id)}",
-            "PROPERTY_66": 0,
+            plan.poll_url_property: f"https://portal.hse.ru/{str(poll_id)}",
+            plan.poll_responsible_property: 0,
         }
 
         try:
@@ -179,10 +260,11 @@ class BitrixIntegrationService:
                 created_form_result = self.client.get_list_elements(
                     iblock_id=self.POLL_FORMS_LIST_ID,
                     filter={f"={self.POLL_ID_PROPERTY}": str(poll_id)},
+                    select=POLL_FORM.select(),
                 )
 
                 if created_form_result.get("result") and len(created_form_result["result"]) > 0:
-                    poll_form = created_form_result["result"][0]
+                    poll_form = POLL_FORM.apply(created_form_result["result"][0])
 
                     # Кешируем созданную форму
                     if settings.CACHE_ENABLED:
@@ -231,9 +313,7 @@ class BitrixIntegrationService:
 
         # Шаг 1: Поиск контакта по email
         try:
-            result = self.client.get_contacts(
-                filter={"EMAIL": email}, select=["ID", "NAME", "LAST_NAME", "EMAIL"]
-            )
+            result = self.client.get_contacts(filter={"EMAIL": email}, select=ID_ONLY.select())
 
             if result.get("result") and len(result["result"]) > 0:
                 contact_id = result["result"][0]["ID"]
@@ -246,28 +326,14 @@ class BitrixIntegrationService:
         # Шаг 2: Создание нового контакта
         logger.info(f"Creating new contact for email={email}")
 
-        contact_fields = {
-            "NAME": firstname or "",
-            "LAST_NAME": lastname or "",
-            "SECOND_NAME": middlename or "",
-            "EMAIL": [{"VALUE": email, "VALUE_TYPE": "WORK"}],
-        }
-
-        # Добавляем телефон, если указан
-        if phone:
-            contact_fields["PHONE"] = [{"VALUE": phone, "VALUE_TYPE": "WORK"}]
-
-        # Добавляем UTM метки из аналитики
-        if analytics and analytics.params:
-            contact_fields.update(
-                {
-                    "UTM_SOURCE": analytics.params.utm_source,
-                    "UTM_MEDIUM": analytics.params.utm_medium,
-                    "UTM_CAMPAIGN": analytics.params.utm_campaign,
-                    "UTM_CONTENT": analytics.params.utm_content,
-                    "UTM_TERM": analytics.params.utm_term,
-                }
-            )
+        contact_fields = self._build_contact_fields(
+            email=email,
+            firstname=firstname,
+            lastname=lastname,
+            middlename=middlename,
+            phone=phone,
+            analytics=analytics,
+        )
 
         try:
             result = self.client.create_contact(contact_fields)
@@ -330,7 +396,7 @@ class BitrixIntegrationService:
                 for program_name in programs_to_search:
                     if program_name in batch_results:
                         program = batch_results[program_name]
-                        program_data = {"ID": program.get("ID"), "NAME": program.get("NAME")}
+                        program_data = EDUCATIONAL_PROGRAM.apply(program)
                         found_programs.append(program_data)
                         programs_found_in_batch.append(program_name)
                         logger.info(
@@ -361,12 +427,14 @@ class BitrixIntegrationService:
             try:
                 # Поиск в списке "Образовательные программы" (IBLOCK_ID=18)
                 result = self.client.get_list_elements(
-                    iblock_id=self.EDUCATIONAL_PROGRAMS_LIST_ID, filter={"NAME": program_name}
+                    iblock_id=self.EDUCATIONAL_PROGRAMS_LIST_ID,
+                    filter={"NAME": program_name},
+                    select=EDUCATIONAL_PROGRAM.select(),
                 )
 
                 if result.get("result") and len(result["result"]) > 0:
                     program = result["result"][0]
-                    program_data = {"ID": program.get("ID"), "NAME": program.get("NAME")}
+                    program_data = EDUCATIONAL_PROGRAM.apply(program)
                     found_programs.append(program_data)
                     logger.info(f"Program found: {program_name} (ID={program.get('ID')})")
 
@@ -413,6 +481,13 @@ class BitrixIntegrationService:
         """
         logger.info(f"Searching for deal with contact_id={contact_id}, program_id={program_id}")
 
+        # Шаг 0: Поиск в локальном индексе (без запроса к Bitrix24)
+        if settings.DEAL_INDEX_ENABLED:
+            deal_id = self.deal_index.get(contact_id, program_id)
+            if deal_id is not None:
+                logger.info(f"Deal found in index: ID={deal_id}")
+                return deal_id, False
+
         # Шаг 1: Поиск существующей сделки
         try:
             filter_params = {"CONTACT_ID": contact_id}
@@ -423,13 +498,15 @@ class BitrixIntegrationService:
 
             result = self.client.get_deals(
                 filter=filter_params,
-                select=["ID", "TITLE", "CONTACT_IDS", self.DEAL_EDUCATIONAL_PROGRAM_FIELD],
+                select=ID_ONLY.select(),
             )
 
             if result.get("result") and len(result["result"]) > 0:
-                deal_id = result["result"][0]["ID"]
+                deal_id = int(result["result"][0]["ID"])
                 logger.info(f"Deal found: ID={deal_id}")
-                return int(deal_id), False
+                if settings.DEAL_INDEX_ENABLED:
+                    self.deal_index.put(contact_id, program_id, deal_id)
+                return deal_id, False
 
         except Exception as e:
             logger.warning(f"Error searching for deal: {e}")
@@ -437,20 +514,15 @@ class BitrixIntegrationService:
         # Шаг 2: Создание новой сделки
         logger.info(f"Creating new deal for contact_id={contact_id}")
 
-        deal_fields = {
-            "TITLE": f"Регистрация на опрос #{poll_form_id}" if poll_form_id else "Регистрация",
-            "CONTACT_IDS": [contact_id],
-        }
-
-        # Добавляем образовательную программу, если указана
-        if program_id:
-            deal_fields[self.DEAL_EDUCATIONAL_PROGRAM_FIELD] = program_id
+        deal_fields = self._build_deal_fields(contact_id, program_id, poll_form_id)
 
         try:
             result = self.client.create_deal(deal_fields)
-            deal_id = result.get("result")
+            deal_id = int(result.get("result"))
             logger.info(f"Deal created: ID={deal_id}")
-            return int(deal_id), True
+            if settings.DEAL_INDEX_ENABLED:
+                self.deal_index.put(contact_id, program_id, deal_id)
+            return deal_id, True
 
         except Exception as e:
             logger.error(f"Error creating deal: {e}")
@@ -458,6 +530,74 @@ class BitrixIntegrationService:
 
     # ==================== Helper Methods ====================
 
+    def _build_contact_fields(
+        self,
+        email: str,
+        firstname: Optional[str] = None,
+        lastname: Optional[str] = None,
+        middlename: Optional[str] = None,
+        phone: Optional[str] = None,
+        analytics: Optional[Analytics] = None,
+    ) -> Dict[str, Any]:
+        """
+        Формирование полей для создания контакта
+
+        Args:
+            email: Email контакта
+            firstname: Имя
+            lastname: Фамилия
+            middlename: Отчество
+            phone: Телефон
+            analytics: Аналитические данные (UTM метки)
+
+        Returns:
+            Словарь полей для crm.contact.add
+        """
+        return self.mapping_plan.build_contact_fields(
+            {
+                "firstname": firstname,
+                "lastname": lastname,
+                "middlename": middlename,
+                "email": email,
+                "telephone": phone,
+            },
+            analytics,
+        )
+
+    def _build_deal_fields(
+        self, contact_id: int, program_id: Optional[int] = None, poll_form_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Формирование полей для создания сделки
+
+        Args:
+            contact_id: ID контакта
+            program_id: ID образовательной программы
+            poll_form_id: ID опросной формы (для названия сделки)
+
+        Returns:
+            Словарь полей для crm.deal.add
+        """
+        return self.mapping_plan.build_deal_fields(contact_id, program_id, poll_form_id)
+
+    def _build_enrich_fields(
+        self, analytics: Optional[Analytics], additional_fields: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Формирование полей для обогащения сделки
+
+        Args:
+            analytics: Аналитические данные
+            additional_fields: Дополнительные поля из формы
+
+        Returns:
+            Словарь полей для crm.deal.update
+        """
+        # UTM метки и Roistat ID по плану маппинга + JSON комментарий с cookies и доп. полями
+        return self.mapping_plan.build_enrich_fields(
+            analytics, self._build_deal_comment(analytics, additional_fields)
+        )
+
     def _extract_additional_fields(self, data: WebhookData) -> Dict[str, Any]:
         """
         Извлечение дополнительных полей (additional fields и question fields)
@@ -468,30 +608,8 @@ class BitrixIntegrationService:
         Returns:
             Словарь с дополнительными полями
         """
-        additional_fields = {}
-
-        # Получаем все поля из data
-        data_dict = data.model_dump(exclude_none=True)
-
-        # Фильтруем стандартные поля
-        # hse_school - это дополнительное поле, которое должно сохраняться в JSON
-        standard_fields = {
-            "firstname",
-            "lastname",
-            "middlename",
-            "email",
-            "telephone",
-            "birthdate",
-            "address",
-            "city",
-            "country",
-            "educational_program_1",
-        }
-
-        # Собираем все дополнительные поля
-        for key, value in data_dict.items():
-            if key not in standard_fields:
-                additional_fields[key] = value
+        # Один проход по полям модели вместо model_dump(exclude_none=True)
+        _, additional_fields = split_form_fields(data)
 
         logger.info(f"Extracted {len(additional_fields)} additional fields")
         return additional_fields
@@ -515,30 +633,22 @@ class BitrixIntegrationService:
         Returns:
             JSON строка для поля COMMENTS
         """
-        comment_data = {}
+        return build_deal_comment(analytics, additional_fields)
 
-        # Добавляем cookies
-        if analytics and analytics.cookies:
-            comment_data["cookies"] = analytics.cookies.model_dump(exclude_none=True)
-
-        # Добавляем дополнительные поля формы
-        if additional_fields:
-            comment_data["additional_fields"] = additional_fields
-
-        # Добавляем аналитику
-        if analytics:
-            comment_data["analytics"] = {
-                "ip": analytics.ip,
-                "url": analytics.url,
-                "date": analytics.date,
-                "timeZone": analytics.timeZone,
-            }
+    def extract_answer(self, payload: WebhookPayload) -> ExtractedAnswer:
+        """
+        Разбор ответа за один проход: поля формы, комментарий и поля обогащения
+        сделки строятся один раз и переиспользуются для всех сделок ответа
 
-            # Добавляем mailingListSubscription если есть
-            if analytics.mailingListSubscription is not None:
-                comment_data["mailingListSubscription"] = analytics.mailingListSubscription
+        Args:
+            payload: Полные данные webhook
 
-        return json.dumps(comment_data, ensure_ascii=False, indent=2)
+        Returns:
+            ExtractedAnswer
+        """
+        answer = extract_answer(payload, self.mapping_plan)
+        logger.info(f"Extracted {len(answer.additional_fields)} additional fields")
+        return answer
 
     # ==================== STEP 5: Enrich Deal ====================
 
@@ -548,6 +658,7 @@ class BitrixIntegrationService:
         data: WebhookData,
         analytics: Optional[Analytics] = None,
         additional_fields: Optional[Dict[str, Any]] = None,
+        update_fields: Optional[Dict[str, Any]] = None,
     ) -> bool:
         """
         Обогащение сделки дополнительными данными
@@ -563,37 +674,19 @@ class BitrixIntegrationService:
             data: Данные из формы опроса
             analytics: Аналитические данные
             additional_fields: Дополнительные поля из формы
+            update_fields: Готовые поля обогащения (ExtractedAnswer.enrich_fields)
 
         Returns:
             bool: True если обновление успешно
         """
         logger.info(f"Enriching deal ID={deal_id}")
 
-        update_fields = {}
-
-        # Добавляем UTM метки
-        if analytics and analytics.params:
-            update_fields.update(
-                {
-                    "UTM_SOURCE": analytics.params.utm_source,
-                    "UTM_MEDIUM": analytics.params.utm_medium,
-                    "UTM_CAMPAIGN": analytics.params.utm_campaign,
-                    "UTM_CONTENT": analytics.params.utm_content,
-                    "UTM_TERM": analytics.params.utm_term,
-                }
-            )
-
-        # Добавляем Roistat ID
-        if analytics and analytics.cookies and analytics.cookies.roistat_visit:
-            update_fields[self.DEAL_ROISTAT_FIELD] = analytics.cookies.roistat_visit
-
         # Извлекаем дополнительные поля если не переданы
         if additional_fields is None:
             additional_fields = self._extract_additional_fields(data)
 
-        # Создаем JSON комментарий с cookies и дополнительными полями
-        comments_json = self._build_deal_comment(analytics, additional_fields)
-        update_fields["COMMENTS"] = comments_json
+        if update_fields is None:
+            update_fields = self._build_enrich_fields(analytics, additional_fields)
 
         # Обновляем сделку
         try:
@@ -605,7 +698,158 @@ class BitrixIntegrationService:
 
         except Exception as e:
             logger.error(f"Error enriching deal {deal_id}: {e}")
-            raise Exception(f"Не удалось обогатить сделку: {e}")
+            # Сделка могла быть удалена - следующий поиск пойдет в Bitrix24
+            self.deal_index.remove_deal(deal_id)
+            raise DealEnrichmentError(f"Не удалось обогатить сделку: {e}")
+
+    def find_and_enrich_deal(
+        self,
+        contact_id: int,
+        program_id: Optional[int],
+        poll_form_id: Optional[Any],
+        payload: WebhookPayload,
+        answer: ExtractedAnswer,
+    ) -> Tuple[int, bool]:
+        """
+        Поиск/создание сделки и ее обогащение
+
+        Сделка из локального индекса могла быть удалена в Bitrix24: если ее обогащение
+        не удалось, enrich_deal уже удалил запись индекса - поиск/создание повторяется
+        в Bitrix24 в рамках этого же ответа.
+
+        Returns:
+            Tuple[int, bool]: (ID сделки, флаг is_new)
+
+        Raises:
+            DealEnrichmentError: Не удалось обогатить найденную или созданную сделку
+        """
+        deal_id, is_new = self.find_or_create_deal(
+            contact_id=contact_id, program_id=program_id, poll_form_id=poll_form_id
+        )
+        try:
+            self._enrich_answer_deal(deal_id, payload, answer)
+        except DealEnrichmentError as e:
+            if is_new or not settings.DEAL_INDEX_ENABLED:
+                raise
+            logger.warning(f"⚠️ Existing deal {deal_id} enrichment failed, searching again: {e}")
+            deal_id, is_new = self.find_or_create_deal(
+                contact_id=contact_id, program_id=program_id, poll_form_id=poll_form_id
+            )
+            self._enrich_answer_deal(deal_id, payload, answer)
+
+        return deal_id, is_new
+
+    def _enrich_answer_deal(self, deal_id: int, payload: WebhookPayload, answer: ExtractedAnswer):
+        self.enrich_deal(
+            deal_id=deal_id,
+            data=payload.data,
+            analytics=answer.analytics,
+            additional_fields=answer.additional_fields,
+            update_fields=answer.enrich_fields,
+        )
+
+    # ==================== STEP 4-5: Deals per Program ====================
+
+    def _process_program_deal(
+        self,
+        program: Dict[str, Any],
+        contact_id: int,
+        poll_form_id: Optional[Any],
+        payload: WebhookPayload,
+        answer: ExtractedAnswer,
+    ) -> Dict[str, Any]:
+        """
+        Поиск/создание и обогащение сделки для одной образовательной программы
+
+        Returns:
+            Словарь с результатом по сделке (program_name, program_id, deal_id, is_new)
+        """
+        program_id = int(program["ID"])
+        program_name = program["NAME"]
+
+        logger.info(f"   📚 Processing program: {program_name} (ID={program_id})")
+
+        deal_id, is_new = self.find_and_enrich_deal(
+            contact_id=contact_id,
+            program_id=program_id,
+            poll_form_id=poll_form_id,
+            payload=payload,
+            answer=answer,
+        )
+        deal_status = "Created new" if is_new else "Found existing"
+        logger.info(f"      ✅ {deal_status} deal {deal_id} for program {program_name}")
+        logger.info(f"      ✅ Deal {deal_id} enriched successfully")
+
+        return {
+            "program_name": program_name,
+            "program_id": program_id,
+            "deal_id": deal_id,
+            "is_new": is_new,
+        }
+
+    def _process_program_deals(
+        self,
+        programs: List[Dict[str, Any]],
+        contact_id: int,
+        poll_form_id: Optional[Any],
+        payload: WebhookPayload,
+        answer: ExtractedAnswer,
+    ) -> List[Dict[str, Any]]:
+        """
+        Обработка сделок по всем программам ответа
+
+        Сделки обрабатываются параллельно в общем пуле потоков, не более
+        DEAL_CONCURRENCY_PER_ANSWER одновременно для одного ответа. Частота запросов
+        ограничивается общим лимитером клиента Bitrix24. Порядок результатов
+        совпадает с порядком программ.
+
+        Returns:
+            Список результатов по сделкам
+
+        Raises:
+            DealProcessingError: Если обработка хотя бы одной сделки завершилась ошибкой
+                                 (ошибки всех программ собираются вместе)
+        """
+        outcomes: List[Any] = [None] * len(programs)
+        limit = max(1, settings.DEAL_CONCURRENCY_PER_ANSWER)
+
+        def process(index: int) -> None:
+            try:
+                outcomes[index] = self._process_program_deal(
+                    programs[index], contact_id, poll_form_id, payload, answer
+                )
+            except Exception as e:
+                logger.error(f"      ❌ Program {programs[index].get('NAME')}: {e}")
+                outcomes[index] = e
+
+        if len(programs) <= 1 or limit == 1:
+            for index in range(len(programs)):
+                process(index)
+        else:
+            executor = get_deal_executor()
+            queue = iter(range(len(programs)))
+            in_flight: set[Future] = set()
+
+            # Держим в работе не больше limit сделок этого ответа
+            for index in queue:
+                # Копия контекста: трасса обработки ответа видна в потоке пула
+                context = contextvars.copy_context()
+                in_flight.add(executor.submit(context.run, process, index))
+                if len(in_flight) >= limit:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            wait(in_flight)
+
+        deals = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+        failures = [
+            (program["NAME"], outcome)
+            for program, outcome in zip(programs, outcomes)
+            if isinstance(outcome, Exception)
+        ]
+
+        if failures:
+            raise DealProcessingError(deals, failures)
+
+        return deals
 
     # ==================== Main Integration Flow ====================
 
@@ -664,6 +908,10 @@ class BitrixIntegrationService:
             "total_deals": 0,
         }
 
+        # Трасса для журнала обработки: этапы и вызовы Bitrix24
+        trace = CallTrace()
+        trace_token = current_trace.set(trace)
+
         try:
             # ========== ШАГ 1: Валидация входящих данных ==========
             logger.info("📋 STEP 1: Validating incoming data...")
@@ -671,6 +919,7 @@ class BitrixIntegrationService:
             if not payload.data.email:
                 raise Exception("Email обязателен для создания контакта")
 
+            trace.mark("validation")
             logger.info(f"✅ Validation passed")
             logger.info(f"   Email: {payload.data.email}")
             logger.info(f"   Name: {payload.data.firstname} {payload.data.lastname}")
@@ -681,6 +930,7 @@ class BitrixIntegrationService:
 
             poll_form = self.find_poll_form(payload.header_data.poll_id)
             result["poll_form_id"] = poll_form.get("ID")
+            trace.mark("poll_form")
 
             logger.info(f"✅ Poll form found")
             logger.info(f"   Bitrix ID: {poll_form.get('ID')}")
@@ -698,12 +948,13 @@ class BitrixIntegrationService:
                 analytics=payload.header_data.analytics,
             )
             result["contact_id"] = contact_id
+            trace.mark("contact")
 
             logger.info(f"✅ Contact ready")
             logger.info(f"   Contact ID: {contact_id}")
 
-            # Извлекаем дополнительные поля один раз для всех сделок
-            additional_fields = self._extract_additional_fields(payload.data)
+            # Поля формы, комментарий и поля обогащения - один раз для всех сделок
+            answer = self.extract_answer(payload)
 
             # ========== ШАГ 4: Обработка образовательных программ ==========
             if payload.data.educational_program_1 and len(payload.data.educational_program_1) > 0:
@@ -714,45 +965,14 @@ class BitrixIntegrationService:
                 # Поиск всех программ сразу (404 если хоть одна не найдена)
                 programs = self.find_educational_programs(payload.data.educational_program_1)
 
-                # Для каждой найденной программы создаем/обновляем сделку
-                for program in programs:
-                    program_id = int(program["ID"])
-                    program_name = program["NAME"]
-
-                    logger.info(f"\n   📚 Processing program: {program_name}")
-                    logger.info(f"      Program ID: {program_id}")
-
-                    # Поиск/создание сделки для этой программы
-                    logger.info(f"      🔍 Finding or creating deal...")
-                    deal_id, is_new = self.find_or_create_deal(
-                        contact_id=contact_id,
-                        program_id=program_id,
-                        poll_form_id=poll_form.get("ID"),
-                    )
-
-                    deal_status = "Created new" if is_new else "Found existing"
-                    logger.info(f"      ✅ {deal_status} deal")
-                    logger.info(f"         Deal ID: {deal_id}")
-
-                    # Обогащение сделки
-                    logger.info(f"      💎 Enriching deal with additional data...")
-                    self.enrich_deal(
-                        deal_id=deal_id,
-                        data=payload.data,
-                        analytics=payload.header_data.analytics,
-                        additional_fields=additional_fields,
-                    )
-                    logger.info(f"      ✅ Deal enriched successfully")
-
-                    # Сохраняем результат
-                    result["deals"].append(
-                        {
-                            "program_name": program_name,
-                            "program_id": program_id,
-                            "deal_id": deal_id,
-                            "is_new": is_new,
-                        }
-                    )
+                # Сделки по программам независимы - обрабатываем параллельно
+                result["deals"] = self._process_program_deals(
+                    programs=programs,
+                    contact_id=contact_id,
+                    poll_form_id=poll_form.get("ID"),
+                    payload=payload,
+                    answer=answer,
+                )
 
                 result["total_deals"] = len(result["deals"])
 
@@ -762,20 +982,17 @@ class BitrixIntegrationService:
                     "\n📝 STEP 4: No educational programs specified, creating generic deal..."
                 )
 
-                deal_id, is_new = self.find_or_create_deal(
-                    contact_id=contact_id, program_id=None, poll_form_id=poll_form.get("ID")
+                # Поиск/создание и обогащение сделки
+                deal_id, is_new = self.find_and_enrich_deal(
+                    contact_id=contact_id,
+                    program_id=None,
+                    poll_form_id=poll_form.get("ID"),
+                    payload=payload,
+                    answer=answer,
                 )
 
                 logger.info(f"✅ Deal {'created' if is_new else 'found'}: ID={deal_id}")
 
-                # Обогащение сделки
-                self.enrich_deal(
-                    deal_id=deal_id,
-                    data=payload.data,
-                    analytics=payload.header_data.analytics,
-                    additional_fields=additional_fields,
-                )
-
                 result["deals"].append(
                     {
                         "program_name": "Общая сделка",
@@ -786,6 +1003,9 @@ class BitrixIntegrationService:
                 )
                 result["total_deals"] = 1
 
+            trace.mark("deals")
+            webhook_audit.record(payload, result=result, trace=trace)
+
             # ========== ЗАВЕРШЕНИЕ ==========
             logger.info("\n" + "=" * 70)
             logger.info("✅ WEBHOOK PROCESSED SUCCESSFULLY")
@@ -804,8 +1024,12 @@ class BitrixIntegrationService:
             logger.error("❌ ERROR PROCESSING WEBHOOK")
             logger.error(f"   Error: {str(e)}")
             logger.error("=" * 70)
+            webhook_audit.record(payload, result=result, error=e, trace=trace)
             raise
 
+        finally:
+            current_trace.reset(trace_token)
+
     # Backward compatibility alias
     process_answer = process_webhook
 
@@ -0,0 +1,233 @@
+"""
+Компактный индекс названий опросов (poll_id -> title)
+
+poll_id_names.json (~680 KB, ~3300 записей) нужен только при автосоздании
+опросной формы, поэтому вместо словаря в каждом воркере используется
+бинарный индекс, отображаемый в память (mmap):
+
+    заголовок | poll_id (int64, отсортированы) | смещения (uint32, n + 1) | строки UTF-8
+
+Файл индекса собирается из JSON заранее (python -m app.services.poll_names_index,
+make poll-names-index) или при первом поиске, если индекс отсутствует или
+устарел. Страницы mmap делятся между процессами через page cache ОС.
+Поиск - бинарный по массиву poll_id, O(log n). Изменение JSON (размер или
+mtime) обнаруживается не чаще раза в POLL_NAMES_REFRESH_INTERVAL секунд,
+после чего индекс пересобирается.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+DEFAULT_JSON_PATH = PROJECT_ROOT / "poll_id_names.json"
+
+# Сигнатура включает порядок байт: индекс с другой архитектуры пересобирается
+MAGIC = b"PNX" + (b"L" if sys.byteorder == "little" else b"B")
+
+# magic, количество записей, размер и mtime исходного JSON (нативный порядок байт)
+HEADER = struct.Struct("=4sIQQ")
+
+# Загруженный индекс: (буфер, poll_id, смещения, начало строк)
+IndexState = Tuple[Any, memoryview, memoryview, int]
+
+
+def build_index(json_path: Path, index_path: Optional[Path] = None) -> bytes:
+    """
+    Собрать бинарный индекс из poll_id_names.json
+
+    Args:
+        json_path: Путь к исходному JSON
+        index_path: Куда записать индекс (None - только вернуть содержимое)
+
+    Returns:
+        Содержимое индекса
+    """
+    stat = os.stat(json_path)
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    # Как и при загрузке в словарь: при повторе poll_id побеждает последняя запись
+    names = {int(record["poll_id"]): record["title"] for record in data.get("RECORDS", [])}
+    poll_ids = sorted(names)
+
+    strings = bytearray()
+    offsets = array("I", [0])
+    for poll_id in poll_ids:
+        strings += names[poll_id].encode("utf-8")
+        offsets.append(len(strings))
+
+    blob = b"".join(
+        [
+            HEADER.pack(MAGIC, len(poll_ids), stat.st_size, stat.st_mtime_ns),
+            array("q", poll_ids).tobytes(),
+            offsets.tobytes(),
+            bytes(strings),
+        ]
+    )
+
+    if index_path is not None:
+        # Атомарная замена: читатели видят либо старый, либо новый индекс целиком
+        tmp_path = Path(f"{index_path}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(blob)
+        os.replace(tmp_path, index_path)
+        logger.info(f"Poll names index built: {len(poll_ids)} records -> {index_path}")
+
+    return blob
+
+
+class PollNamesIndex:
+    """
+    Поиск названия опроса по poll_id в бинарном индексе
+    """
+
+    def __init__(
+        self,
+        json_path: Path = DEFAULT_JSON_PATH,
+        index_path: Optional[Path] = None,
+        refresh_interval: Optional[float] = None,
+    ):
+        """
+        Инициализация (файлы не открываются до первого поиска)
+
+        Args:
+            json_path: Исходный poll_id_names.json
+            index_path: Файл индекса (по умолчанию POLL_NAMES_INDEX_PATH или <json>.idx)
+            refresh_interval: Период проверки изменений JSON в секундах
+                              (по умолчанию POLL_NAMES_REFRESH_INTERVAL)
+        """
+        self.json_path = Path(json_path)
+        self.index_path = Path(
+            index_path or settings.POLL_NAMES_INDEX_PATH or self.json_path.with_suffix(".idx")
+        )
+        self.refresh_interval = (
+            settings.POLL_NAMES_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        )
+
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._source: Optional[Tuple[int, int]] = None
+        # Заменяется целиком при перезагрузке; None - индекс еще не загружен
+        self._state: Optional[IndexState] = None
+
+    def _source_stat(self) -> Optional[Tuple[int, int]]:
+        """(размер, mtime) исходного JSON или None если файла нет"""
+        try:
+            stat = os.stat(self.json_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _read_index(self, source: Optional[Tuple[int, int]]):
+        """Отобразить файл индекса в память, если он актуален для source"""
+        try:
+            with open(self.index_path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(buffer) < HEADER.size:
+            return None
+        magic, _, size, mtime_ns = HEADER.unpack_from(buffer)
+        # Без исходного JSON используем имеющийся индекс как есть
+        if magic != MAGIC or (source is not None and (size, mtime_ns) != source):
+            return None
+        return buffer
+
+    def _load(self) -> IndexState:
+        """Загрузить индекс, при необходимости пересобрав его из JSON"""
+        source = self._source_stat()
+        buffer = self._read_index(source)
+
+        if buffer is None and source is not None:
+            try:
+                build_index(self.json_path, self.index_path)
+                buffer = self._read_index(source)
+            except OSError as e:
+                # Каталог недоступен для записи - индекс только в памяти процесса
+                logger.warning(f"Cannot write poll names index {self.index_path}: {e}")
+                buffer = build_index(self.json_path)
+            except Exception as e:
+                logger.error(f"Failed to build poll names index: {e}")
+
+        if buffer is None:
+            logger.error(f"Poll names are unavailable: {self.json_path} not found")
+            buffer = HEADER.pack(MAGIC, 0, 0, 0)
+
+        _, count, _, _ = HEADER.unpack_from(buffer)
+        view = memoryview(buffer)
+        ids_end = HEADER.size + count * 8
+        offsets_end = ids_end + (count + 1) * 4
+
+        # Старый mmap закроется сборщиком мусора, когда исчезнут ссылки на него
+        state: IndexState = (
+            buffer,
+            view[HEADER.size : ids_end].cast("q"),
+            view[ids_end:offsets_end].cast("I"),
+            offsets_end,
+        )
+        self._state = state
+        self._source = source
+        logger.info(f"Poll names index loaded: {count} records")
+        return state
+
+    def _ensure_loaded(self) -> IndexState:
+        now = time.monotonic()
+        state = self._state
+        if state is not None and now - self._checked_at < self.refresh_interval:
+            return state
+
+        with self._lock:
+            state = self._state
+            if state is None or self._source_stat() != self._source:
+                state = self._load()
+            self._checked_at = now
+        return state
+
+    def get(self, poll_id: int) -> Optional[str]:
+        """
+        Название опроса по poll_id
+
+        Args:
+            poll_id: ID опроса
+
+        Returns:
+            Название или None если poll_id нет в индексе
+        """
+        buffer, ids, offsets, strings_start = self._ensure_loaded()
+
+        position = bisect_left(ids, poll_id)
+        if position == len(ids) or ids[position] != poll_id:
+            return None
+
+        start = strings_start + offsets[position]
+        end = strings_start + offsets[position + 1]
+        return bytes(buffer[start:end]).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._ensure_loaded()[1])
+
+
+# Глобальный индекс названий опросов
+poll_names_index = PollNamesIndex()
+
+
+if __name__ == "__main__":
+    # Шаг сборки: python -m app.services.poll_names_index [json_path [index_path]]
+    logging.basicConfig(level=logging.INFO)
+    json_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_JSON_PATH
+    index_path = Path(sys.argv[2]) if len(sys.argv) > 2 else PollNamesIndex(json_path).index_path
+    build_index(json_path, index_path)
@@ -0,0 +1,60 @@
+"""
+Проекции полей для запросов к Bitrix24
+
+Каждый потребитель объявляет поля, которые он читает. Клиент передает их в
+select / SELECT, чтобы Bitrix24 не отдавал все свойства и UF поля, а результат
+урезается до объявленных полей перед кешированием (lists.element.get добавляет
+служебные поля независимо от SELECT).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Projection:
+    """Набор полей, которые читает потребитель ответа"""
+
+    fields: Tuple[str, ...]
+
+    def select(self, *extra: str) -> List[str]:
+        """
+        Список полей для select / SELECT
+
+        Args:
+            extra: Дополнительные поля (коды из плана маппинга)
+
+        Returns:
+            Поля проекции и дополнительные поля без повторов
+        """
+        return list(dict.fromkeys(self.fields + extra))
+
+    def apply(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Оставить в элементе только поля проекции"""
+        return {field: item[field] for field in self.fields if field in item}
+
+
+# Опросная форма (список IBLOCK_ID=17): ID для сделки, NAME для логов
+POLL_FORM = Projection(("ID", "NAME", "CODE"))
+
+# Образовательная программа (список IBLOCK_ID=18): ID для сделки, NAME для сопоставления
+EDUCATIONAL_PROGRAM = Projection(("ID", "NAME"))
+
+# Поиск контакта или сделки: нужен только ID
+ID_ONLY = Projection(("ID",))
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Разбор параметра fields= прокси эндпоинтов
+
+    Args:
+        fields: Поля через запятую (например, "ID,TITLE,STAGE_ID")
+
+    Returns:
+        Список полей или None, если параметр не задан
+    """
+    if not fields:
+        return None
+    parsed = [field.strip() for field in fields.split(",") if field.strip()]
+    return list(dict.fromkeys(parsed)) or None
@@ -0,0 +1,453 @@
+"""
+Локальная проверка полей перед отправкой в Bitrix24
+
+Схемы полей (crm.contact.fields, crm.deal.fields, lists.field.get) из каталога
+bitrix24_schemas/ компилируются в функции проверки и приведения значений по
+каждому полю. Поля контакта, сделки и элемента списка проверяются до запроса:
+неверный тип, неизвестное поле UF_CRM_* / PROPERTY_* или отсутствующее
+обязательное поле дают SchemaValidationError без обращения к API и без retry.
+
+Приведение значений:
+- числа и строки-числа для integer/double и полей-ссылок (ID)
+- bool -> "Y"/"N" для char и 1/0 для boolean
+- строка -> [{"VALUE": ..., "VALUE_TYPE": "WORK"}] для мультиполей (EMAIL, PHONE)
+- одиночное значение -> список для множественных полей
+- поля только для чтения (ID, DATE_CREATE, ...) отбрасываются
+
+При SCHEMA_REFRESH_INTERVAL > 0 схемы загружаются из живых методов *.fields
+и кешируются в cache_manager на указанное время; при ошибке загрузки
+используется последняя известная схема (или файл из bitrix24_schemas/).
+"""
+
+import json
+import logging
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.cache import cache_manager
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMAS_DIR = Path(__file__).parent.parent.parent / "bitrix24_schemas"
+
+# Схемы CRM сущностей: ключ -> (файл, метод получения полей)
+CRM_SCHEMAS = {
+    "contact": ("contact_fields.json", "crm.contact.fields"),
+    "deal": ("deal_fields.json", "crm.deal.fields"),
+}
+
+# Схемы универсальных списков (IBLOCK_ID берется из самих файлов)
+LIST_SCHEMA_FILES = ("poll_list_fields.json", "educational_programs_fields.json")
+
+# Методы записи: метод -> (сущность, ключ полей в params, частичное обновление)
+WRITE_METHODS = {
+    "crm.contact.add": ("contact", "fields", False),
+    "crm.contact.update": ("contact", "fields", True),
+    "crm.deal.add": ("deal", "fields", False),
+    "crm.deal.update": ("deal", "fields", True),
+    "lists.element.add": ("list", "FIELDS", False),
+    "lists.element.update": ("list", "FIELDS", True),
+}
+
+# Префиксы полей, которые обязаны присутствовать в схеме
+STRICT_PREFIXES = ("UF_", "PROPERTY_")
+
+# Типы полей, значением которых является ID другой сущности
+ID_TYPES = {
+    "crm_status",
+    "crm_category",
+    "crm_currency",
+    "crm_company",
+    "crm_contact",
+    "crm_lead",
+    "crm_quote",
+    "enumeration",
+    "iblock_element",
+    "iblock_section",
+    "user",
+    "employee",
+}
+
+_rejected = metrics.counter(
+    "bitrix_schema_rejections_total", "Outbound payloads rejected by local schema validation"
+)
+
+Coercer = Callable[[Any], Any]
+
+
+class SchemaValidationError(ValueError):
+    """Поля не прошли локальную проверку по схеме Bitrix24"""
+
+    def __init__(self, entity: str, errors: List[str]):
+        self.entity = entity
+        self.errors = errors
+        super().__init__(f"Invalid {entity} fields: {'; '.join(errors)}")
+
+
+# ==================== Coercers ====================
+
+
+def _to_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise TypeError("ожидается строка")
+
+
+def _to_char(value: Any) -> str:
+    if isinstance(value, bool):
+        return "Y" if value else "N"
+    return _to_string(value)
+
+
+def _to_integer(value: Any) -> int:
+    if isinstance(value, bool):
+        raise TypeError("ожидается целое число")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return int(value.strip())
+    raise TypeError("ожидается целое число")
+
+
+def _to_double(value: Any) -> float:
+    if isinstance(value, bool):
+        raise TypeError("ожидается число")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        return float(value.strip().replace(",", "."))
+    raise TypeError("ожидается число")
+
+
+def _to_boolean(value: Any) -> int:
+    if isinstance(value, bool):
+        return int(value)
+    if value in (0, 1):
+        return int(value)
+    if isinstance(value, str) and value.upper() in ("Y", "N", "1", "0"):
+        return 1 if value.upper() in ("Y", "1") else 0
+    raise TypeError("ожидается Y/N")
+
+
+def _to_date(value: Any) -> str:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value
+    raise TypeError("ожидается дата")
+
+
+def _to_id(value: Any) -> Any:
+    if isinstance(value, bool):
+        raise TypeError("ожидается ID")
+    if isinstance(value, (int, str)):
+        return value
+    raise TypeError("ожидается ID")
+
+
+def _to_multifield(value: Any) -> Dict[str, Any]:
+    if isinstance(value, str):
+        return {"VALUE": value, "VALUE_TYPE": "WORK"}
+    if isinstance(value, dict) and ("VALUE" in value or "ID" in value):
+        return value
+    raise TypeError('ожидается {"VALUE": ..., "VALUE_TYPE": ...}')
+
+
+def _passthrough(value: Any) -> Any:
+    return value
+
+
+CRM_COERCERS: Dict[str, Coercer] = {
+    "string": _to_string,
+    "char": _to_char,
+    "integer": _to_integer,
+    "double": _to_double,
+    "boolean": _to_boolean,
+    "date": _to_date,
+    "datetime": _to_date,
+    "crm_multifield": _to_multifield,
+}
+
+# Базовые типы свойств универсальных списков (до ":"), TYPE NAME - название элемента
+LIST_COERCERS: Dict[str, Coercer] = {
+    "NAME": _to_string,
+    "S": _to_string,
+    "N": _to_double,
+    "L": _to_id,
+    "E": _to_id,
+    "G": _to_id,
+}
+
+
+def _field_coercer(base: Coercer, multiple: bool, keyed: bool) -> Coercer:
+    """
+    Функция приведения значения поля с учетом множественности
+
+    Args:
+        base: Приведение одного значения
+        multiple: Поле множественное (одиночное значение оборачивается в список)
+        keyed: Значение может быть словарем {"n0": ...} (свойства универсальных списков)
+    """
+
+    def coerce(value: Any) -> Any:
+        # None и пустая строка очищают поле и не приводятся
+        if value is None or value == "":
+            return value
+        if keyed and isinstance(value, dict):
+            return {key: coerce(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            if not multiple:
+                raise TypeError("поле не множественное")
+            return [base(item) for item in value]
+        return [base(value)] if multiple else base(value)
+
+    return coerce
+
+
+class EntitySchema:
+    """
+    Скомпилированная схема полей сущности
+    """
+
+    def __init__(self, entity: str, fields: Dict[str, Tuple[Coercer, bool, bool]]):
+        """
+        Args:
+            entity: Название сущности для сообщений об ошибках
+            fields: {код поля: (приведение, обязательное, только чтение)}
+        """
+        self.entity = entity
+        self.fields = fields
+        self.required = [code for code, (_, required, _) in fields.items() if required]
+
+    @classmethod
+    def from_crm_fields(cls, entity: str, definitions: Dict[str, Any]) -> "EntitySchema":
+        """Схема из ответа crm.*.fields"""
+        fields = {}
+        for code, spec in definitions.items():
+            base = CRM_COERCERS.get(spec.get("type"))
+            if base is None:
+                base = _to_id if spec.get("type") in ID_TYPES else _passthrough
+            fields[code] = (
+                _field_coercer(base, bool(spec.get("isMultiple")), keyed=False),
+                bool(spec.get("isRequired")),
+                bool(spec.get("isReadOnly")),
+            )
+        return cls(entity, fields)
+
+    @classmethod
+    def from_list_fields(cls, entity: str, definitions: Dict[str, Any]) -> "EntitySchema":
+        """Схема из ответа lists.field.get"""
+        fields = {}
+        for code, spec in definitions.items():
+            field_type = str(spec.get("TYPE") or "")
+            base = LIST_COERCERS.get(field_type.split(":")[0], _passthrough)
+            fields[code] = (
+                _field_coercer(base, spec.get("MULTIPLE") == "Y", keyed=True),
+                spec.get("IS_REQUIRED") == "Y",
+                False,
+            )
+        return cls(entity, fields)
+
+    def validate(self, values: Dict[str, Any], partial: bool = False) -> Dict[str, Any]:
+        """
+        Проверить и привести поля
+
+        Args:
+            values: Поля для отправки
+            partial: Обновление (обязательные поля не проверяются)
+
+        Returns:
+            Новый словарь с приведенными значениями
+
+        Raises:
+            SchemaValidationError: Если поля не соответствуют схеме
+        """
+        errors = []
+        result = {}
+
+        for code, value in values.items():
+            spec = self.fields.get(code)
+            if spec is None:
+                if code.startswith(STRICT_PREFIXES):
+                    errors.append(f"{code}: неизвестное поле")
+                else:
+                    # Служебные ключи (CODE, PREVIEW_TEXT, ...) передаются как есть
+                    result[code] = value
+                continue
+
+            coerce, _, read_only = spec
+            if read_only:
+                logger.debug(f"Schema: read-only field {self.entity}.{code} dropped")
+                continue
+            try:
+                result[code] = coerce(value)
+            except (TypeError, ValueError) as e:
+                errors.append(f"{code}: {e}")
+
+        if not partial:
+            # Обязательное поле должно быть передано (пустая строка допустима:
+            # контакты без ФИО создаются с NAME="" как и раньше)
+            for code in self.required:
+                if values.get(code) is None:
+                    errors.append(f"{code}: обязательное поле")
+
+        if errors:
+            _rejected.inc(entity=self.entity)
+            raise SchemaValidationError(self.entity, errors)
+        return result
+
+
+class SchemaRegistry:
+    """
+    Схемы полей Bitrix24: файлы bitrix24_schemas/ + обновление из живого API
+    """
+
+    def __init__(self, schemas_dir: Path = SCHEMAS_DIR):
+        self.schemas_dir = Path(schemas_dir)
+        self._lock = threading.Lock()
+        self._loaded = False
+        # ключ ("contact", "deal", "list:17") -> (исходные определения, скомпилированная схема)
+        self._schemas: Dict[str, Tuple[Dict[str, Any], EntitySchema]] = {}
+
+    @staticmethod
+    def _compile(key: str, definitions: Dict[str, Any]) -> EntitySchema:
+        if key.startswith("list:"):
+            return EntitySchema.from_list_fields(key, definitions)
+        return EntitySchema.from_crm_fields(key, definitions)
+
+    def _read(self, filename: str) -> Dict[str, Any]:
+        with open(self.schemas_dir / filename, "r", encoding="utf-8") as f:
+            definitions: Dict[str, Any] = json.load(f).get("result", {})
+        return definitions
+
+    def load(self):
+        """Загрузить и скомпилировать схемы из bitrix24_schemas/"""
+        with self._lock:
+            if self._loaded:
+                return
+
+            files = [(key, filename) for key, (filename, _) in CRM_SCHEMAS.items()]
+            for filename in LIST_SCHEMA_FILES:
+                try:
+                    definitions = self._read(filename)
+                    iblock_id = next(iter(definitions.values()))["IBLOCK_ID"]
+                    files.append((f"list:{iblock_id}", filename))
+                except Exception as e:
+                    logger.error(f"Failed to load Bitrix24 schema {filename}: {e}")
+
+            for key, filename in files:
+                try:
+                    definitions = self._read(filename)
+                    self._schemas[key] = (definitions, self._compile(key, definitions))
+                except Exception as e:
+                    logger.error(f"Failed to load Bitrix24 schema {filename}: {e}")
+
+            self._loaded = True
+            logger.info(f"Bitrix24 schemas compiled: {', '.join(sorted(self._schemas))}")
+
+    def _fetch(self, key: str) -> Dict[str, Any]:
+        """Получить определения полей из живого API"""
+        from app.services.bitrix24_client import bitrix24_client
+
+        if key.startswith("list:"):
+            params = {"IBLOCK_TYPE_ID": "lists", "IBLOCK_ID": int(key.split(":", 1)[1])}
+            return bitrix24_client._make_request("lists.field.get", params).get("result") or {}
+        return bitrix24_client._make_request(CRM_SCHEMAS[key][1]).get("result") or {}
+
+    def refresh(self, key: str) -> bool:
+        """
+        Обновить схему из живого API и закешировать определения
+
+        Args:
+            key: Ключ схемы ("contact", "deal", "list:17")
+
+        Returns:
+            True если схема обновлена
+        """
+        try:
+            definitions = self._fetch(key)
+        except Exception as e:
+            logger.warning(f"Failed to refresh Bitrix24 schema {key}, keeping cached: {e}")
+            return False
+        if not definitions:
+            return False
+
+        cache_manager.set("bitrix_schema", key, definitions, ttl=settings.SCHEMA_REFRESH_INTERVAL)
+        with self._lock:
+            self._schemas[key] = (definitions, self._compile(key, definitions))
+        logger.info(f"Bitrix24 schema refreshed: {key} ({len(definitions)} fields)")
+        return True
+
+    def get(self, key: str) -> Optional[EntitySchema]:
+        """
+        Скомпилированная схема по ключу
+
+        Args:
+            key: Ключ схемы ("contact", "deal", "list:17")
+
+        Returns:
+            Схема или None если для сущности схемы нет
+        """
+        if not self._loaded:
+            self.load()
+
+        if settings.SCHEMA_REFRESH_INTERVAL > 0:
+            definitions = cache_manager.get("bitrix_schema", key)
+            current = self._schemas.get(key)
+            if definitions is None:
+                # Кеш истек: перезагружаем, при ошибке повторим через интервал
+                if not self.refresh(key) and current is not None:
+                    cache_manager.set(
+                        "bitrix_schema", key, current[0], ttl=settings.SCHEMA_REFRESH_INTERVAL
+                    )
+            elif current is None or current[0] is not definitions:
+                # Определения из снимка кеша или другого экземпляра
+                compiled = self._compile(key, definitions)
+                with self._lock:
+                    self._schemas[key] = (definitions, compiled)
+
+        entry = self._schemas.get(key)
+        return entry[1] if entry else None
+
+    def validate_command(self, method: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Проверить и привести поля команды записи
+
+        Args:
+            method: Метод API (crm.contact.add, lists.element.update, ...)
+            params: Параметры метода
+
+        Returns:
+            Параметры с приведенными полями (или исходные, если проверка не нужна)
+
+        Raises:
+            SchemaValidationError: Если поля не соответствуют схеме
+        """
+        target = WRITE_METHODS.get(method)
+        if target is None or not settings.SCHEMA_VALIDATION_ENABLED or not params:
+            return params or {}
+
+        entity, fields_key, partial = target
+        fields = params.get(fields_key)
+        if not isinstance(fields, dict):
+            return params
+
+        if entity == "list":
+            entity = f"list:{params.get('IBLOCK_ID')}"
+        schema = self.get(entity)
+        if schema is None:
+            return params
+
+        return {**params, fields_key: schema.validate(fields, partial=partial)}
+
+
+# Глобальный реестр схем
+schema_registry = SchemaRegistry()
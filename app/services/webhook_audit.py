@@ -0,0 +1,195 @@
+"""
+Журнал обработки ответов (webhook_audit)
+
+Для каждого обработанного ответа сохраняется компактная строка: ID ответа
+и опроса, хеш email, статус, контакт, число сделок и вызовов Bitrix24,
+длительность и ошибка. Сделки, длительности этапов и вызовы API по методам
+хранятся в details (JSONB).
+
+Запись асинхронная через BufferedWriter: обработка ответа не ждет БД,
+а при переполнении буфера строка журнала отбрасывается (ответ важнее).
+Старые записи удаляются фоновым потоком порциями по
+WEBHOOK_AUDIT_PURGE_CHUNK строк, чтобы не держать длинные блокировки.
+"""
+
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import delete, select
+
+from app.config import settings
+from app.database import SessionLocal, utcnow
+from app.models.webhook_audit import WebhookAudit
+from app.services.buffered_writer import BufferedWriter, BufferFullError
+from app.utils.metrics import metrics
+from app.utils.tracing import CallTrace
+
+logger = logging.getLogger(__name__)
+
+_dropped = metrics.counter("webhook_audit_dropped_total", "Audit rows dropped (buffer full)")
+
+
+def hash_email(email: Optional[str]) -> Optional[str]:
+    """sha256 нормализованного email (None для пустого email)"""
+    if not email:
+        return None
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+
+class WebhookAuditStore:
+    """
+    Запись и очистка журнала обработки ответов
+    """
+
+    def __init__(
+        self, writer: Optional[BufferedWriter] = None, session_factory: Callable = SessionLocal
+    ):
+        """
+        Инициализация журнала
+
+        Args:
+            writer: Буфер записи строк (по умолчанию BufferedWriter(WebhookAudit))
+            session_factory: Фабрика синхронных сессий (для очистки)
+        """
+        self.session_factory = session_factory
+        self.writer = writer or BufferedWriter(WebhookAudit, session_factory=session_factory)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(
+        self,
+        payload,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[Exception] = None,
+        trace: Optional[CallTrace] = None,
+        source: str = "answer",
+    ):
+        """
+        Поставить в очередь запись журнала для обработанного ответа
+
+        Args:
+            payload: Данные ответа (WebhookPayload)
+            result: Результат обработки (формат process_webhook)
+            error: Ошибка обработки
+            trace: Трасса обработки (этапы и вызовы Bitrix24)
+            source: Источник ответа (answer / bulk)
+        """
+        if not settings.WEBHOOK_AUDIT_ENABLED:
+            return
+
+        result = result or {}
+        deals = result.get("deals") or getattr(error, "deals", None) or []
+
+        details: Dict[str, Any] = {
+            "poll_form_id": result.get("poll_form_id"),
+            "deals": [
+                {
+                    "deal_id": deal.get("deal_id"),
+                    "program_id": deal.get("program_id"),
+                    "is_new": deal.get("is_new"),
+                }
+                for deal in deals
+            ],
+        }
+        if trace is not None:
+            details["stages"] = trace.stages
+            details["calls"] = dict(trace.calls)
+
+        row = {
+            "created_at": utcnow(),
+            "answer_id": payload.header_data.answer_id,
+            "poll_id": payload.header_data.poll_id,
+            "email_hash": hash_email(payload.data.email),
+            "source": source,
+            "status": "error" if error is not None else "success",
+            "contact_id": result.get("contact_id"),
+            "deals_count": len(deals),
+            "bitrix_calls": trace.total_calls if trace is not None else None,
+            "duration_ms": trace.elapsed_ms() if trace is not None else None,
+            "error": str(error)[:500] if error is not None else None,
+            "details": details,
+        }
+
+        try:
+            # Не ждем места в буфере: обработка ответа не должна зависеть от БД журнала
+            self.writer.add(row, timeout=0)
+        except BufferFullError:
+            _dropped.inc()
+            logger.warning(
+                f"Webhook audit buffer is full, dropped record for answer "
+                f"{payload.header_data.answer_id}"
+            )
+
+    def purge(self, before: Optional[datetime] = None) -> int:
+        """
+        Удалить записи старше срока хранения порциями
+
+        Args:
+            before: Граница удаления (по умолчанию now - WEBHOOK_AUDIT_RETENTION_DAYS)
+
+        Returns:
+            Количество удаленных записей
+        """
+        if before is None:
+            before = utcnow() - timedelta(days=settings.WEBHOOK_AUDIT_RETENTION_DAYS)
+        chunk_size = settings.WEBHOOK_AUDIT_PURGE_CHUNK
+
+        deleted = 0
+        while not self._stop_event.is_set():
+            with self.session_factory() as db:
+                # Отдельная короткая транзакция на каждую порцию
+                ids = select(WebhookAudit.id).where(WebhookAudit.created_at < before)
+                ids = ids.order_by(WebhookAudit.created_at).limit(chunk_size)
+                result = db.execute(
+                    delete(WebhookAudit)
+                    .where(WebhookAudit.id.in_(ids.scalar_subquery()))
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+
+            deleted += result.rowcount
+            if result.rowcount < chunk_size:
+                break
+
+        if deleted:
+            logger.info(f"🧹 Webhook audit: purged {deleted} records older than {before}")
+        return deleted
+
+    def start(self, interval: Optional[float] = None):
+        """
+        Запустить периодическую очистку журнала
+
+        Args:
+            interval: Интервал очистки в секундах (по умолчанию WEBHOOK_AUDIT_PURGE_INTERVAL)
+        """
+        interval = interval or settings.WEBHOOK_AUDIT_PURGE_INTERVAL
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    self.purge()
+                except Exception as e:
+                    logger.error(f"Webhook audit purge failed: {e}")
+                self._stop_event.wait(interval)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=run, name="webhook-audit-purge", daemon=True)
+        self._thread.start()
+        logger.info(f"Webhook audit purge started (interval={interval}s)")
+
+    def stop(self):
+        """Остановить очистку и дописать буфер журнала"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.writer.stop()
+
+
+# Глобальный журнал обработки ответов
+webhook_audit = WebhookAuditStore()
@@ -0,0 +1,221 @@
+"""
+Контроль допуска запросов (admission control) для тяжелых эндпоинтов
+
+Каждая группа маршрутов ограничивает число одновременно выполняемых запросов.
+Сверх лимита запросы ждут в очереди ограниченной длины не дольше дедлайна:
+- очередь заполнена - сразу 429 Too Many Requests
+- дедлайн ожидания истек - 503 Service Unavailable
+В обоих случаях Retry-After оценивается по среднему времени обработки и длине
+очереди, чтобы клиенты повторяли запрос позже, а не сразу.
+
+Очередь FIFO: освободившийся слот передается первому ожидающему. Все операции
+выполняются в event loop, блокировки не нужны.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Iterable, List, Optional
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.utils.metrics import Sample, metrics
+
+logger = logging.getLogger(__name__)
+
+_requests = metrics.counter("admission_requests_total", "Admission decisions by route group")
+
+# Вес нового замера в скользящем среднем времени обработки
+EWMA_ALPHA = 0.2
+
+# Пределы Retry-After, секунд
+RETRY_AFTER_MIN = 1
+RETRY_AFTER_MAX = 60
+
+
+class AdmissionController:
+    """
+    Лимит одновременных запросов группы с ограниченной очередью ожидания
+    """
+
+    def __init__(self, group: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        """
+        Инициализация группы
+
+        Args:
+            group: Имя группы маршрутов (метка метрик)
+            max_in_flight: Максимум одновременно выполняемых запросов (0 - без ограничений)
+            max_queue: Максимум запросов в очереди ожидания
+            queue_timeout: Максимальное время ожидания в очереди, секунд
+        """
+        self.group = group
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.service_time = 1.0  # Скользящее среднее времени обработки, секунд
+        self._waiters: Deque[asyncio.Future] = deque()
+        _controllers.append(self)
+
+    @property
+    def queued(self) -> int:
+        """Запросов в очереди ожидания"""
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Оценка времени до освобождения слота для заголовка Retry-After, секунд"""
+        slots = max(1, self.max_in_flight)
+        estimate = self.service_time * (self.queued + 1) / slots
+        return min(RETRY_AFTER_MAX, max(RETRY_AFTER_MIN, math.ceil(estimate)))
+
+    def _reject(self, status_code: int, outcome: str, detail: str) -> HTTPException:
+        _requests.inc(group=self.group, outcome=outcome)
+        logger.warning(
+            f"🚦 Admission {self.group}: {detail} "
+            f"(in_flight={self.in_flight}, queued={self.queued})"
+        )
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after())},
+        )
+
+    async def acquire(self):
+        """
+        Занять слот группы (с ожиданием в очереди)
+
+        Raises:
+            HTTPException 429: Очередь ожидания заполнена
+            HTTPException 503: Слот не освободился за queue_timeout
+        """
+        if self.max_in_flight <= 0 or (self.in_flight < self.max_in_flight and not self._waiters):
+            self.in_flight += 1
+            _requests.inc(group=self.group, outcome="admitted")
+            return
+
+        if self.queued >= self.max_queue:
+            raise self._reject(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "queue_full",
+                "Сервис перегружен, очередь заполнена",
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Слот передан одновременно с истечением дедлайна
+                _requests.inc(group=self.group, outcome="queued")
+                return
+            waiter.cancel()
+            raise self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "queue_timeout",
+                "Сервис перегружен, превышено время ожидания в очереди",
+            )
+        except BaseException:
+            # Запрос отменен (клиент отключился): возвращаем переданный слот
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        _requests.inc(group=self.group, outcome="queued")
+
+    def release(self, elapsed: Optional[float] = None):
+        """
+        Освободить слот: передать первому ожидающему или уменьшить счетчик
+
+        Args:
+            elapsed: Время обработки запроса (для оценки Retry-After)
+        """
+        if elapsed is not None:
+            self.service_time += EWMA_ALPHA * (elapsed - self.service_time)
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def release_once(self) -> Callable[[], None]:
+        """
+        Функция освобождения занятого слота, срабатывающая один раз
+
+        Для потоковых ответов: слот освобождается и в конце генератора, и в
+        фоновой задаче ответа (если клиент отключился до начала потока).
+        """
+        started = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.release(time.monotonic() - started)
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Выполнить блок, заняв слот группы"""
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+
+# Все группы процесса (для метрик)
+_controllers: List[AdmissionController] = []
+
+
+def _admission_status() -> Iterable[Sample]:
+    for controller in list(_controllers):
+        labels = {"group": controller.group}
+        yield (
+            "admission_in_flight",
+            "gauge",
+            "Requests being processed",
+            labels,
+            controller.in_flight,
+        )
+        yield (
+            "admission_queued",
+            "gauge",
+            "Requests waiting for a slot",
+            labels,
+            controller.queued,
+        )
+
+
+metrics.register_collector(_admission_status)
+
+
+# Одиночные ответы /postAnswer
+answer_admission = AdmissionController(
+    "answer",
+    max_in_flight=settings.ADMISSION_ANSWER_MAX_IN_FLIGHT,
+    max_queue=settings.ADMISSION_ANSWER_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_ANSWER_QUEUE_TIMEOUT,
+)
+
+# Пакетная загрузка /postAnswers (слот держится до конца потока)
+bulk_answer_admission = AdmissionController(
+    "bulk_answers",
+    max_in_flight=settings.ADMISSION_BULK_MAX_IN_FLIGHT,
+    max_queue=settings.ADMISSION_BULK_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_BULK_QUEUE_TIMEOUT,
+)
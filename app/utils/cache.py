@@ -7,10 +7,12 @@
 - Контакты (по email)
 """
 
+import json
 import logging
+import os
 import time
 from functools import wraps
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -51,16 +53,16 @@ class CacheManager:
         """
         key = self._make_key(category, str(identifier))
 
-        if key not in self._cache:
+        # Одна операция чтения: запись может быть удалена из другого потока
+        entry = self._cache.get(key)
+        if entry is None:
             logger.debug(f"Cache MISS: {key}")
             return None
 
-        entry = self._cache[key]
-
         # Проверяем TTL
         if time.time() > entry["expires_at"]:
             logger.debug(f"Cache EXPIRED: {key}")
-            del self._cache[key]
+            self._cache.pop(key, None)
             return None
 
         logger.debug(f"Cache HIT: {key}")
@@ -97,22 +99,102 @@ class CacheManager:
         """
         if identifier:
             key = self._make_key(category, str(identifier))
-            if key in self._cache:
-                del self._cache[key]
+            if self._cache.pop(key, None) is not None:
                 logger.info(f"Cache INVALIDATED: {key}")
         else:
             # Инвалидируем всю категорию
-            keys_to_delete = [k for k in self._cache.keys() if k.startswith(f"{category}:")]
+            keys_to_delete = [k for k in list(self._cache) if k.startswith(f"{category}:")]
             for key in keys_to_delete:
                 del self._cache[key]
             logger.info(f"Cache INVALIDATED: {category}:* ({len(keys_to_delete)} entries)")
 
+    def invalidate_where(self, category: str, predicate: Callable[[Any], bool]) -> int:
+        """
+        Инвалидировать записи категории, значения которых удовлетворяют условию
+
+        Для кешей с ключом не по ID (контакт по email, форма по poll_id), когда
+        известен только ID измененной сущности.
+
+        Args:
+            category: Категория данных
+            predicate: Условие на закешированное значение
+
+        Returns:
+            Количество удаленных записей
+        """
+        prefix = f"{category}:"
+        removed = 0
+        for key, entry in list(self._cache.items()):
+            if key.startswith(prefix) and predicate(entry["value"]):
+                if self._cache.pop(key, None) is not None:
+                    removed += 1
+                    logger.info(f"Cache INVALIDATED: {key}")
+        return removed
+
     def clear(self):
         """Очистить весь кеш"""
         count = len(self._cache)
         self._cache.clear()
         logger.info(f"Cache CLEARED: {count} entries removed")
 
+    def save_snapshot(self, path: str) -> int:
+        """
+        Сохранить неистекшие записи кеша в файл (JSON)
+
+        Записи с несериализуемыми значениями пропускаются.
+
+        Args:
+            path: Путь к файлу снимка
+
+        Returns:
+            Количество сохраненных записей
+        """
+        now = time.time()
+        entries = {}
+        for key, entry in list(self._cache.items()):
+            if entry["expires_at"] <= now:
+                continue
+            try:
+                json.dumps(entry["value"])
+            except (TypeError, ValueError):
+                continue
+            entries[key] = entry
+
+        # Пишем во временный файл и переименовываем: снимок не бывает частично записан
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        logger.info(f"Cache snapshot saved: {len(entries)} entries -> {path}")
+        return len(entries)
+
+    def load_snapshot(self, path: str) -> int:
+        """
+        Загрузить записи кеша из файла снимка (истекшие записи пропускаются)
+
+        Args:
+            path: Путь к файлу снимка
+
+        Returns:
+            Количество загруженных записей
+        """
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+
+        now = time.time()
+        loaded = 0
+        for key, entry in entries.items():
+            if entry.get("expires_at", 0) > now and key not in self._cache:
+                self._cache[key] = entry
+                loaded += 1
+
+        logger.info(f"Cache snapshot loaded: {loaded} entries <- {path}")
+        return loaded
+
     def stats(self) -> Dict[str, Any]:
         """Получить статистику кеша"""
         categories = {}
@@ -0,0 +1,120 @@
+"""
+Потоковая выгрузка строк из БД в NDJSON/CSV
+
+Строки читаются курсором на стороне сервера (stream_results + yield_per)
+порциями по EXPORT_CHUNK_SIZE и сразу отдаются клиенту: память не зависит
+от размера выгрузки. Опционально поток сжимается gzip на лету.
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+
+# MIME тип NDJSON (выгрузки и потоковые ответы API)
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Форматы выгрузки и их MIME типы
+EXPORT_FORMATS = {
+    "ndjson": NDJSON_MEDIA_TYPE,
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Регулярное выражение для валидации параметра format
+EXPORT_FORMAT_PATTERN = "^(ndjson|csv)$"
+
+
+def _csv_value(value: Any) -> Any:
+    """Вложенные структуры (JSON колонки) сериализуются в JSON строку"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _encode_chunk(rows: List[Dict[str, Any]], columns: List[str], fmt: str) -> bytes:
+    """Порция строк в NDJSON или CSV"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([[_csv_value(row.get(column)) for column in columns] for row in rows])
+        return buffer.getvalue().encode()
+
+    return "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows).encode()
+
+
+async def iter_export(
+    query,
+    columns: List[str],
+    serialize: Callable[[Any], Dict[str, Any]],
+    fmt: str,
+    session_factory,
+) -> AsyncIterator[bytes]:
+    """
+    Прочитать результат запроса серверным курсором и закодировать порциями
+
+    Args:
+        query: SELECT по модели
+        columns: Колонки выгрузки (заголовок и порядок CSV)
+        serialize: Преобразование объекта модели в словарь
+        fmt: Формат выгрузки (ndjson / csv)
+        session_factory: Фабрика асинхронных сессий
+
+    Yields:
+        Закодированные порции выгрузки
+    """
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(columns)
+        yield buffer.getvalue().encode()
+
+    query = query.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+    async with session_factory() as db:
+        result = await db.stream_scalars(query)
+        async for partition in result.partitions():
+            yield _encode_chunk([serialize(obj) for obj in partition], columns, fmt)
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Сжатие потока gzip на лету"""
+    compressor = zlib.compressobj(wbits=31)  # 16 + MAX_WBITS: формат gzip
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(
+    query,
+    columns: List[str],
+    serialize: Callable[[Any], Dict[str, Any]],
+    fmt: str,
+    gzip: bool,
+    filename: str,
+    session_factory,
+) -> StreamingResponse:
+    """
+    Потоковый ответ с выгрузкой результата запроса
+
+    Args:
+        query: SELECT по модели
+        columns: Колонки выгрузки
+        serialize: Преобразование объекта модели в словарь
+        fmt: Формат выгрузки (ndjson / csv)
+        gzip: Сжать поток (Content-Encoding: gzip)
+        filename: Имя файла без расширения
+        session_factory: Фабрика асинхронных сессий
+    """
+    chunks = iter_export(query, columns, serialize, fmt, session_factory)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+
+    if gzip:
+        chunks = gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(chunks, media_type=EXPORT_FORMATS[fmt], headers=headers)
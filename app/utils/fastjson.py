@@ -0,0 +1,116 @@
+"""
+Быстрая сериализация JSON (orjson со стандартным json в качестве запасного варианта)
+
+Используется для ответов API (ORJSONResponse по умолчанию), тел запросов и
+ответов Bitrix24 и JSON комментариев сделок. Реализация выбирается
+настройкой JSON_BACKEND:
+- auto   - orjson, если установлен, иначе стандартный json
+- orjson - только orjson (ошибка импорта, если не установлен)
+- stdlib - стандартный json
+
+Вывод обеих реализаций совместим: UTF-8 без экранирования не-ASCII символов,
+отступ 2 пробела для indent=True, datetime/date в ISO 8601, прочие типы через default.
+"""
+
+import json
+from datetime import date, datetime
+from types import ModuleType
+from typing import Any, Callable, Optional, Union
+
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+orjson: Optional[ModuleType]
+if settings.JSON_BACKEND == "stdlib":
+    orjson = None
+else:
+    try:
+        import orjson
+    except ImportError:
+        if settings.JSON_BACKEND == "orjson":
+            raise
+        orjson = None
+
+# Используемая реализация (для логов и /metrics)
+BACKEND = "orjson" if orjson is not None else "stdlib"
+
+
+def _stdlib_default(default: Optional[Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    """Как в orjson: datetime/date сериализуются в ISO 8601, остальное - через default"""
+
+    def encode(value: Any) -> Any:
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if default is not None:
+            return default(value)
+        raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+    return encode
+
+
+def dumps(
+    obj: Any,
+    *,
+    indent: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+    sort_keys: bool = False,
+) -> bytes:
+    """
+    Сериализовать объект в JSON (UTF-8)
+
+    Args:
+        obj: Объект
+        indent: Форматировать с отступом 2 пробела
+        default: Преобразование несериализуемых значений
+        sort_keys: Сортировать ключи словарей (канонический вид)
+
+    Returns:
+        JSON в байтах
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        data: bytes = orjson.dumps(obj, default=default, option=option)
+        return data
+
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+        default=_stdlib_default(default),
+        sort_keys=sort_keys,
+    ).encode("utf-8")
+
+
+def dumps_str(
+    obj: Any, *, indent: bool = False, default: Optional[Callable[[Any], Any]] = None
+) -> str:
+    """Сериализовать объект в JSON строку"""
+    return dumps(obj, indent=indent, default=default).decode("utf-8")
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Разобрать JSON
+
+    Args:
+        data: JSON в байтах или строка
+
+    Returns:
+        Разобранный объект
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON ответ, сериализуемый через fastjson (класс ответа по умолчанию)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,181 @@
+"""
+Полосы приоритета запросов к Bitrix24
+
+Вызывающий код помечает запросы полосой (contextvar current_lane), ожидающие
+слота адаптивного лимита запросы выбираются взвешенной справедливой очередью:
+- webhook    - ответы абитуриентов (/postAnswer)
+- poll       - регистрация опросов (/postPoll)
+- proxy      - чтение и запись через /bitrix24 (по умолчанию для непомеченных)
+- background - пакетная загрузка, выгрузки, сверка индекса сделок
+- health     - фоновая проверка доступности (вне общих лимитов, см. EXEMPT_LANES)
+
+Вес полосы задает ее долю слотов при конкуренции. Запрос, ожидающий дольше
+BITRIX24_LANE_STARVATION_TIMEOUT, обслуживается вне очереди независимо от веса.
+
+Контекст наследуется run_in_threadpool и copy_context().run; в собственных
+потоках полосу нужно задавать явно (bitrix_lane).
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Callable, Deque, Dict, Iterable, Iterator, Optional
+
+from app.config import settings
+from app.utils.metrics import Sample, metrics
+
+
+class Lane(str, Enum):
+    """Полоса приоритета"""
+
+    WEBHOOK = "webhook"
+    POLL = "poll"
+    PROXY = "proxy"
+    BACKGROUND = "background"
+    HEALTH = "health"
+
+
+# Веса полос (доля слотов при конкуренции)
+LANE_WEIGHTS: Dict[Lane, int] = {
+    Lane.WEBHOOK: settings.BITRIX24_LANE_WEIGHT_WEBHOOK,
+    Lane.POLL: settings.BITRIX24_LANE_WEIGHT_POLL,
+    Lane.PROXY: settings.BITRIX24_LANE_WEIGHT_PROXY,
+    Lane.BACKGROUND: settings.BITRIX24_LANE_WEIGHT_BACKGROUND,
+}
+
+# Полосы вне общих лимитов частоты и одновременности: редкие служебные запросы,
+# которые не должны ждать за нагрузкой (иначе readiness падает на пике нагрузки)
+EXEMPT_LANES = frozenset({Lane.HEALTH})
+
+# Полоса текущего запроса
+current_lane: ContextVar[Lane] = ContextVar("current_lane", default=Lane.PROXY)
+
+_granted = metrics.counter("bitrix24_lane_requests_total", "Bitrix24 requests by priority lane")
+_wait = metrics.counter(
+    "bitrix24_lane_wait_seconds_total", "Time spent waiting for a Bitrix24 slot by lane"
+)
+_promoted = metrics.counter(
+    "bitrix24_lane_starvation_promotions_total", "Requests served out of order after starving"
+)
+
+
+@contextmanager
+def bitrix_lane(lane: Lane) -> Iterator[None]:
+    """Выполнить блок с запросами к Bitrix24 в указанной полосе"""
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+def use_lane(lane: Lane) -> Callable:
+    """
+    Зависимость FastAPI, помечающая запросы эндпоинта полосой
+
+    Контекст запроса наследуется обработчиком (в том числе в пуле потоков),
+    поэтому сбрасывать значение не нужно.
+    """
+
+    async def set_lane():
+        current_lane.set(lane)
+
+    return set_lane
+
+
+class Ticket:
+    """Ожидающий запрос"""
+
+    __slots__ = ("lane", "tag", "enqueued_at", "granted")
+
+    def __init__(self, lane: Lane, tag: float):
+        self.lane = lane
+        self.tag = tag
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class WeightedFairQueue:
+    """
+    Взвешенная справедливая очередь по полосам (виртуальное время окончания)
+
+    Каждому запросу назначается метка max(виртуальное время, метка предыдущего
+    запроса полосы) + 1 / вес; первым выбирается запрос с наименьшей меткой.
+    Не потокобезопасна: вызывается под блокировкой лимитера.
+    """
+
+    def __init__(
+        self, weights: Optional[Dict[Lane, int]] = None, starvation_timeout: Optional[float] = None
+    ):
+        """
+        Инициализация очереди
+
+        Args:
+            weights: Веса полос (по умолчанию LANE_WEIGHTS)
+            starvation_timeout: Ожидание, после которого запрос обслуживается вне
+                                очереди (по умолчанию BITRIX24_LANE_STARVATION_TIMEOUT)
+        """
+        self.weights = weights or LANE_WEIGHTS
+        self.starvation_timeout = (
+            settings.BITRIX24_LANE_STARVATION_TIMEOUT
+            if starvation_timeout is None
+            else starvation_timeout
+        )
+        self._queues: Dict[Lane, Deque[Ticket]] = {lane: deque() for lane in Lane}
+        self._last_tag: Dict[Lane, float] = {lane: 0.0 for lane in Lane}
+        self._virtual_time = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def queued(self, lane: Lane) -> int:
+        """Запросов полосы в очереди"""
+        return len(self._queues[lane])
+
+    def push(self, lane: Lane) -> Ticket:
+        """Поставить запрос полосы в очередь"""
+        tag = max(self._virtual_time, self._last_tag[lane]) + 1 / max(1, self.weights[lane])
+        self._last_tag[lane] = tag
+        ticket = Ticket(lane, tag)
+        self._queues[lane].append(ticket)
+        return ticket
+
+    def pop(self) -> Optional[Ticket]:
+        """Следующий запрос: самый старый из голодающих или с наименьшей меткой"""
+        heads = [queue[0] for queue in self._queues.values() if queue]
+        if not heads:
+            return None
+
+        oldest = min(heads, key=lambda ticket: ticket.enqueued_at)
+        if time.monotonic() - oldest.enqueued_at >= self.starvation_timeout:
+            ticket = oldest
+            _promoted.inc(lane=ticket.lane.value)
+        else:
+            ticket = min(heads, key=lambda ticket: ticket.tag)
+
+        self._queues[ticket.lane].popleft()
+        self._virtual_time = max(self._virtual_time, ticket.tag)
+        return ticket
+
+
+def record_grant(lane: Lane, waited: float):
+    """Учесть выданный слот полосы и время ожидания"""
+    _granted.inc(lane=lane.value)
+    if waited > 0:
+        _wait.inc(waited, lane=lane.value)
+
+
+def lane_samples(queue: WeightedFairQueue) -> Iterable[Sample]:
+    """Длины очередей полос для /metrics"""
+    for lane in Lane:
+        if lane in EXEMPT_LANES:
+            continue
+        yield (
+            "bitrix24_lane_queued",
+            "gauge",
+            "Bitrix24 requests waiting for a slot by lane",
+            {"lane": lane.value},
+            queue.queued(lane),
+        )
@@ -0,0 +1,161 @@
+"""
+Модуль метрик сервиса
+
+Простой потокобезопасный реестр счетчиков и gauge-метрик с выводом
+в текстовом формате Prometheus (эндпоинт /metrics).
+
+Значения, которые дешевле вычислить в момент чтения (состояние пула
+соединений, длины очередей), регистрируются как collectors.
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Mapping, Tuple, Type, TypeVar
+
+# Набор меток метрики: отсортированные пары (имя, значение)
+LabelSet = Tuple[Tuple[str, str], ...]
+
+# Сэмпл collector'а: (имя метрики, тип, описание, метки, значение)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _label_set(labels: Mapping[str, object]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """Базовая метрика с набором значений по меткам"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelSet, float] = {}
+        self._lock = threading.Lock()
+
+    def value(self, **labels) -> float:
+        """Текущее значение для набора меток"""
+        return self._values.get(_label_set(labels), 0.0)
+
+    def samples(self) -> List[Tuple[LabelSet, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Монотонно возрастающий счетчик"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_set(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Произвольное текущее значение"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_set(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_set(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: Type[M], name: str, description: str) -> M:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Получить (или создать) счетчик"""
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        """Получить (или создать) gauge"""
+        return self._get_or_create(Gauge, name, description)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """
+        Зарегистрировать функцию, вычисляющую метрики в момент чтения
+
+        Args:
+            collector: Функция, возвращающая сэмплы (имя, тип, описание, метки, значение)
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Все метрики в текстовом формате Prometheus
+
+        Returns:
+            Текст для ответа эндпоинта /metrics
+        """
+        families: Dict[str, Tuple[str, str, List[Tuple[LabelSet, float]]]] = {}
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        for metric in metrics:
+            families[metric.name] = (metric.type_name, metric.description, metric.samples())
+
+        for collector in collectors:
+            for name, type_name, description, labels, value in collector():
+                family = families.setdefault(name, (type_name, description, []))
+                family[2].append((_label_set(labels), value))
+
+        lines = []
+        for name, (type_name, description, samples) in families.items():
+            if description:
+                lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {type_name}")
+            for label_set, value in samples:
+                lines.append(f"{name}{_format_labels(label_set)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry()
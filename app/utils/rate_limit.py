@@ -0,0 +1,254 @@
+"""
+Модуль для ограничения частоты запросов к Bitrix24 API
+
+Bitrix24 использует алгоритм "leaky bucket": ~2 запроса в секунду
+с запасом (burst) до 50 запросов. При превышении API возвращает
+QUERY_LIMIT_EXCEEDED, поэтому ограничиваем частоту на стороне клиента.
+
+Кроме частоты ограничивается число одновременных запросов: лимит
+подстраивается под задержки и сигналы перегрузки Bitrix24 (AIMD), а
+ожидающие слота запросы выбираются по полосам приоритета (app/utils/lanes.py).
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from app.config import settings
+from app.utils.lanes import Lane, WeightedFairQueue, current_lane, lane_samples, record_grant
+from app.utils.metrics import Sample, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Потокобезопасный token bucket
+
+    Общий для всех потоков процесса: параллельные запросы
+    (сделки по нескольким программам, пакетная обработка) делят один лимит.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Инициализация лимитера
+
+        Args:
+            rate: Разрешенное количество запросов в секунду (0 - без ограничений)
+            burst: Максимальный запас токенов
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Получить разрешение на один запрос (блокирует поток при исчерпании лимита)
+
+        Returns:
+            Время ожидания в секундах
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            # Резервируем токен сразу, ожидание - вне блокировки
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            logger.debug(f"Rate limit: waiting {wait:.2f}s")
+            time.sleep(wait)
+
+        return wait
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Адаптивный лимит одновременных запросов (AIMD с порогом по задержке)
+
+    - Успешный ответ с задержкой не выше baseline * tolerance, пока лимит
+      исчерпан (in_flight >= limit): лимит растет на 1/limit (примерно +1 за
+      "окно" из limit запросов). Без нагрузки лимит не растет
+    - Задержка выше порога: лимит умножается на LATENCY_DECREASE
+    - QUERY_LIMIT_EXCEEDED, 429, 503: лимит умножается на backoff
+    - Прочие ошибки лимит не меняют
+
+    Снижения происходят не чаще раза в DECREASE_COOLDOWN секунд: одна волна
+    ошибок от уже отправленных запросов не обрушивает лимит до минимума.
+    baseline - задержка без нагрузки: минимум замеров, медленно дрейфующий вверх.
+    Ведется отдельно по методам API (batch из 50 команд не сравнивается с *.get),
+    задержка batch делится на число команд.
+
+    Когда лимит исчерпан, запросы ждут во взвешенной очереди по полосам
+    приоритета, освободившийся слот передается выбранному запросу.
+    """
+
+    LATENCY_DECREASE = 0.9
+    BASELINE_DRIFT = 0.01
+    DECREASE_COOLDOWN = 1.0
+
+    _adjustments = metrics.counter(
+        "bitrix24_concurrency_adjustments_total", "Adaptive concurrency limit changes"
+    )
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        tolerance: float = 2.0,
+        backoff: float = 0.5,
+        enabled: bool = True,
+    ):
+        """
+        Инициализация лимитера
+
+        Args:
+            initial: Начальный лимит
+            min_limit: Минимальный лимит
+            max_limit: Максимальный лимит
+            tolerance: Во сколько раз задержка может превысить baseline без снижения лимита
+            backoff: Множитель лимита при сигнале перегрузки Bitrix24
+            enabled: False - лимит не применяется (только замеры)
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.enabled = enabled
+        self.in_flight = 0
+        self.baselines: Dict[str, float] = {}
+        self._decreased_at = float("-inf")
+        self._queue = WeightedFairQueue()
+        self._condition = threading.Condition()
+
+    def acquire(self, lane: Optional[Lane] = None):
+        """
+        Дождаться свободного места в лимите (блокирует поток)
+
+        Args:
+            lane: Полоса приоритета (по умолчанию - полоса текущего контекста)
+        """
+        lane = lane or current_lane.get()
+        with self._condition:
+            if not self.enabled or (self.in_flight < int(self.limit) and not self._queue):
+                self.in_flight += 1
+                record_grant(lane, 0.0)
+                return
+
+            ticket = self._queue.push(lane)
+            while not ticket.granted:
+                self._condition.wait()
+
+        record_grant(lane, time.monotonic() - ticket.enqueued_at)
+
+    def _dispatch(self):
+        """Передать свободные слоты ожидающим (под блокировкой)"""
+        granted = False
+        while self.in_flight < int(self.limit):
+            ticket = self._queue.pop()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self.in_flight += 1
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    def release(self, latency: float, outcome: str, method: str = "", commands: int = 1):
+        """
+        Освободить место и подстроить лимит по результату запроса
+
+        Args:
+            latency: Время запроса, секунд
+            outcome: ok, throttled (сигнал перегрузки Bitrix24) или error
+            method: Метод API (свой baseline задержки)
+            commands: Количество команд в запросе (batch), задержка делится на него
+        """
+        with self._condition:
+            # Лимит исчерпан: запрос выполнялся при полной загрузке или его ждут другие
+            saturated = self.in_flight >= int(self.limit) or bool(self._queue)
+            self.in_flight -= 1
+
+            if outcome == "throttled":
+                self._decrease(self.backoff, "throttled")
+            elif outcome == "ok":
+                latency /= max(1, commands)
+                baseline = self.baselines.get(method)
+                if baseline is None or latency < baseline:
+                    baseline = latency
+                else:
+                    baseline += self.BASELINE_DRIFT * (latency - baseline)
+                self.baselines[method] = baseline
+
+                if latency > baseline * self.tolerance:
+                    self._decrease(self.LATENCY_DECREASE, "latency")
+                elif saturated and self.limit < self.max_limit:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                    self._adjustments.inc(direction="increase", reason="ok")
+
+            self._dispatch()
+
+    def _decrease(self, factor: float, reason: str):
+        now = time.monotonic()
+        if now - self._decreased_at < self.DECREASE_COOLDOWN:
+            return
+        self._decreased_at = now
+        previous = self.limit
+        self.limit = max(float(self.min_limit), self.limit * factor)
+        self._adjustments.inc(direction="decrease", reason=reason)
+        logger.warning(f"Bitrix24 concurrency limit {previous:.1f} -> {self.limit:.1f} ({reason})")
+
+
+# Глобальный лимитер запросов к Bitrix24
+bitrix24_rate_limiter = RateLimiter(
+    rate=settings.BITRIX24_RATE_LIMIT, burst=settings.BITRIX24_RATE_BURST
+)
+
+# Глобальный адаптивный лимит одновременных запросов к Bitrix24
+bitrix24_concurrency_limiter = AdaptiveConcurrencyLimiter(
+    initial=settings.BITRIX24_CONCURRENCY_INITIAL,
+    min_limit=settings.BITRIX24_CONCURRENCY_MIN,
+    max_limit=settings.BITRIX24_CONCURRENCY_MAX,
+    tolerance=settings.BITRIX24_CONCURRENCY_LATENCY_TOLERANCE,
+    enabled=settings.BITRIX24_ADAPTIVE_CONCURRENCY,
+)
+
+
+def _concurrency_status() -> Iterable[Sample]:
+    limiter = bitrix24_concurrency_limiter
+    yield (
+        "bitrix24_concurrency_limit",
+        "gauge",
+        "Current adaptive limit of concurrent Bitrix24 requests",
+        {},
+        limiter.limit,
+    )
+    yield (
+        "bitrix24_concurrency_in_flight",
+        "gauge",
+        "Bitrix24 requests in flight",
+        {},
+        limiter.in_flight,
+    )
+    for method, baseline in list(limiter.baselines.items()):
+        yield (
+            "bitrix24_latency_baseline_seconds",
+            "gauge",
+            "Unloaded Bitrix24 latency estimate per method (per command for batch)",
+            {"method": method},
+            baseline,
+        )
+    yield from lane_samples(limiter._queue)
+
+
+metrics.register_collector(_concurrency_status)
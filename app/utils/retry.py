@@ -9,6 +9,8 @@ import time
 from functools import wraps
 from typing import Any, Callable, Optional, Tuple, Type
 
+from app.config import settings
+
 logger = logging.getLogger(__name__)
 
 
@@ -198,29 +200,25 @@ def retry_on_network_error(max_attempts: int = 3, delay: float = 1.0):
 
 class RetryConfig:
     """
-    Конфигурация retry-логики из переменных окружения
+    Конфигурация retry-логики
 
-    Загружается из .env:
+    Значения берутся из settings (.env) в момент обращения:
         BITRIX24_RETRY_MAX_ATTEMPTS=3
         BITRIX24_RETRY_DELAY=1.0
         BITRIX24_RETRY_BACKOFF=2.0
     """
 
-    def __init__(self):
-        import os
-
-        from dotenv import load_dotenv
-
-        load_dotenv()
+    @property
+    def max_attempts(self) -> int:
+        return settings.BITRIX24_RETRY_MAX_ATTEMPTS
 
-        self.max_attempts = int(os.getenv("BITRIX24_RETRY_MAX_ATTEMPTS", "3"))
-        self.delay = float(os.getenv("BITRIX24_RETRY_DELAY", "1.0"))
-        self.backoff = float(os.getenv("BITRIX24_RETRY_BACKOFF", "2.0"))
+    @property
+    def delay(self) -> float:
+        return settings.BITRIX24_RETRY_DELAY
 
-        logger.info(
-            f"RetryConfig загружена: max_attempts={self.max_attempts}, "
-            f"delay={self.delay}s, backoff={self.backoff}"
-        )
+    @property
+    def backoff(self) -> float:
+        return settings.BITRIX24_RETRY_BACKOFF
 
 
 # Глобальный экземпляр конфигурации
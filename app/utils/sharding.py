@@ -0,0 +1,249 @@
+"""
+Упорядоченная обработка по ключу с шардированием (ответы по email абитуриента)
+
+Для каждого ключа ведется очередь FIFO: задачи с одним ключом выполняются строго
+в порядке поступления (нет дублей контактов и обогащения сделок не по порядку),
+задачи с разными ключами не ждут друг друга.
+
+Задача выполняется в потоке вызывающего (пул потоков), очереди только задают
+порядок. Поэтому нет собственных потоков-обработчиков: параллельность ограничивает
+admission control, а пакет из многих ключей держит очередь только своих ключей.
+
+Ключ хешируется в один из N шардов: у шарда своя блокировка и свои очереди ключей
+(меньше конкуренции за блокировку) и свои метрики: shard_queue_depth и
+shard_lag_seconds (возраст самой старой ожидающей задачи), shard_tasks_total и
+shard_wait_seconds_total.
+"""
+
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.utils.metrics import Sample, metrics
+
+T = TypeVar("T")
+
+_tasks = metrics.counter("shard_tasks_total", "Ordered tasks started per shard")
+_wait = metrics.counter("shard_wait_seconds_total", "Time tasks waited for their keys per shard")
+
+
+class _Ticket:
+    """Место задачи в очередях ее ключей"""
+
+    __slots__ = ("shards", "keys", "enqueued_at", "started", "ready", "_blocked", "_lock")
+
+    def __init__(self, shards: List["_Shard"], keys: Dict[int, List[str]]):
+        self.shards = shards
+        # Ключи задачи по номерам шардов
+        self.keys = keys
+        self.enqueued_at = time.monotonic()
+        self.started = False
+        self.ready = threading.Event()
+        # Сколько очередей ключей еще заняты более ранними задачами
+        self._blocked = 0
+        self._lock = threading.Lock()
+
+    def unblock(self):
+        with self._lock:
+            self._blocked -= 1
+            if self._blocked == 0:
+                self.ready.set()
+
+
+class _Shard:
+    """Очереди ключей одного шарда"""
+
+    def __init__(self, group: str, index: int):
+        self.group = group
+        self.index = index
+        self.lock = threading.Lock()
+        self.queues: Dict[str, Deque[_Ticket]] = {}
+
+    def depth(self) -> int:
+        """Задач в очередях ключей шарда (ожидающих и выполняющихся)"""
+        with self.lock:
+            return sum(len(queue) for queue in self.queues.values())
+
+    def lag(self) -> float:
+        """Возраст самой старой задачи, ожидающей ключ этого шарда, секунд"""
+        with self.lock:
+            waiting = [queue[1].enqueued_at for queue in self.queues.values() if len(queue) > 1]
+        return time.monotonic() - min(waiting) if waiting else 0.0
+
+
+class ShardedExecutor:
+    """
+    Упорядочивание задач по ключам, разбитое на N шардов
+    """
+
+    def __init__(self, group: str, shards: int):
+        """
+        Инициализация
+
+        Args:
+            group: Имя группы (метка метрик)
+            shards: Количество шардов (0 - без упорядочивания, задачи выполняются сразу)
+        """
+        self.group = group
+        self._shards = [_Shard(group, index) for index in range(max(0, shards))]
+        _executors.append(self)
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def shard_for(self, key: str) -> int:
+        """Номер шарда ключа (стабильный хеш, не зависит от PYTHONHASHSEED)"""
+        return zlib.crc32(key.encode()) % len(self._shards)
+
+    @contextmanager
+    def hold(self, keys: Iterable[str]) -> Iterator[None]:
+        """
+        Дождаться очереди всех ключей и удерживать их до выхода из блока (блокирует поток)
+
+        Задачи, пришедшие позже с любым из этих ключей, ждут выхода из блока;
+        задачи с другими ключами не ждут. Задача встает в очереди всех своих
+        ключей атомарно, поэтому пересекающиеся наборы ключей не блокируют
+        друг друга взаимно.
+
+        Args:
+            keys: Ключи упорядочивания (нормализованные email), пустые пропускаются
+        """
+        ticket = self._enqueue(keys)
+        try:
+            self._wait(ticket)
+            yield
+        finally:
+            self._dequeue(ticket)
+
+    def call(self, keys: Iterable[str], func: Callable[..., T], *args: Any) -> T:
+        """
+        Выполнить функцию в текущем потоке в порядке очереди ключей
+
+        Args:
+            keys: Ключи упорядочивания
+            func: Функция
+            args: Аргументы функции
+
+        Returns:
+            Результат функции
+        """
+        with self.hold(keys):
+            return func(*args)
+
+    async def run(self, key: Optional[str], func: Callable[..., T], *args: Any) -> T:
+        """
+        Выполнить задачу в пуле потоков в порядке очереди ключа (из event loop)
+
+        Место в очереди занимается сразу, в event loop: порядок задач одного ключа -
+        порядок вызовов run, а не порядок, в котором пул потоков начнет их выполнять.
+        Без ключа или при отключенном упорядочивании задача выполняется сразу.
+        """
+        ticket = self._enqueue([key] if key else [])
+        try:
+            return await run_in_threadpool(self._run_queued, ticket, func, *args)
+        except BaseException:
+            # Отмена до запуска в пуле потоков: поток не освободит место в очереди
+            if ticket is not None and not ticket.started:
+                self._dequeue(ticket)
+            raise
+
+    def _run_queued(self, ticket: Optional[_Ticket], func: Callable[..., T], *args: Any) -> T:
+        if ticket is not None:
+            ticket.started = True
+        try:
+            self._wait(ticket)
+            return func(*args)
+        finally:
+            self._dequeue(ticket)
+
+    def _enqueue(self, keys: Iterable[str]) -> Optional[_Ticket]:
+        """Встать в очереди ключей (не блокирует); None - упорядочивание не нужно"""
+        unique = sorted({key for key in keys if key})
+        if not self._shards or not unique:
+            return None
+
+        by_shard: Dict[int, List[str]] = {}
+        for key in unique:
+            by_shard.setdefault(self.shard_for(key), []).append(key)
+        ticket = _Ticket([self._shards[index] for index in sorted(by_shard)], by_shard)
+
+        # Блокировки всех шардов берутся по возрастанию номера и держатся до конца
+        # постановки: порядок задач во всех общих очередях согласован (нет взаимной блокировки)
+        for shard in ticket.shards:
+            shard.lock.acquire()
+        try:
+            for shard in ticket.shards:
+                for key in by_shard[shard.index]:
+                    queue = shard.queues.setdefault(key, deque())
+                    if queue:
+                        ticket._blocked += 1
+                    queue.append(ticket)
+            if ticket._blocked == 0:
+                ticket.ready.set()
+        finally:
+            for shard in reversed(ticket.shards):
+                shard.lock.release()
+        return ticket
+
+    def _wait(self, ticket: Optional[_Ticket]):
+        """Дождаться очереди всех ключей задачи (блокирует поток)"""
+        if ticket is None:
+            return
+        ticket.ready.wait()
+        waited = time.monotonic() - ticket.enqueued_at
+        for shard in ticket.shards:
+            _tasks.inc(group=self.group, shard=str(shard.index))
+            _wait.inc(waited, group=self.group, shard=str(shard.index))
+
+    @staticmethod
+    def _dequeue(ticket: Optional[_Ticket]):
+        # Задача выходит из очередей и до начала выполнения (исключение при ожидании)
+        if ticket is None:
+            return
+        for shard in ticket.shards:
+            with shard.lock:
+                for key in ticket.keys[shard.index]:
+                    queue = shard.queues[key]
+                    was_head = queue[0] is ticket
+                    queue.remove(ticket)
+                    if not queue:
+                        del shard.queues[key]
+                    elif was_head:
+                        queue[0].unblock()
+
+
+# Все группы процесса (для метрик)
+_executors: List[ShardedExecutor] = []
+
+
+def _shard_status() -> Iterable[Sample]:
+    for executor in list(_executors):
+        for shard in executor._shards:
+            labels = {"group": executor.group, "shard": str(shard.index)}
+            yield (
+                "shard_queue_depth",
+                "gauge",
+                "Tasks queued or running on the shard's keys",
+                labels,
+                shard.depth(),
+            )
+            yield (
+                "shard_lag_seconds",
+                "gauge",
+                "Age of the oldest task waiting for a key of the shard",
+                labels,
+                shard.lag(),
+            )
+
+
+metrics.register_collector(_shard_status)
+
+
+# Ответы абитуриентов (/postAnswer и чанки /postAnswers), ключ - нормализованный email
+answer_shards = ShardedExecutor("answers", settings.ANSWER_SHARDS)
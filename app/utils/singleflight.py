@@ -0,0 +1,140 @@
+"""
+Объединение одинаковых параллельных запросов (single-flight)
+
+Первый вызов с ключом выполняет функцию, параллельные вызовы с тем же ключом
+ждут его и получают тот же результат (или то же исключение). После завершения
+ключ освобождается: результат не кешируется, следующий вызов снова идет в сеть.
+
+Ожидающие получают собственную копию результата, поэтому изменение ответа
+одним вызывающим не затрагивает остальных.
+
+Метрики: singleflight_requests_total{group, method, role=leader|shared} и
+singleflight_coalesced_ratio{group} - доля вызовов, обслуженных чужим запросом.
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from app.utils.metrics import Sample, metrics
+
+_requests = metrics.counter(
+    "singleflight_requests_total", "Calls through single-flight groups (leader or shared)"
+)
+
+
+class _Call:
+    """Выполняющийся вызов и его результат"""
+
+    __slots__ = ("done", "waiters", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Группа вызовов, объединяемых по ключу
+
+    Потокобезопасна: вызовы из пула потоков FastAPI и фоновых задач делят одну группу.
+    """
+
+    def __init__(self, name: str):
+        """
+        Инициализация группы
+
+        Args:
+            name: Имя группы (метка метрик)
+        """
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        _groups.append(self)
+
+    def do(self, key: Hashable, func: Callable[[], Any], label: str = "") -> Any:
+        """
+        Выполнить func или дождаться уже выполняющегося вызова с тем же ключом
+
+        Args:
+            key: Ключ вызова (отпечаток запроса)
+            func: Функция без аргументов
+            label: Дополнительная метка метрик (например, метод API)
+
+        Returns:
+            Результат func
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            _requests.inc(group=self.name, method=label, role="shared")
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.leaders += 1
+                shared = call.waiters > 0
+            # Ожидающие копируют снимок, а не объект, который вернет лидер
+            if shared and call.error is None:
+                call.result = copy.deepcopy(result)
+            call.done.set()
+            _requests.inc(group=self.name, method=label, role="leader")
+
+    def in_flight(self) -> int:
+        """Количество выполняющихся вызовов"""
+        with self._lock:
+            return len(self._calls)
+
+    def coalesced_ratio(self) -> float:
+        """Доля вызовов, получивших результат чужого запроса"""
+        total = self.leaders + self.shared
+        return self.shared / total if total else 0.0
+
+
+# Все группы процесса (для метрик)
+_groups: List[SingleFlight] = []
+
+
+def _group_status() -> Iterable[Sample]:
+    for group in list(_groups):
+        labels = {"group": group.name}
+        yield (
+            "singleflight_coalesced_ratio",
+            "gauge",
+            "Share of calls served by another caller's in-flight request",
+            labels,
+            group.coalesced_ratio(),
+        )
+        yield (
+            "singleflight_in_flight",
+            "gauge",
+            "Distinct requests currently in flight",
+            labels,
+            group.in_flight(),
+        )
+
+
+metrics.register_collector(_group_status)
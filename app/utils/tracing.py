@@ -0,0 +1,56 @@
+"""
+Трассировка обработки одного ответа
+
+CallTrace собирает длительность этапов обработки и количество вызовов
+Bitrix24 API. Текущая трасса хранится в contextvar: клиент Bitrix24
+учитывает вызовы без явной передачи трассы через все методы сервиса.
+При обработке в пуле потоков контекст нужно передавать явно
+(contextvars.copy_context().run).
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+
+class CallTrace:
+    """
+    Этапы и вызовы API одной обработки
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._last_mark = self.started
+        self.stages: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, stage: str):
+        """Завершить этап: длительность с предыдущей отметки в миллисекундах"""
+        now = time.monotonic()
+        self.stages[stage] = round((now - self._last_mark) * 1000, 1)
+        self._last_mark = now
+
+    def record_call(self, method: str):
+        """Учесть вызов метода API (вызывается из разных потоков)"""
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.started) * 1000)
+
+
+# Трасса текущей обработки (None - вызов вне обработки ответа)
+current_trace: ContextVar[Optional[CallTrace]] = ContextVar("current_trace", default=None)
+
+
+def record_bitrix_call(method: str):
+    """Учесть вызов Bitrix24 API в текущей трассе (если она есть)"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.record_call(method)
@@ -0,0 +1,101 @@
+"""
+Бенчмарк сериализации JSON: стандартный json против fastjson (orjson)
+
+Нагрузка - страница crm.deal.list из 50 сделок со всеми полями схемы
+bitrix24_schemas/deal_fields.json (включая UF поля) и JSON комментарий сделки.
+
+Запуск: python -m benchmarks.json_encoding [повторов]
+"""
+
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.utils import fastjson
+
+SCHEMAS_DIR = Path(__file__).parent.parent / "bitrix24_schemas"
+
+SAMPLE_VALUES = {
+    "integer": "12345",
+    "double": "150000.00",
+    "boolean": "Y",
+    "char": "N",
+    "date": "2025-10-22T00:00:00+03:00",
+    "datetime": "2025-10-22T12:34:56+03:00",
+    "enumeration": "137",
+}
+
+
+def deal_page(rows: int = 50) -> dict:
+    """Ответ crm.deal.list: rows сделок со всеми полями схемы"""
+    with open(SCHEMAS_DIR / "deal_fields.json", encoding="utf-8") as f:
+        schema = json.load(f)["result"]
+
+    deals = []
+    for n in range(rows):
+        deal = {}
+        for code, spec in schema.items():
+            value = SAMPLE_VALUES.get(spec["type"], f"Значение поля {code} #{n}")
+            deal[code] = [value, value] if spec["isMultiple"] else value
+        deal["ID"] = str(1000 + n)
+        deals.append(deal)
+    return {"result": deals, "next": rows, "total": rows * 40, "time": {"duration": 0.12}}
+
+
+def comment_data() -> dict:
+    """Данные JSON комментария сделки (cookies, доп. поля, аналитика)"""
+    return {
+        "cookies": {"roistat_visit": "8467460", "_ga": "GA1.2.1234567890.1700000000"},
+        "additional_fields": {f"question_{n}": f"Ответ на вопрос {n}" for n in range(20)},
+        "analytics": {"ip": "10.0.0.1", "url": "https://portal.hse.ru/poll", "date": "2025-10-22"},
+    }
+
+
+def bench(name: str, func, number: int):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {name:<38} {seconds * 1e6:10.1f} us")
+    return seconds
+
+
+def main(number: int = 200):
+    page = deal_page()
+    body = json.dumps(page, ensure_ascii=False).encode()
+    comment = comment_data()
+    print(f"fastjson backend: {fastjson.BACKEND}; deal page: {len(body) / 1024:.0f} KB")
+
+    print("Proxy response (50 deals):")
+    base = bench(
+        "JSONResponse + jsonable_encoder", lambda: JSONResponse(jsonable_encoder(page)), number
+    )
+    fast = bench("ORJSONResponse", lambda: fastjson.ORJSONResponse(page), number)
+    print(f"  speedup: x{base / fast:.1f}")
+
+    print("Bitrix24 response parsing:")
+    base = bench("json.loads", lambda: json.loads(body), number)
+    fast = bench("fastjson.loads", lambda: fastjson.loads(body), number)
+    print(f"  speedup: x{base / fast:.1f}")
+
+    print("Bitrix24 request body (crm.deal.update):")
+    params = {"id": 1000, "fields": page["result"][0]}
+    base = bench("json.dumps", lambda: json.dumps(params).encode(), number * 10)
+    fast = bench("fastjson.dumps", lambda: fastjson.dumps(params), number * 10)
+    print(f"  speedup: x{base / fast:.1f}")
+
+    print("Deal comment (indent=2):")
+    base = bench(
+        "json.dumps(indent=2)",
+        lambda: json.dumps(comment, ensure_ascii=False, indent=2),
+        number * 10,
+    )
+    fast = bench(
+        "fastjson.dumps_str(indent)", lambda: fastjson.dumps_str(comment, indent=True), number * 10
+    )
+    print(f"  speedup: x{base / fast:.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
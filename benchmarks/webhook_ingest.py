@@ -0,0 +1,91 @@
+"""
+Микробенчмарк разбора ответа /postAnswer: выделение памяти и время на запрос
+
+Сравниваются:
+- прежний путь: json.loads + model_validate, model_dump для лога, model_dump
+  (exclude_none) для дополнительных полей, комментарий и поля обогащения на каждую сделку
+- однопроходный путь: TypeAdapter.validate_json из байтов, model_dump_json для лога,
+  extract_answer один раз на ответ
+
+Запуск: python -m benchmarks.webhook_ingest [программ в ответе] [повторов]
+"""
+
+import json
+import sys
+import timeit
+import tracemalloc
+
+from app.schemas.webhook import WebhookPayload
+from app.services.answer_extraction import (
+    STANDARD_FIELDS,
+    build_deal_comment,
+    extract_answer,
+    parse_webhook_payload,
+)
+from app.services.field_mapping import FieldMappingPlan
+from tests.fixtures import FULL_WEBHOOK_PAYLOAD
+
+PLAN = FieldMappingPlan()
+
+
+def make_body(programs: int) -> bytes:
+    """Ответ с programs программами и 20 вопросами"""
+    data = json.loads(json.dumps(FULL_WEBHOOK_PAYLOAD))
+    data["data"]["educational_program_1"] = [f"Программа {n}" for n in range(programs)]
+    for n in range(20):
+        data["data"][f"question_{n}"] = f"Ответ на вопрос {n}"
+    return json.dumps(data, ensure_ascii=False).encode()
+
+
+def legacy_path(body: bytes) -> list:
+    payload = WebhookPayload.model_validate(json.loads(body))
+    json.dumps(payload.model_dump(), ensure_ascii=False, indent=2, default=str)
+
+    data = payload.data.model_dump(exclude_none=True)
+    additional = {k: v for k, v in data.items() if k not in STANDARD_FIELDS}
+    analytics = payload.header_data.analytics
+    return [
+        PLAN.build_enrich_fields(analytics, build_deal_comment(analytics, additional))
+        for _ in payload.data.educational_program_1 or [None]
+    ]
+
+
+def single_pass_path(body: bytes) -> list:
+    payload = parse_webhook_payload(body)
+    payload.model_dump_json(indent=2)
+
+    answer = extract_answer(payload, PLAN)
+    return [answer.enrich_fields for _ in answer.programs or [None]]
+
+
+def peak_allocated(func, body: bytes, number: int = 200) -> float:
+    """Средний пик памяти, выделенной за один вызов (tracemalloc), в байтах"""
+    func(body)  # прогрев: кеши схем и интернированные строки
+    tracemalloc.start()
+    total = 0
+    for _ in range(number):
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func(body)
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - start
+    tracemalloc.stop()
+    return total / number
+
+
+def main(programs: int = 3, number: int = 2000):
+    body = make_body(programs)
+    assert legacy_path(body) == single_pass_path(body)
+    print(f"Answer: {len(body)} bytes, {programs} programs")
+
+    for name, func in (("legacy", legacy_path), ("single pass", single_pass_path)):
+        seconds = min(timeit.repeat(lambda: func(body), number=number, repeat=5)) / number
+        peak = peak_allocated(func, body)
+        print(f"  {name:<12} {seconds * 1e6:8.1f} us/request  peak {peak / 1024:6.1f} KB/request")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 3,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2000,
+    )
@@ -1,18 +1,42 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.config import settings
-from app.routers import bitrix24, integration, logs
+from app.container import container
+from app.database import async_engine
+from app.routers import audit, bitrix24, integration, logs
+from app.services.health import health_monitor
+from app.utils.fastjson import ORJSONResponse
+from app.utils.metrics import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка ресурсов приложения (порядок задан в app/container.py)"""
+    await run_in_threadpool(container.startup)
+    try:
+        yield
+    finally:
+        await run_in_threadpool(container.shutdown)
+        await async_engine.dispose()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     version="1.0.0",
     description="FastAPI project with PostgreSQL database and Bitrix24 integration",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Include routers
 app.include_router(logs.router, prefix="/api/v1")
 app.include_router(bitrix24.router, prefix="/api/v1")
 app.include_router(integration.router, prefix="/api/v1")
+app.include_router(audit.router, prefix="/api/v1")
 
 
 @app.get("/")
@@ -29,6 +53,29 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: процесс отвечает и фоновая проверка не зависла"""
+    if not health_monitor.is_live():
+        return JSONResponse(status_code=503, content={"status": "dead"})
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: закешированный результат фоновой проверки Bitrix24"""
+    probe = health_monitor.snapshot()
+    if not health_monitor.is_ready():
+        return JSONResponse(status_code=503, content={"status": "not_ready", **probe})
+    return {"status": "ready", **probe}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Метрики сервиса в текстовом формате Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -10,6 +10,7 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 import json
 
+from app.utils.lanes import Lane, current_lane
 from main import app
 from tests.fixtures import (
     FULL_WEBHOOK_PAYLOAD,
@@ -70,6 +71,36 @@ class TestHealthEndpoint:
         assert "service" in data
         assert data["service"] == "integration"
 
+    def test_health_check_does_not_call_bitrix(self, client, mock_bitrix_client):
+        """Тест что health отдает закешированный результат без запроса к Bitrix24"""
+        response = client.get("/api/v1/integration/health")
+
+        assert response.status_code == 200
+        mock_bitrix_client.assert_not_called()
+
+    def test_readiness_uses_cached_probe(self, client, mock_bitrix_client):
+        """Тест readiness: 503 до успешной проверки, 200 после"""
+        from app.services.health import health_monitor
+
+        health_monitor._result["bitrix24_api_available"] = None
+        health_monitor._checked_monotonic = None
+        assert client.get("/health/ready").status_code == 503
+
+        mock_bitrix_client.set_response("server.time", {"result": "2026-10-19T10:00:00+03:00"})
+        health_monitor.probe()
+
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.json()["bitrix24_api_available"] is True
+        assert mock_bitrix_client.call_count == 1
+
+    def test_liveness(self, client):
+        """Тест liveness probe"""
+        response = client.get("/health/live")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "alive"
+
 
 class TestPostPollEndpoint:
     """Тесты для POST /postPoll endpoint"""
@@ -355,6 +386,231 @@ class TestPostAnswerEndpoint:
         assert data["is_successful"] is True
 
 
+class TestPostAnswerAdmission:
+    """Тесты admission control для /postAnswer"""
+
+    def test_saturated_returns_429(self, client):
+        """При занятых слотах и заполненной очереди - 429 с Retry-After без обработки"""
+        from app.utils.admission import answer_admission
+
+        with (
+            patch.object(answer_admission, "in_flight", answer_admission.max_in_flight),
+            patch.object(answer_admission, "max_queue", 0),
+            patch("app.routers.integration.integration_service") as mock_service,
+        ):
+            response = client.post(
+                "/api/v1/integration/postAnswer", json=FULL_WEBHOOK_PAYLOAD
+            )
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        mock_service.process_webhook.assert_not_called()
+
+
+class TestPostAnswersEndpoint:
+    """Тесты для пакетного POST /postAnswers endpoint"""
+
+    @pytest.fixture
+    def mock_batch_bitrix(self, mock_bitrix_client):
+        """Мок Bitrix24 с разбором batch команд"""
+        from urllib.parse import parse_qs
+
+        from app.utils.cache import cache_manager
+
+        cache_manager.clear()
+        calls = []
+
+        def command_result(command):
+            method, _, query = command.partition("?")
+            params = parse_qs(query)
+            if method == "lists.element.get":
+                name = params["FILTER[NAME]"][0]
+                return [{"ID": "101" if name == "Цифровой юрист" else "102", "NAME": name}]
+            return {
+                "crm.contact.list": [],
+                "crm.contact.add": 789,
+                "crm.deal.list": [],
+                "crm.deal.add": 2002,
+                "crm.deal.update": True,
+            }[method]
+
+        def side_effect(method, params=None):
+            calls.append(method)
+            if method == "batch":
+                return {
+                    "result": {
+                        "result": {
+                            name: command_result(command)
+                            for name, command in params["cmd"].items()
+                        }
+                    }
+                }
+            return BITRIX_POLL_FORM_RESPONSE
+
+        mock_bitrix_client.side_effect = side_effect
+        yield calls
+        cache_manager.clear()
+
+    def test_post_answers_json_array(self, client, mock_batch_bitrix):
+        """Тест JSON массива: результаты по каждому ответу в порядке поступления"""
+        second = json.loads(json.dumps(FULL_WEBHOOK_PAYLOAD))
+        second["header_data"]["answer_id"] = 814573982
+
+        response = client.post(
+            "/api/v1/integration/postAnswers",
+            json=[FULL_WEBHOOK_PAYLOAD, second, WEBHOOK_NO_PROGRAMS]
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["answer_id"] for r in results] == [814573981, 814573982, 101112]
+        assert all(r["is_successful"] for r in results)
+
+        # Поиски общие для чанка: одна опросная форма на poll_id, остальное - batch
+        assert mock_batch_bitrix.count("lists.element.get") == 2
+        assert set(mock_batch_bitrix) == {"lists.element.get", "batch"}
+
+    def test_post_answers_ndjson_with_invalid_line(self, client, mock_batch_bitrix):
+        """Тест NDJSON потока: невалидная строка не прерывает обработку"""
+        body = "\n".join([
+            json.dumps(WEBHOOK_NO_PROGRAMS),
+            "{not json",
+            json.dumps({"header_data": {"poll_id": 1, "answer_id": 2}, "data": {}}),
+        ])
+
+        response = client.post(
+            "/api/v1/integration/postAnswers",
+            content=body.encode(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+
+        assert response.status_code == 200
+        results = [json.loads(line) for line in response.text.splitlines()]
+
+        assert len(results) == 3
+        failed = [r for r in results if not r["is_successful"]]
+        assert len(failed) == 2
+        assert {"poll_id": 1, "answer_id": 2} in [
+            {"poll_id": r["poll_id"], "answer_id": r["answer_id"]} for r in failed
+        ]
+        assert any(r["is_successful"] and r["answer_id"] == 101112 for r in results)
+
+    def test_post_answers_stale_index_deal_retried(
+        self, client, mock_bitrix_client, mock_batch_bitrix
+    ):
+        """Сделка из индекса удалена: ответ повторяется с поиском в Bitrix24, а не падает"""
+        from app.services.integration_service import integration_service
+
+        batch_side_effect = mock_bitrix_client.side_effect
+
+        def side_effect(method, params=None):
+            if method == "batch" and any(
+                command.startswith("crm.deal.update") for command in params["cmd"].values()
+            ):
+                mock_batch_bitrix.append(method)
+                return {"result": {"result_error": {
+                    name: {"error": "NOT_FOUND", "error_description": "Not found"}
+                    for name in params["cmd"]
+                }}}
+            if method == "crm.deal.list":
+                mock_batch_bitrix.append(method)
+                return {"result": [{"ID": "3003"}]}
+            if method == "crm.deal.update":
+                mock_batch_bitrix.append(method)
+                return {"result": True}
+            return batch_side_effect(method, params)
+
+        mock_bitrix_client.side_effect = side_effect
+        integration_service.deal_index.put(789, None, 999)
+        try:
+            response = client.post(
+                "/api/v1/integration/postAnswers", json=[WEBHOOK_NO_PROGRAMS]
+            )
+            results = [json.loads(line) for line in response.text.splitlines()]
+
+            assert results[0]["is_successful"] is True
+            assert integration_service.deal_index.get(789) == 3003
+            assert mock_batch_bitrix.count("crm.deal.update") == 1
+        finally:
+            integration_service.deal_index.remove_deal(999)
+            integration_service.deal_index.remove_deal(3003)
+
+    def test_post_answers_invalid_items_keep_input_order(self, client, mock_batch_bitrix):
+        """Результаты невалидных элементов стоят на своих местах среди валидных"""
+        from app.config import settings
+
+        lines = []
+        for n in range(1, 8):
+            if n in (2, 5):
+                lines.append("{not json")
+            elif n == 6:
+                lines.append(json.dumps({"header_data": {"poll_id": 1, "answer_id": n}}))
+            else:
+                payload = json.loads(json.dumps(WEBHOOK_NO_PROGRAMS))
+                payload["header_data"]["answer_id"] = n
+                lines.append(json.dumps(payload))
+
+        with patch.object(settings, "BULK_ANSWERS_CHUNK_SIZE", 3):
+            response = client.post(
+                "/api/v1/integration/postAnswers",
+                content="\n".join(lines).encode(),
+                headers={"Content-Type": "application/x-ndjson"}
+            )
+
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["is_successful"] for r in results] == [
+            True, False, True, True, False, False, True
+        ]
+        assert [r["answer_id"] for r in results if r["is_successful"]] == [1, 3, 4, 7]
+        assert results[5]["answer_id"] == 6
+
+    def test_post_answers_ndjson_max_items(self, client, mock_batch_bitrix):
+        """Лимит BULK_ANSWERS_MAX_ITEMS действует и для NDJSON, до обработки ответов"""
+        from app.config import settings
+
+        body = "\n".join([json.dumps(WEBHOOK_NO_PROGRAMS)] * 3)
+
+        with patch.object(settings, "BULK_ANSWERS_MAX_ITEMS", 2):
+            response = client.post(
+                "/api/v1/integration/postAnswers",
+                content=body.encode(),
+                headers={"Content-Type": "application/x-ndjson"}
+            )
+
+        assert response.status_code == 413
+        assert mock_batch_bitrix == []
+
+    def test_post_answers_ndjson_chunked_body(self, client, mock_batch_bitrix):
+        """Тело NDJSON, пришедшее частями, обрабатывается целиком"""
+        lines = []
+        for n in range(60):
+            payload = json.loads(json.dumps(WEBHOOK_NO_PROGRAMS))
+            payload["header_data"]["answer_id"] = n + 1
+            lines.append(json.dumps(payload) + "\n")
+        body = "".join(lines).encode()
+
+        def chunks():
+            for start in range(0, len(body), 1000):
+                yield body[start:start + 1000]
+
+        response = client.post(
+            "/api/v1/integration/postAnswers",
+            content=chunks(),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["answer_id"] for r in results] == list(range(1, 61))
+
+    def test_post_answers_rejects_non_array(self, client):
+        """Тест что JSON тело должно быть массивом"""
+        response = client.post("/api/v1/integration/postAnswers", json=FULL_WEBHOOK_PAYLOAD)
+
+        assert response.status_code == 400
+
+
 class TestAPIResponses:
     """Тесты структуры ответов API"""
 
@@ -427,6 +683,449 @@ class TestContentNegotiation:
         assert response.status_code == 422
 
 
+class TestLogsEndpoint:
+    """Тесты для /logs: keyset пагинация, фильтры, выгрузка"""
+
+    @pytest.fixture
+    def logs_db(self, tmp_path):
+        """Отдельная SQLite БД (aiosqlite) с заранее созданными логами"""
+        from datetime import datetime, timedelta
+
+        from sqlalchemy import create_engine
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import NullPool
+
+        from app.database import Base, get_async_db
+        from app.models.log import Log
+
+        db_path = tmp_path / "logs.db"
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=engine)
+
+        base_time = datetime(2026, 1, 1, 12, 0, 0)
+        with sessionmaker(bind=engine)() as db:
+            for i in range(5):
+                # Две записи с одинаковым created_at проверяют tie-break по id
+                db.add(Log(created_at=base_time + timedelta(minutes=i // 2), message=f"event {i}"))
+            db.add(Log(created_at=base_time + timedelta(minutes=10), message="Webhook ERROR 100%"))
+            db.commit()
+        engine.dispose()
+
+        # NullPool: соединения aiosqlite не переживают event loop TestClient
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+        TestSession = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+        async def override_get_async_db():
+            async with TestSession() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        with patch('app.routers.logs.AsyncSessionLocal', TestSession):
+            yield
+        app.dependency_overrides.pop(get_async_db, None)
+
+    def test_keyset_pagination(self, client, logs_db):
+        """Страницы не пересекаются и покрывают все логи в порядке убывания"""
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 4}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/api/v1/logs/", params=params)
+            assert list(response.json()) == ["logs"]
+            seen.extend(log["id"] for log in response.json()["logs"])
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        assert seen == [6, 5, 4, 3, 2, 1]
+
+    def test_filters(self, client, logs_db):
+        """Фильтры по времени и подстроке (спецсимволы LIKE экранируются)"""
+        data = client.get("/api/v1/logs/", params={"q": "error 100%"}).json()
+        assert [log["id"] for log in data["logs"]] == [6]
+
+        data = client.get("/api/v1/logs/", params={"q": "%"}).json()
+        assert [log["id"] for log in data["logs"]] == [6]
+
+        response = client.get(
+            "/api/v1/logs/",
+            params={"since": "2026-01-01T12:01:00", "until": "2026-01-01T12:05:00"},
+        )
+        assert [log["id"] for log in response.json()["logs"]] == [5, 4, 3]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_filters_with_utc_offset(self, client, logs_db):
+        """Границы со смещением сравниваются с created_at в UTC"""
+        params = {"since": "2026-01-01T15:01:00+03:00", "until": "2026-01-01T15:05:00+03:00"}
+
+        response = client.get("/api/v1/logs/", params=params)
+        assert [log["id"] for log in response.json()["logs"]] == [5, 4, 3]
+
+        response = client.get("/api/v1/logs/export", params={"since": params["since"]})
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == [3, 4, 5, 6]
+
+    def test_limit_cap_and_bad_cursor(self, client, logs_db):
+        """limit выше максимума и некорректный курсор отклоняются"""
+        from app.config import settings
+
+        response = client.get("/api/v1/logs/", params={"limit": settings.LOGS_PAGE_MAX_LIMIT + 1})
+        assert response.status_code == 422
+
+        response = client.get("/api/v1/logs/", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_export_ndjson_and_csv(self, client, logs_db):
+        """Выгрузка за период в NDJSON и CSV (старые первыми)"""
+        response = client.get(
+            "/api/v1/logs/export", params={"since": "2026-01-01T12:01:00"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == [3, 4, 5, 6]
+
+        response = client.get("/api/v1/logs/export", params={"format": "csv"})
+        lines = response.text.splitlines()
+        assert lines[0] == "id,created_at,message"
+        assert len(lines) == 7
+        assert lines[-1].endswith("Webhook ERROR 100%")
+
+    def test_export_gzip(self, client, logs_db):
+        """Сжатая выгрузка: Content-Encoding gzip"""
+        response = client.get("/api/v1/logs/export", params={"gzip": "true"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        # httpx распаковывает ответ автоматически
+        assert len(response.text.splitlines()) == 6
+
+    def test_create_and_delete(self, client, logs_db):
+        """Создание, получение и удаление лога через асинхронную сессию"""
+        created = client.post("/api/v1/logs/", params={"message": "new entry"}).json()["log"]
+
+        response = client.get(f"/api/v1/logs/{created['id']}")
+        assert response.json()["message"] == "new entry"
+
+        assert client.delete(f"/api/v1/logs/{created['id']}").status_code == 200
+        assert client.get(f"/api/v1/logs/{created['id']}").status_code == 404
+
+    def test_create_deferred(self, client):
+        """deferred=true ставит лог в буфер пакетной записи"""
+        from app.services.buffered_writer import BufferFullError
+
+        with patch('app.routers.logs.log_writer') as writer:
+            response = client.post("/api/v1/logs/", params={"message": "queued", "deferred": "true"})
+            assert response.status_code == 202
+            assert writer.add.call_args[0][0]["message"] == "queued"
+
+            writer.add.side_effect = BufferFullError("full")
+            response = client.post("/api/v1/logs/", params={"message": "queued", "deferred": "true"})
+            assert response.status_code == 503
+
+    def test_metrics_include_pool_counters(self, client):
+        """/metrics отдает метрики пула соединений в формате Prometheus"""
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert "# TYPE db_pool_checkouts_total counter" in response.text
+
+
+class TestAuditExport:
+    """Тесты для /audit/export"""
+
+    def test_export_filters(self, client, tmp_path):
+        """Выгрузка журнала с фильтрами по email и статусу"""
+        from datetime import datetime
+
+        from sqlalchemy import create_engine
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import NullPool
+
+        from app.database import Base
+        from app.models.webhook_audit import WebhookAudit
+        from app.services.webhook_audit import hash_email
+
+        db_path = tmp_path / "audit.db"
+        engine = create_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            for answer_id, email, status in [
+                (1, "a@example.com", "success"),
+                (2, "b@example.com", "error"),
+                (3, "a@example.com", "error"),
+            ]:
+                db.add(
+                    WebhookAudit(
+                        created_at=datetime(2026, 1, 1, 12, answer_id),
+                        answer_id=answer_id,
+                        poll_id=10,
+                        email_hash=hash_email(email),
+                        source="answer",
+                        status=status,
+                        deals_count=0,
+                        details={"deals": []},
+                    )
+                )
+            db.commit()
+        engine.dispose()
+
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+        with patch(
+            'app.routers.audit.AsyncSessionLocal', async_sessionmaker(bind=async_engine)
+        ):
+            response = client.get(
+                "/api/v1/audit/export", params={"email": " A@example.com", "status": "error"}
+            )
+            assert [json.loads(line)["answer_id"] for line in response.text.splitlines()] == [3]
+
+            response = client.get("/api/v1/audit/export", params={"format": "csv"})
+            lines = response.text.splitlines()
+            assert lines[0].startswith("id,created_at,answer_id")
+            assert len(lines) == 4
+
+            # Граница со смещением сравнивается с created_at в UTC
+            response = client.get(
+                "/api/v1/audit/export", params={"since": "2026-01-01T15:02:00+03:00"}
+            )
+            assert [json.loads(line)["answer_id"] for line in response.text.splitlines()] == [2, 3]
+
+
+class TestProxyCache:
+    """Тесты кеша GET /bitrix24/{entity}/{id}"""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        from app.utils.cache import cache_manager
+
+        cache_manager.invalidate("proxy_contact")
+        yield
+        cache_manager.invalidate("proxy_contact")
+
+    def _get_calls(self, mock_bitrix_client):
+        return [c for c in mock_bitrix_client.call_args_list if c.args[0] == "crm.contact.get"]
+
+    def test_hit_after_miss(self, client, mock_bitrix_client):
+        """Повторное чтение отдается из кеша без запроса к Bitrix24"""
+        mock_bitrix_client.set_response("crm.contact.get", BITRIX_CONTACT_RESPONSE)
+
+        first = client.get("/api/v1/bitrix24/contacts/123")
+        second = client.get("/api/v1/bitrix24/contacts/123")
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert first.json() == second.json() == BITRIX_CONTACT_RESPONSE
+        assert first.headers["ETag"] == second.headers["ETag"]
+        assert len(self._get_calls(mock_bitrix_client)) == 1
+
+    def test_if_none_match(self, client, mock_bitrix_client):
+        """Совпадение If-None-Match дает 304 без тела"""
+        mock_bitrix_client.set_response("crm.contact.get", BITRIX_CONTACT_RESPONSE)
+        etag = client.get("/api/v1/bitrix24/contacts/123").headers["ETag"]
+
+        response = client.get("/api/v1/bitrix24/contacts/123", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["X-Cache"] == "HIT"
+
+    def test_update_invalidates(self, client, mock_bitrix_client):
+        """Обновление контакта через прокси сбрасывает кеш"""
+        mock_bitrix_client.set_response("crm.contact.get", BITRIX_CONTACT_RESPONSE)
+        mock_bitrix_client.set_response("crm.contact.update", {"result": True})
+        client.get("/api/v1/bitrix24/contacts/123")
+
+        client.put("/api/v1/bitrix24/contacts/123", json={"NAME": "Петр"})
+        response = client.get("/api/v1/bitrix24/contacts/123")
+
+        assert response.headers["X-Cache"] == "MISS"
+        assert len(self._get_calls(mock_bitrix_client)) == 2
+
+    def test_no_cache_bypass(self, client, mock_bitrix_client):
+        """Cache-Control: no-cache читает из Bitrix24 в обход кеша"""
+        mock_bitrix_client.set_response("crm.contact.get", BITRIX_CONTACT_RESPONSE)
+        client.get("/api/v1/bitrix24/contacts/123")
+
+        response = client.get("/api/v1/bitrix24/contacts/123", headers={"Cache-Control": "no-cache"})
+
+        assert response.headers["X-Cache"] == "BYPASS"
+        assert len(self._get_calls(mock_bitrix_client)) == 2
+
+
+class TestFieldProjection:
+    """Тесты параметра fields= прокси эндпоинтов"""
+
+    def test_list_deals_fields(self, client, mock_bitrix_client):
+        """fields= передается в Bitrix24 как select"""
+        response = client.get("/api/v1/bitrix24/deals", params={"fields": "ID,TITLE, STAGE_ID"})
+
+        assert response.status_code == 200
+        mock_bitrix_client.assert_called_once_with(
+            "crm.deal.list", {"start": 0, "select": ["ID", "TITLE", "STAGE_ID"]}
+        )
+
+
+class TestBulkOperations:
+    """Тесты для /bitrix24/{entity}/bulk"""
+
+    def test_bulk_partial_failure(self, client, mock_bitrix_client):
+        """Операции уходят одним batch, ошибки возвращаются для каждой операции"""
+        mock_bitrix_client.set_response(
+            "batch",
+            {
+                "result": {
+                    "result": {"op_0": 501, "op_2": True},
+                    "result_error": {"op_1": {"error_description": "Not found"}},
+                }
+            },
+        )
+
+        response = client.post(
+            "/api/v1/bitrix24/deals/bulk",
+            json={
+                "operations": [
+                    {"action": "create", "fields": {"TITLE": "Импорт"}},
+                    {"action": "update", "id": 7, "fields": {"TITLE": "Новое"}},
+                    {"action": "delete", "id": 8},
+                ]
+            },
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["total"], data["succeeded"], data["failed"]) == (3, 2, 1)
+        assert data["results"][0]["id"] == 501
+        assert data["results"][1] == {
+            "index": 1,
+            "action": "update",
+            "id": 7,
+            "success": False,
+            "result": None,
+            "error": "Not found",
+        }
+
+        batch_calls = [c for c in mock_bitrix_client.call_args_list if c.args[0] == "batch"]
+        assert len(batch_calls) == 1
+        assert batch_calls[0].args[1]["cmd"]["op_2"] == "crm.deal.delete?id=8"
+
+    def test_bulk_validation(self, client, mock_bitrix_client):
+        """update без id и неизвестная сущность отклоняются до вызова Bitrix24"""
+        response = client.post(
+            "/api/v1/bitrix24/contacts/bulk",
+            json={"operations": [{"action": "update", "fields": {"NAME": "Иван"}}]},
+        )
+        assert response.status_code == 422
+
+        response = client.post("/api/v1/bitrix24/companies/bulk", json={"operations": []})
+        assert response.status_code == 422
+        mock_bitrix_client.assert_not_called()
+
+
+
+class TestBitrixLanes:
+    """Тесты полос приоритета эндпоинтов"""
+
+    @pytest.mark.parametrize(
+        "path,lane",
+        [
+            ("/api/v1/bitrix24/contacts", Lane.PROXY),
+            ("/api/v1/bitrix24/contacts/export", Lane.BACKGROUND),
+        ],
+    )
+    def test_route_lane(self, client, mock_bitrix_client, path, lane):
+        """Запросы к Bitrix24 выполняются в полосе эндпоинта"""
+        seen = []
+        mock_bitrix_client.side_effect = lambda method, params=None: (
+            seen.append(current_lane.get()) or {"result": []}
+        )
+
+        assert client.get(path).status_code == 200
+        assert seen and set(seen) == {lane}
+
+
+
+class TestBitrixEvents:
+    """Тесты приема исходящих событий Bitrix24 /bitrix24/events"""
+
+    TOKEN = "app-token"
+
+    @pytest.fixture(autouse=True)
+    def configure(self):
+        from app.config import settings
+        from app.utils.cache import cache_manager
+
+        with patch.object(settings, "BITRIX24_APPLICATION_TOKEN", self.TOKEN):
+            yield
+        for category in ("proxy_contact", "contact", "poll_form", "educational_program"):
+            cache_manager.invalidate(category)
+
+    def _send(self, client, event, entity_id, token=TOKEN):
+        return client.post(
+            "/api/v1/bitrix24/events",
+            data={
+                "event": event,
+                "data[FIELDS][ID]": str(entity_id),
+                "ts": "1700000000",
+                "auth[application_token]": token,
+                "auth[domain]": "example.bitrix24.ru",
+            },
+        )
+
+    def test_invalid_token_rejected(self, client, mock_bitrix_client):
+        response = self._send(client, "ONCRMDEALUPDATE", 1, token="wrong")
+        assert response.status_code == 403
+
+    def test_not_configured_rejected(self, client, mock_bitrix_client):
+        from app.config import settings
+
+        with patch.object(settings, "BITRIX24_APPLICATION_TOKEN", ""):
+            response = self._send(client, "ONCRMDEALUPDATE", 1)
+        assert response.status_code == 403
+
+    def test_contact_update_invalidates(self, client, mock_bitrix_client):
+        """ONCRMCONTACTUPDATE сбрасывает кеш прокси и email -> ID только этого контакта"""
+        from app.utils.cache import cache_manager
+
+        mock_bitrix_client.set_response("crm.contact.get", BITRIX_CONTACT_RESPONSE)
+        client.get("/api/v1/bitrix24/contacts/123")
+        cache_manager.set("contact", "ivan@example.com", 123)
+        cache_manager.set("contact", "petr@example.com", 456)
+
+        response = self._send(client, "ONCRMCONTACTUPDATE", 123)
+
+        assert response.json() == {"event": "ONCRMCONTACTUPDATE", "status": "applied"}
+        assert client.get("/api/v1/bitrix24/contacts/123").headers["X-Cache"] == "MISS"
+        assert cache_manager.get("contact", "ivan@example.com") is None
+        assert cache_manager.get("contact", "petr@example.com") == 456
+
+    def test_deal_delete_removes_index_entry(self, client, mock_bitrix_client):
+        from app.services.integration_service import integration_service
+
+        with patch.object(integration_service.deal_index, "remove_deal") as remove_deal:
+            response = self._send(client, "ONCRMDEALDELETE", 77)
+
+        assert response.json()["status"] == "applied"
+        remove_deal.assert_called_once_with(77)
+
+    def test_list_element_update_invalidates_poll_form(self, client, mock_bitrix_client):
+        from app.utils.cache import cache_manager
+
+        cache_manager.set("poll_form", 430131691, {"ID": "500", "NAME": "Форма", "CODE": "x"})
+        cache_manager.set("educational_program", "Экономика", {"ID": "600", "NAME": "Экономика"})
+
+        self._send(client, "ONLISTSELEMENTUPDATE", 500)
+
+        assert cache_manager.get("poll_form", 430131691) is None
+        assert cache_manager.get("educational_program", "Экономика") is not None
+
+    def test_unknown_event_ignored(self, client, mock_bitrix_client):
+        response = self._send(client, "ONCRMCOMPANYADD", 1)
+        assert response.status_code == 200
+        assert response.json()["status"] == "ignored"
+        mock_bitrix_client.assert_not_called()
+
+
 # ==================== Запуск тестов ====================
 
 if __name__ == "__main__":
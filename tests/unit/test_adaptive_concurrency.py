@@ -0,0 +1,120 @@
+"""
+Юнит-тесты адаптивного лимита одновременных запросов к Bitrix24
+"""
+
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from app.services.bitrix24_client import Bitrix24Client
+from app.utils.rate_limit import AdaptiveConcurrencyLimiter
+
+
+@pytest.fixture
+def limiter():
+    limiter = AdaptiveConcurrencyLimiter(initial=4, min_limit=1, max_limit=8)
+    limiter.DECREASE_COOLDOWN = 0
+    return limiter
+
+
+def complete(limiter, latency, outcome="ok", times=1, method="", commands=1):
+    for _ in range(times):
+        limiter.acquire()
+        limiter.release(latency, outcome, method, commands)
+
+
+def complete_saturated(limiter, latency, times):
+    """Завершать запросы, пока все слоты лимита заняты"""
+    for _ in range(times):
+        while limiter.in_flight < int(limiter.limit):
+            limiter.acquire()
+        limiter.release(latency, "ok")
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Тесты AIMD лимита"""
+
+    def test_additive_increase_when_saturated(self, limiter):
+        """Стабильная задержка при исчерпанном лимите - лимит растет до максимума"""
+        complete_saturated(limiter, 0.1, times=4)
+        assert limiter.limit == pytest.approx(5.0, abs=0.1)
+
+        complete_saturated(limiter, 0.1, times=200)
+        assert limiter.limit == 8
+
+    def test_no_increase_when_unsaturated(self, limiter):
+        """Без нагрузки лимит не дрейфует к максимуму"""
+        complete(limiter, 0.1, times=200)
+        assert limiter.limit == 4
+
+    def test_baseline_per_method(self, limiter):
+        """Медленный batch не снижает лимит, настроенный по быстрым *.get"""
+        complete(limiter, 0.1, method="crm.contact.get", times=10)
+        complete(limiter, 2.5, method="batch", commands=50, times=5)
+        complete(limiter, 1.0, method="batch", commands=10, times=5)
+        complete(limiter, 0.1, method="crm.contact.get", times=5)
+        assert limiter.limit == 4
+
+        assert limiter.baselines["crm.contact.get"] == pytest.approx(0.1)
+        assert limiter.baselines["batch"] == pytest.approx(0.05, rel=0.1)
+
+        complete(limiter, 10.0, method="batch", commands=50)
+        assert limiter.limit == pytest.approx(4 * limiter.LATENCY_DECREASE)
+
+    def test_throttle_cuts_limit(self, limiter):
+        """QUERY_LIMIT_EXCEEDED / 503 - мультипликативное снижение до минимума"""
+        complete(limiter, 0.1, "throttled")
+        assert limiter.limit == 2
+
+        complete(limiter, 0.1, "throttled", times=5)
+        assert limiter.limit == 1
+
+    def test_latency_inflation_cuts_limit(self, limiter):
+        """Задержка выше baseline * tolerance снижает лимит, прочие ошибки - нет"""
+        complete(limiter, 0.1)
+        before = limiter.limit
+
+        complete(limiter, 0.5)
+        assert limiter.limit == pytest.approx(before * limiter.LATENCY_DECREASE)
+
+        complete(limiter, 5.0, "error")
+        assert limiter.limit == pytest.approx(before * limiter.LATENCY_DECREASE)
+
+    def test_cooldown(self):
+        """Волна ошибок в пределах cooldown снижает лимит один раз"""
+        limiter = AdaptiveConcurrencyLimiter(initial=8, min_limit=1, max_limit=8)
+        complete(limiter, 0.1, "throttled", times=3)
+        assert limiter.limit == 4
+
+
+class TestClientSignals:
+    """Классификация ответов Bitrix24 в клиенте"""
+
+    @pytest.mark.parametrize(
+        "response, outcome",
+        [
+            (httpx.Response(200, json={"result": True}), "ok"),
+            (httpx.Response(200, json={"error": "QUERY_LIMIT_EXCEEDED"}), "throttled"),
+            (httpx.Response(503, json={"error": "QUERY_LIMIT_EXCEEDED"}), "throttled"),
+            (httpx.Response(200, json={"error": "NOT_FOUND"}), "error"),
+        ],
+    )
+    def test_outcome(self, response, outcome):
+        client = Bitrix24Client()
+        response.request = httpx.Request("POST", "https://example.com/rest/crm.deal.add")
+        client.client = MagicMock(post=MagicMock(return_value=response))
+        limiter = MagicMock()
+
+        with (
+            patch("app.services.bitrix24_client.bitrix24_concurrency_limiter", limiter),
+            patch("app.services.bitrix24_client.bitrix24_rate_limiter"),
+            patch("app.utils.retry.time.sleep"),
+        ):
+            try:
+                client._send("crm.deal.add", {"fields": {}})
+            except Exception:
+                pass
+
+        assert limiter.acquire.called
+        assert {c.args[1] for c in limiter.release.call_args_list} == {outcome}
@@ -0,0 +1,85 @@
+"""
+Юнит-тесты admission control
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.admission import AdmissionController
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestAdmissionController:
+    """Тесты лимита одновременных запросов с очередью"""
+
+    def test_queue_handoff_fifo(self):
+        """Сверх лимита запросы ждут и получают слоты в порядке очереди"""
+        controller = AdmissionController("test_fifo", max_in_flight=1, max_queue=5, queue_timeout=1)
+        order = []
+
+        async def request(name: str, hold: float):
+            async with controller.slot():
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        async def scenario():
+            await asyncio.gather(request("a", 0.05), request("b", 0), request("c", 0))
+
+        run(scenario())
+
+        assert order == ["a", "b", "c"]
+        assert controller.in_flight == 0
+        assert controller.queued == 0
+
+    def test_queue_full_429(self):
+        """Заполненная очередь - сразу 429 с Retry-After"""
+        controller = AdmissionController("test_full", max_in_flight=1, max_queue=0, queue_timeout=1)
+
+        async def scenario():
+            await controller.acquire()
+            with pytest.raises(HTTPException) as exc_info:
+                await controller.acquire()
+            controller.release()
+            return exc_info.value
+
+        error = run(scenario())
+
+        assert error.status_code == 429
+        assert int(error.headers["Retry-After"]) >= 1
+        assert controller.in_flight == 0
+
+    def test_queue_timeout_503(self):
+        """Слот не освободился за дедлайн - 503, очередь очищается"""
+        controller = AdmissionController(
+            "test_timeout", max_in_flight=1, max_queue=5, queue_timeout=0.01
+        )
+
+        async def scenario():
+            await controller.acquire()
+            with pytest.raises(HTTPException) as exc_info:
+                await controller.acquire()
+            assert controller.queued == 0
+            controller.release()
+            return exc_info.value
+
+        assert run(scenario()).status_code == 503
+        assert controller.in_flight == 0
+
+    def test_release_once(self):
+        """Повторный вызов release_once не освобождает чужой слот"""
+        controller = AdmissionController("test_once", max_in_flight=2, max_queue=0, queue_timeout=1)
+
+        async def scenario():
+            await controller.acquire()
+            await controller.acquire()
+            release = controller.release_once()
+            release()
+            release()
+
+        run(scenario())
+        assert controller.in_flight == 1
@@ -0,0 +1,83 @@
+"""
+Юнит-тесты однопроходного разбора ответа из опросной формы
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.webhook import WebhookPayload
+from app.services.answer_extraction import (
+    STANDARD_FIELDS,
+    extract_answer,
+    parse_webhook_payload,
+    split_form_fields,
+)
+from app.services.field_mapping import FieldMappingPlan
+from app.services.integration_service import BitrixIntegrationService
+from tests.fixtures import FULL_WEBHOOK_PAYLOAD
+
+
+@pytest.fixture
+def payload():
+    data = json.loads(json.dumps(FULL_WEBHOOK_PAYLOAD))
+    data["data"]["question_7"] = {"choice": ["a", "b"], "comment": None}
+    data["data"]["empty_question"] = None
+    return parse_webhook_payload(json.dumps(data).encode())
+
+
+class TestAnswerExtraction:
+    """Тесты разбора ответа"""
+
+    def test_parse_matches_model_validate(self, payload):
+        """TypeAdapter.validate_json дает ту же модель, что и model_validate"""
+        expected = WebhookPayload.model_validate(json.loads(payload.model_dump_json()))
+        assert payload == expected
+
+        with pytest.raises(ValidationError):
+            parse_webhook_payload(b'{"data": {}}')
+        with pytest.raises(ValidationError):
+            parse_webhook_payload(b"not json")
+
+    def test_split_matches_model_dump(self, payload):
+        """Один проход по полям совпадает с model_dump(exclude_none=True)"""
+        dumped = payload.data.model_dump(exclude_none=True)
+
+        standard, additional = split_form_fields(payload.data)
+
+        assert standard == {k: v for k, v in dumped.items() if k in STANDARD_FIELDS}
+        assert additional == {k: v for k, v in dumped.items() if k not in STANDARD_FIELDS}
+        assert additional["question_7"] == {"choice": ["a", "b"], "comment": None}
+        assert "empty_question" not in additional
+
+    def test_extract_answer(self, payload):
+        """Комментарий и поля обогащения строятся один раз на ответ"""
+        answer = extract_answer(payload, FieldMappingPlan())
+
+        assert answer.programs == payload.data.educational_program_1
+        assert answer.enrich_fields["COMMENTS"] == answer.comment
+        assert json.loads(answer.comment)["additional_fields"] == answer.additional_fields
+
+    def test_comment_built_once_for_all_deals(self, payload):
+        """Сделки всех программ обогащаются одним и тем же набором полей"""
+        with patch("app.services.integration_service.bitrix24_client"):
+            service = BitrixIntegrationService()
+        programs = [{"ID": str(n), "NAME": f"Программа {n}"} for n in range(3)]
+
+        with (
+            patch.object(
+                service, "find_or_create_deal", side_effect=[(1, True), (2, True), (3, True)]
+            ),
+            patch(
+                "app.services.answer_extraction.build_deal_comment", return_value="{}"
+            ) as mock_comment,
+        ):
+            answer = service.extract_answer(payload)
+            service._process_program_deals(programs, 10, "7", payload, answer)
+
+        mock_comment.assert_called_once()
+        sent = [call.args[1] for call in service.client.update_deal.call_args_list]
+        assert len(sent) == 3
+        assert all(fields is answer.enrich_fields for fields in sent)
@@ -0,0 +1,75 @@
+"""
+Юнит-тесты ленивой инициализации приложения
+
+Импорт проверяется в отдельном процессе: в процессе pytest модули
+уже импортированы другими тестами.
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from app.utils.cache import CacheManager
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# Бюджет времени импорта приложения (секунды)
+IMPORT_TIME_BUDGET = 3.0
+
+
+def run_python(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+class TestBootstrap:
+    """Тесты ленивой инициализации"""
+
+    def test_import_has_no_side_effects(self):
+        """Импорт main не создает HTTP клиент, не читает справочники и не запускает потоки"""
+        output = run_python(
+            "import threading\n"
+            "import main\n"
+            "from app.services.bitrix24_client import bitrix24_client\n"
+            "from app.services.integration_service import integration_service\n"
+            "print(bitrix24_client._client is None,"
+            " integration_service.poll_names._state is not None,"
+            " 'field_mapping' in vars(integration_service),"
+            " threading.active_count())"
+        )
+
+        assert output == "True False False 1"
+
+    def test_import_time_budget(self):
+        """Импорт приложения укладывается в бюджет"""
+        output = run_python(
+            "import time\n"
+            "started = time.perf_counter()\n"
+            "import main\n"
+            "print(time.perf_counter() - started)"
+        )
+
+        assert float(output) < IMPORT_TIME_BUDGET
+
+    def test_cache_snapshot_roundtrip(self, tmp_path):
+        """Снимок кеша сохраняет только неистекшие сериализуемые записи"""
+        path = str(tmp_path / "cache.json")
+        cache = CacheManager()
+        cache.set("poll_form", 1, {"ID": "7"})
+        cache.set("poll_form", 2, object())
+        cache.set("contact", "a@example.com", 42, ttl=1)
+        cache._cache["contact:a@example.com"]["expires_at"] = time.time() - 1
+
+        assert cache.save_snapshot(path) == 1
+
+        restored = CacheManager()
+        assert restored.load_snapshot(path) == 1
+        assert restored.get("poll_form", 1) == {"ID": "7"}
@@ -0,0 +1,78 @@
+"""
+Юнит-тесты для буферизованной записи BufferedWriter
+
+Используют временную SQLite БД.
+"""
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.log import Log
+from app.services.buffered_writer import BufferedWriter, BufferFullError
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Фабрика сессий временной SQLite БД"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def count_logs(session_factory) -> int:
+    with session_factory() as db:
+        return db.execute(select(func.count()).select_from(Log)).scalar_one()
+
+
+class TestBufferedWriter:
+    """Тесты для BufferedWriter"""
+
+    def test_flush_writes_all_rows(self, session_factory):
+        """flush() синхронно записывает буфер пачками"""
+        writer = BufferedWriter(
+            Log, batch_size=3, flush_interval=60, session_factory=session_factory
+        )
+        for i in range(7):
+            writer.add({"message": f"line {i}"})
+
+        writer.stop()
+
+        assert writer.pending() == 0
+        assert count_logs(session_factory) == 7
+
+    def test_backpressure(self, session_factory):
+        """Заполненный буфер отклоняет запись по таймауту"""
+        writer = BufferedWriter(
+            Log, batch_size=100, flush_interval=60, max_pending=2, session_factory=session_factory
+        )
+        writer.add({"message": "a"})
+        writer.add({"message": "b"})
+
+        with pytest.raises(BufferFullError):
+            writer.add({"message": "c"}, timeout=0.05)
+
+        assert writer.flush() == 2
+        writer.add({"message": "c"}, timeout=0.05)
+        writer.stop()
+        assert count_logs(session_factory) == 3
+
+    def test_failed_write_requeues_rows(self, session_factory):
+        """Незаписанные строки возвращаются в буфер"""
+
+        def broken_factory():
+            raise RuntimeError("db down")
+
+        writer = BufferedWriter(
+            Log, batch_size=10, flush_interval=60, session_factory=broken_factory
+        )
+        writer.add({"message": "a"})
+
+        assert writer.flush() == 0
+        assert writer.pending() == 1
+
+        writer.session_factory = session_factory
+        writer.stop()
+        assert count_logs(session_factory) == 1
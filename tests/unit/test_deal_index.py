@@ -0,0 +1,93 @@
+"""
+Юнит-тесты для локального индекса сделок DealIndex
+
+Используют мок клиента Bitrix24, БД не требуется (persist=False).
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from app.services.deal_index import DealIndex
+
+PROGRAM_FIELD = "UF_CRM_1755626160"
+
+
+@pytest.fixture
+def client():
+    """Мок клиента Bitrix24"""
+    return MagicMock()
+
+
+@pytest.fixture
+def index(client):
+    """Индекс без хранения в БД"""
+    return DealIndex(client, PROGRAM_FIELD, persist=False)
+
+
+class TestDealIndex:
+    """Тесты для DealIndex"""
+
+    def test_put_and_get(self, index):
+        """Тест сохранения и поиска сделки"""
+        index.put(456, 101, 1001)
+        index.put(456, None, 1002)
+
+        assert index.get(456, 101) == 1001
+        assert index.get(456) == 1002
+        assert index.get(456, 102) is None
+
+    def test_remove_deal(self, index):
+        """Тест удаления всех записей сделки"""
+        index.put(456, 101, 1001)
+        index.put(457, 101, 1001)
+        index.put(456, 102, 1003)
+
+        assert index.remove_deal(1001) == 2
+        assert index.get(456, 101) is None
+        assert index.get(456, 102) == 1003
+
+    def test_reconcile_pages_by_date_modify(self, index, client):
+        """Тест сверки: обход страниц и сдвиг курсора DATE_MODIFY"""
+        client.get_deals.side_effect = [
+            {
+                "result": [
+                    {"ID": "1", "CONTACT_ID": "10", PROGRAM_FIELD: "101",
+                     "DATE_MODIFY": "2026-10-01T10:00:00+03:00"},
+                    {"ID": "2", "CONTACT_ID": "11", PROGRAM_FIELD: None,
+                     "DATE_MODIFY": "2026-10-01T11:00:00+03:00"},
+                ],
+                "next": 2,
+            },
+            {
+                "result": [
+                    {"ID": "3", "CONTACT_ID": "12", PROGRAM_FIELD: ["102", "103"],
+                     "DATE_MODIFY": "2026-10-02T09:00:00+03:00"},
+                ],
+            },
+        ]
+        index.cursor = "2026-09-30T00:00:00+03:00"
+
+        processed = index.reconcile()
+
+        assert processed == 3
+        assert index.get(10, 101) == 1
+        assert index.get(11) == 2
+        assert index.get(12, 102) == 3
+        assert index.get(12, 103) == 3
+        assert index.cursor == "2026-10-02T09:00:00+03:00"
+
+        first_call = client.get_deals.call_args_list[0].kwargs
+        assert first_call["filter"] == {">=DATE_MODIFY": "2026-09-30T00:00:00+03:00"}
+        assert client.get_deals.call_args_list[1].kwargs["start"] == 2
+
+    def test_reconcile_keeps_existing_entries(self, index, client):
+        """Тест что сверка не перезаписывает уже известные сделки"""
+        index.put(10, 101, 1)
+        client.get_deals.return_value = {
+            "result": [{"ID": "99", "CONTACT_ID": "10", PROGRAM_FIELD: "101",
+                        "DATE_MODIFY": "2026-10-03T00:00:00+03:00"}]
+        }
+
+        index.reconcile()
+
+        assert index.get(10, 101) == 1
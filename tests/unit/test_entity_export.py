@@ -0,0 +1,70 @@
+"""
+Юнит-тесты потоковой выгрузки сущностей Bitrix24
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.config import settings
+from app.services.entity_export import PAGE_SIZE, export_select, iter_export
+
+
+def make_client(total: int, fail_after: int = None):
+    """Мок клиента: сделки с ID 1..total, keyset по >ID"""
+    client = MagicMock()
+
+    def get_deals(filter, select, order, start):
+        after_id = filter[">ID"]
+        if fail_after is not None and after_id >= fail_after:
+            raise Exception("QUERY_LIMIT_EXCEEDED")
+        ids = range(after_id + 1, min(after_id + PAGE_SIZE, total) + 1)
+        return {"result": [{"ID": str(i), "TITLE": f"Сделка {i}"} for i in ids]}
+
+    client.get_deals.side_effect = get_deals
+    return client
+
+
+def read_export(*args, **kwargs):
+    return [json.loads(line) for line in b"".join(iter_export(*args, **kwargs)).splitlines()]
+
+
+@pytest.mark.parametrize("read_ahead", [True, False])
+def test_export_all_pages(read_ahead):
+    """Все сущности по порядку ID, курсор после каждой страницы"""
+    client = make_client(120)
+    with (
+        patch("app.services.entity_export.bitrix24_client", client),
+        patch.object(settings, "BITRIX_EXPORT_READ_AHEAD", read_ahead),
+    ):
+        lines = read_export("deals", {}, ["ID", "TITLE"])
+
+    entities = [line for line in lines if "_cursor" not in line]
+    assert [int(e["ID"]) for e in entities] == list(range(1, 121))
+    assert [line for line in lines if "_cursor" in line] == [
+        {"_cursor": 50},
+        {"_cursor": 100},
+        {"_cursor": 120},
+        {"_cursor": 120, "_complete": True},
+    ]
+
+    first_call = client.get_deals.call_args_list[0].kwargs
+    assert first_call["start"] == -1
+    assert first_call["order"] == {"ID": "ASC"}
+    assert first_call["filter"] == {">ID": 0}
+
+
+def test_export_resume_and_error():
+    """Ошибка Bitrix24 завершает поток строкой с курсором для продолжения"""
+    with patch("app.services.entity_export.bitrix24_client", make_client(200, fail_after=100)):
+        lines = read_export("deals", {}, ["ID"], cursor=50)
+
+    assert len([line for line in lines if "_cursor" not in line]) == 50
+    assert lines[-1] == {"_cursor": 100, "_error": "QUERY_LIMIT_EXCEEDED"}
+
+
+def test_export_select():
+    """ID всегда в select, без дублей"""
+    assert export_select("leads", ["TITLE", "ID"]) == ["ID", "TITLE"]
+    assert export_select("contacts")[0] == "ID"
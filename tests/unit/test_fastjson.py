@@ -0,0 +1,71 @@
+"""
+Юнит-тесты слоя быстрой сериализации JSON
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from app.utils import fastjson
+
+DATA = {
+    "cookies": {"roistat_visit": "8467460"},
+    "additional_fields": {"hse_school": "Школа «Экономики»", "items": [1, 2.5, None, True]},
+    "analytics": {"date": "2025-10-22", "empty": {}, "list": []},
+}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def backend(request):
+    """Проверяем обе реализации"""
+    if request.param == "stdlib":
+        with patch.object(fastjson, "orjson", None):
+            yield request.param
+    else:
+        if fastjson.orjson is None:
+            pytest.skip("orjson is not installed")
+        yield request.param
+
+
+class TestFastJSON:
+    """Тесты fastjson"""
+
+    def test_indent_matches_stdlib(self, backend):
+        """Комментарий сделки совпадает с json.dumps(indent=2, ensure_ascii=False)"""
+        assert fastjson.dumps_str(DATA, indent=True) == json.dumps(
+            DATA, ensure_ascii=False, indent=2
+        )
+
+    def test_compact_roundtrip(self, backend):
+        """Компактный вывод в UTF-8 и обратный разбор"""
+        encoded = fastjson.dumps(DATA)
+
+        assert isinstance(encoded, bytes)
+        assert "«Экономики»".encode() in encoded
+        assert b": " not in encoded
+        assert fastjson.loads(encoded) == DATA
+        assert fastjson.loads(encoded.decode()) == DATA
+
+    def test_dates_and_default(self, backend):
+        """datetime/date в ISO 8601, остальные типы через default"""
+        value = {"at": datetime(2025, 10, 22, 12, 30), "day": date(2025, 10, 22)}
+        assert fastjson.loads(fastjson.dumps(value)) == {
+            "at": "2025-10-22T12:30:00",
+            "day": "2025-10-22",
+        }
+
+        assert fastjson.loads(fastjson.dumps({"sum": Decimal("1.5")}, default=str)) == {
+            "sum": "1.5"
+        }
+        with pytest.raises(TypeError):
+            fastjson.dumps({"sum": Decimal("1.5")})
+
+    def test_response_render(self, backend):
+        """ORJSONResponse отдает тот же JSON, что и стандартный JSONResponse"""
+        response = fastjson.ORJSONResponse(DATA)
+
+        assert response.media_type == "application/json"
+        assert json.loads(response.body) == DATA
@@ -0,0 +1,91 @@
+"""
+Юнит-тесты для скомпилированного плана маппинга полей FieldMappingPlan
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from app.schemas.webhook import WebhookPayload
+from app.services.field_mapping import FieldMappingPlan
+from tests.fixtures import FULL_WEBHOOK_PAYLOAD
+
+MAPPING_PATH = Path(__file__).parent.parent.parent / "field_mapping.json"
+
+
+@pytest.fixture
+def mapping():
+    with open(MAPPING_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def analytics():
+    return WebhookPayload(**FULL_WEBHOOK_PAYLOAD).header_data.analytics
+
+
+class TestFieldMappingPlan:
+    """Тесты для FieldMappingPlan"""
+
+    def test_project_mapping_matches_defaults(self, mapping, analytics):
+        """План из field_mapping.json проекта совпадает с планом по умолчанию"""
+        plan = FieldMappingPlan(mapping)
+        default = FieldMappingPlan({})
+        values = {"firstname": "Иван", "email": "ivan@example.com", "telephone": "+7900"}
+
+        assert plan.poll_id_property == "PROPERTY_64"
+        assert plan.program_id_property == "PROPERTY_73"
+        assert plan.deal_program_field == "UF_CRM_1755626160"
+        assert plan.build_contact_fields(values, analytics) == default.build_contact_fields(
+            values, analytics
+        )
+        assert plan.build_enrich_fields(analytics, "{}") == default.build_enrich_fields(
+            analytics, "{}"
+        )
+
+    def test_build_contact_fields(self, mapping, analytics):
+        """Поля контакта: пустые строки для имени, мультиполя, UTM метки"""
+        fields = FieldMappingPlan(mapping).build_contact_fields(
+            {"email": "ivan@example.com"}, analytics
+        )
+
+        assert fields["NAME"] == ""
+        assert fields["SECOND_NAME"] == ""
+        assert fields["EMAIL"] == [{"VALUE": "ivan@example.com", "VALUE_TYPE": "WORK"}]
+        assert "PHONE" not in fields
+        assert fields["UTM_SOURCE"] == "yandex"
+        # Roistat - поле сделки, в контакт не попадает
+        assert "UF_CRM_1755626174" not in fields
+
+    def test_build_deal_and_enrich_fields(self, mapping, analytics):
+        """Поля сделки и обогащения"""
+        plan = FieldMappingPlan(mapping)
+
+        deal = plan.build_deal_fields(contact_id=5, program_id=101, poll_form_id=7)
+        assert deal == {
+            "TITLE": "Регистрация на опрос #7",
+            "CONTACT_IDS": [5],
+            "UF_CRM_1755626160": 101,
+        }
+
+        enrich = plan.build_enrich_fields(analytics, '{"a": 1}')
+        assert enrich["UF_CRM_1755626174"] == "8467460"
+        assert enrich["COMMENTS"] == '{"a": 1}'
+        assert plan.build_enrich_fields(None, "{}") == {"COMMENTS": "{}"}
+
+    def test_custom_field_codes(self, mapping, analytics):
+        """Коды полей берутся из маппинга без правок кода"""
+        form_mapping = mapping["poll_form_to_bitrix_mapping"]
+        form_mapping["deal_mapping"]["educational_program_1"]["bitrix_field"] = "UF_CRM_NEW"
+        form_mapping["analytics_mapping"]["roistat_visit"]["bitrix_field"] = "UF_CRM_ROISTAT"
+        mapping["bitrix24_entities"]["deals"]["custom_fields"]["UF_CRM_ROISTAT"] = {}
+        mapping["universal_lists"]["polls"]["fields"]["PROPERTY_99"] = mapping["universal_lists"][
+            "polls"
+        ]["fields"].pop("PROPERTY_64")
+
+        plan = FieldMappingPlan(mapping)
+
+        assert plan.poll_id_property == "PROPERTY_99"
+        assert plan.build_deal_fields(1, program_id=2)["UF_CRM_NEW"] == 2
+        assert plan.build_enrich_fields(analytics, "{}")["UF_CRM_ROISTAT"] == "8467460"
@@ -0,0 +1,58 @@
+"""
+Юнит-тесты фоновой проверки Bitrix24
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from app.services.bitrix24_client import Bitrix24Client
+from app.services.health import HealthMonitor
+from app.utils.lanes import Lane, current_lane
+
+
+class TestHealthMonitor:
+    """Тесты HealthMonitor"""
+
+    def test_probe_runs_in_health_lane(self):
+        lanes = []
+        client = MagicMock()
+        client.get_server_time.side_effect = lambda: lanes.append(current_lane.get())
+
+        HealthMonitor(client).probe()
+
+        assert lanes == [Lane.HEALTH]
+
+    def test_hung_probe_fails_liveness(self):
+        """Поток жив, но проверка не завершается дольше дедлайна - liveness false"""
+        release = threading.Event()
+        client = MagicMock()
+        client.get_server_time.side_effect = lambda: release.wait(5)
+        monitor = HealthMonitor(client, interval=60, liveness_deadline=0.05)
+
+        monitor.start()
+        try:
+            assert monitor.is_live()
+            time.sleep(0.1)
+            assert monitor._thread.is_alive()
+            assert not monitor.is_live()
+        finally:
+            release.set()
+            monitor.stop()
+
+    def test_probe_bypasses_shared_limiters(self):
+        """Проверка не ждет слот занятого адаптивного лимита и токен частоты"""
+        client = Bitrix24Client()
+        response = MagicMock(status_code=200, content=b'{"result": "2026-10-19T10:00:00+03:00"}')
+        client._client = MagicMock()
+        client._client.post.return_value = response
+
+        with (
+            patch("app.services.bitrix24_client.bitrix24_concurrency_limiter") as concurrency,
+            patch("app.services.bitrix24_client.bitrix24_rate_limiter") as rate,
+        ):
+            HealthMonitor(client).probe()
+
+        concurrency.acquire.assert_not_called()
+        rate.acquire.assert_not_called()
+        client._client.post.assert_called_once()
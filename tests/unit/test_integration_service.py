@@ -53,7 +53,8 @@ class TestBitrixIntegrationService:
         assert result["NAME"] == "Опрос абитуриентов 2023"
         mock_client.get_list_elements.assert_called_once_with(
             iblock_id=17,
-            filter={"=PROPERTY_64": "430131691"}
+            filter={"=PROPERTY_64": "430131691"},
+            select=["ID", "NAME", "CODE"]
         )
 
     def test_find_poll_form_not_found(self, service, mock_client):
@@ -193,6 +194,53 @@ class TestBitrixIntegrationService:
         mock_client.get_deals.assert_called_once()
         mock_client.create_deal.assert_called_once()
 
+    def test_find_deal_uses_local_index(self, service, mock_client):
+        """Тест что повторный поиск сделки берется из локального индекса"""
+        mock_client.get_deals.return_value = BITRIX_DEAL_RESPONSE
+
+        first = service.find_or_create_deal(contact_id=456, program_id=101, poll_form_id=123)
+        second = service.find_or_create_deal(contact_id=456, program_id=101, poll_form_id=123)
+
+        assert first == second == (1001, False)
+        mock_client.get_deals.assert_called_once()
+
+    def test_stale_index_hit_falls_back_to_search(self, service, mock_client):
+        """Сделка из индекса удалена: запись сбрасывается, сделка ищется заново в том же вызове"""
+        mock_client.get_deals.return_value = BITRIX_DEAL_RESPONSE
+
+        def update_deal(deal_id, fields):
+            if deal_id == 999:
+                raise Exception("Not found")
+            return BITRIX_UPDATE_DEAL_RESPONSE
+
+        mock_client.update_deal.side_effect = update_deal
+        service.deal_index.put(456, 101, 999)
+        payload = WebhookPayload(**FULL_WEBHOOK_PAYLOAD)
+
+        result = service._process_program_deal(
+            {"ID": "101", "NAME": "Цифровой юрист"}, 456, 123, payload,
+            service.extract_answer(payload)
+        )
+
+        assert result["deal_id"] == 1001
+        assert result["is_new"] is False
+        assert service.deal_index.get(456, 101) == 1001
+        assert mock_client.update_deal.call_count == 2
+
+    def test_stale_index_hit_without_program(self, service, mock_client):
+        """Общая сделка (без программы) из индекса удалена: поиск повторяется"""
+        mock_client.get_deals.return_value = BITRIX_DEAL_RESPONSE
+        mock_client.update_deal.side_effect = [Exception("Not found"), BITRIX_UPDATE_DEAL_RESPONSE]
+        service.deal_index.put(456, None, 999)
+        payload = WebhookPayload(**WEBHOOK_NO_PROGRAMS)
+
+        deal_id, is_new = service.find_and_enrich_deal(
+            456, None, 123, payload, service.extract_answer(payload)
+        )
+
+        assert (deal_id, is_new) == (1001, False)
+        assert service.deal_index.get(456) == 1001
+
     def test_create_deal_without_program(self, service, mock_client):
         """Тест создания сделки без образовательной программы"""
         mock_client.get_deals.return_value = BITRIX_EMPTY_RESPONSE
@@ -341,7 +389,10 @@ class TestBitrixIntegrationService:
             {"ID": "101", "NAME": "Цифровой юрист"},
             {"ID": "102", "NAME": "Античность"}
         ]
-        mock_deal.side_effect = [(1001, True), (1002, False)]
+        # Сделки обрабатываются параллельно - ответ зависит от программы, а не от порядка вызова
+        mock_deal.side_effect = lambda **kwargs: {101: (1001, True), 102: (1002, False)}[
+            kwargs["program_id"]
+        ]
         mock_enrich.return_value = True
 
         payload = WebhookPayload(**FULL_WEBHOOK_PAYLOAD)
@@ -369,6 +420,50 @@ class TestBitrixIntegrationService:
         assert mock_deal.call_count == 2
         assert mock_enrich.call_count == 2
 
+    @patch('app.services.integration_service.BitrixIntegrationService.find_poll_form')
+    @patch('app.services.integration_service.BitrixIntegrationService.find_or_create_contact')
+    @patch('app.services.integration_service.BitrixIntegrationService.find_educational_programs')
+    @patch('app.services.integration_service.BitrixIntegrationService.find_or_create_deal')
+    @patch('app.services.integration_service.BitrixIntegrationService.enrich_deal')
+    def test_process_webhook_partial_deal_failure(
+        self,
+        mock_enrich,
+        mock_deal,
+        mock_programs,
+        mock_contact,
+        mock_poll_form,
+        service
+    ):
+        """Тест что ошибки по отдельным программам собираются вместе"""
+        from app.services.integration_service import DealProcessingError
+
+        mock_poll_form.return_value = {"ID": "123"}
+        mock_contact.return_value = 456
+        mock_programs.return_value = [
+            {"ID": "101", "NAME": "Цифровой юрист"},
+            {"ID": "102", "NAME": "Античность"},
+            {"ID": "103", "NAME": "Философия"}
+        ]
+
+        def find_or_create_deal(**kwargs):
+            if kwargs["program_id"] == 102:
+                raise Exception("Не удалось создать сделку: timeout")
+            return kwargs["program_id"] * 10, True
+
+        mock_deal.side_effect = find_or_create_deal
+        mock_enrich.return_value = True
+
+        payload = WebhookPayload(**FULL_WEBHOOK_PAYLOAD)
+
+        with pytest.raises(DealProcessingError) as exc_info:
+            service.process_webhook(payload)
+
+        error = exc_info.value
+        assert [deal["deal_id"] for deal in error.deals] == [1010, 1030]
+        assert [name for name, _ in error.failures] == ["Античность"]
+        assert "Античность" in str(error)
+        assert mock_deal.call_count == 3
+
     @patch('app.services.integration_service.BitrixIntegrationService.find_poll_form')
     @patch('app.services.integration_service.BitrixIntegrationService.find_or_create_contact')
     @patch('app.services.integration_service.BitrixIntegrationService.find_or_create_deal')
@@ -0,0 +1,101 @@
+"""
+Юнит-тесты полос приоритета запросов к Bitrix24
+"""
+
+import threading
+import time
+
+from app.utils.lanes import Lane, WeightedFairQueue, bitrix_lane, current_lane
+from app.utils.rate_limit import AdaptiveConcurrencyLimiter
+
+WEIGHTS = {Lane.WEBHOOK: 8, Lane.POLL: 4, Lane.PROXY: 2, Lane.BACKGROUND: 1}
+
+
+class TestWeightedFairQueue:
+    """Тесты взвешенной справедливой очереди"""
+
+    def test_webhook_served_before_background(self):
+        """Запрос тяжелой полосы не задерживает ответ абитуриента"""
+        queue = WeightedFairQueue(WEIGHTS, starvation_timeout=60)
+        for _ in range(3):
+            queue.push(Lane.BACKGROUND)
+        queue.push(Lane.WEBHOOK)
+
+        assert queue.pop().lane == Lane.WEBHOOK
+        assert len(queue) == 3
+
+    def test_share_proportional_to_weight(self):
+        """При конкуренции полосы получают слоты пропорционально весам"""
+        queue = WeightedFairQueue(WEIGHTS, starvation_timeout=60)
+        for _ in range(16):
+            queue.push(Lane.WEBHOOK)
+            queue.push(Lane.BACKGROUND)
+
+        served = [queue.pop().lane for _ in range(9)]
+
+        assert served.count(Lane.WEBHOOK) == 8
+        assert served.count(Lane.BACKGROUND) == 1
+
+    def test_starving_request_promoted(self):
+        """Запрос, ждущий дольше таймаута, обслуживается вне очереди"""
+        queue = WeightedFairQueue(WEIGHTS, starvation_timeout=0)
+        queue.push(Lane.BACKGROUND)
+        queue.push(Lane.WEBHOOK)
+
+        assert queue.pop().lane == Lane.BACKGROUND
+
+    def test_empty_queue(self):
+        queue = WeightedFairQueue(WEIGHTS)
+        assert queue.pop() is None
+        assert len(queue) == 0
+
+
+class TestLaneContext:
+    """Тесты полосы текущего контекста"""
+
+    def test_default_lane_is_proxy(self):
+        assert current_lane.get() == Lane.PROXY
+
+    def test_bitrix_lane_restores_previous(self):
+        with bitrix_lane(Lane.BACKGROUND):
+            assert current_lane.get() == Lane.BACKGROUND
+        assert current_lane.get() == Lane.PROXY
+
+
+class TestLimiterLanes:
+    """Тесты передачи слотов лимитера по полосам"""
+
+    def test_released_slot_goes_to_higher_priority_lane(self):
+        """Освободившийся слот получает webhook, хотя background ждет дольше"""
+        limiter = AdaptiveConcurrencyLimiter(initial=1, min_limit=1, max_limit=1)
+        limiter._queue = WeightedFairQueue(WEIGHTS, starvation_timeout=60)
+        limiter.acquire(Lane.PROXY)
+        order = []
+
+        def worker(lane):
+            limiter.acquire(lane)
+            order.append(lane)
+            limiter.release(0.01, "error")
+
+        threads = []
+        for queued, lane in enumerate((Lane.BACKGROUND, Lane.BACKGROUND, Lane.WEBHOOK), 1):
+            thread = threading.Thread(target=worker, args=(lane,))
+            thread.start()
+            threads.append(thread)
+            while len(limiter._queue) < queued:
+                time.sleep(0.001)
+
+        limiter.release(0.01, "error")
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert order == [Lane.WEBHOOK, Lane.BACKGROUND, Lane.BACKGROUND]
+        assert limiter.in_flight == 0
+
+    def test_disabled_limiter_does_not_queue(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=1, min_limit=1, max_limit=1, enabled=False)
+        limiter.acquire(Lane.BACKGROUND)
+        limiter.acquire(Lane.BACKGROUND)
+
+        assert limiter.in_flight == 2
+        assert len(limiter._queue) == 0
@@ -0,0 +1,71 @@
+"""
+Юнит-тесты для бинарного индекса названий опросов PollNamesIndex
+"""
+
+import json
+import os
+
+import pytest
+
+from app.services.poll_names_index import DEFAULT_JSON_PATH, PollNamesIndex
+
+
+def write_names(path, records):
+    path.write_text(
+        json.dumps({"RECORDS": [{"poll_id": k, "title": v} for k, v in records.items()]}),
+        encoding="utf-8",
+    )
+
+
+@pytest.fixture
+def json_path(tmp_path):
+    path = tmp_path / "poll_id_names.json"
+    write_names(path, {30: "Третий", 10: "Первый «опрос»", 20: "Второй"})
+    return path
+
+
+class TestPollNamesIndex:
+    """Тесты для PollNamesIndex"""
+
+    def test_lookup_builds_index_lazily(self, json_path):
+        """Индекс собирается при первом поиске и находит записи"""
+        index = PollNamesIndex(json_path, refresh_interval=0)
+        assert not index.index_path.exists()
+
+        assert index.get(10) == "Первый «опрос»"
+        assert index.get(30) == "Третий"
+        assert index.get(25) is None
+        assert index.get(99) is None
+        assert len(index) == 3
+        assert index.index_path.exists()
+
+    def test_refresh_when_json_changes(self, json_path):
+        """Изменение JSON приводит к пересборке индекса"""
+        index = PollNamesIndex(json_path, refresh_interval=0)
+        assert index.get(40) is None
+
+        write_names(json_path, {40: "Новый"})
+        stat = os.stat(json_path)
+        os.utime(json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert index.get(40) == "Новый"
+        assert index.get(10) is None
+
+    def test_prebuilt_index_reused(self, json_path):
+        """Собранный заранее индекс используется другими экземплярами без пересборки"""
+        PollNamesIndex(json_path).get(10)
+        mtime = os.stat(json_path.with_suffix(".idx")).st_mtime_ns
+
+        assert PollNamesIndex(json_path).get(20) == "Второй"
+        assert os.stat(json_path.with_suffix(".idx")).st_mtime_ns == mtime
+
+    def test_matches_project_json(self, tmp_path):
+        """Индекс по poll_id_names.json проекта совпадает с исходными данными"""
+        with open(DEFAULT_JSON_PATH, encoding="utf-8") as f:
+            records = {r["poll_id"]: r["title"] for r in json.load(f)["RECORDS"]}
+
+        index = PollNamesIndex(DEFAULT_JSON_PATH, index_path=tmp_path / "names.idx")
+
+        assert len(index) == len(records)
+        for poll_id in list(records)[:: max(1, len(records) // 50)]:
+            assert index.get(poll_id) == records[poll_id]
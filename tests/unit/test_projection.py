@@ -0,0 +1,44 @@
+"""
+Юнит-тесты проекций полей Bitrix24
+"""
+
+from unittest.mock import patch
+
+from app.services.integration_service import BitrixIntegrationService
+from app.services.projection import EDUCATIONAL_PROGRAM, POLL_FORM, Projection, parse_fields
+
+
+class TestProjection:
+    """Тесты проекций"""
+
+    def test_select_and_apply(self):
+        """select без повторов, apply оставляет только объявленные поля"""
+        projection = Projection(("ID", "NAME"))
+
+        assert projection.select("PROPERTY_64", "ID") == ["ID", "NAME", "PROPERTY_64"]
+        assert projection.apply({"ID": "1", "NAME": "A", "PROPERTY_73": {"1": "x"}}) == {
+            "ID": "1",
+            "NAME": "A",
+        }
+
+    def test_parse_fields(self):
+        """Параметр fields= прокси эндпоинтов"""
+        assert parse_fields(None) is None
+        assert parse_fields(" , ") is None
+        assert parse_fields("ID, TITLE,ID,UF_CRM_1") == ["ID", "TITLE", "UF_CRM_1"]
+
+    def test_poll_form_and_programs_use_select(self):
+        """Поиск опросной формы и программ запрашивает и кеширует только нужные поля"""
+        with patch("app.services.integration_service.bitrix24_client") as client:
+            service = BitrixIntegrationService()
+        client.get_list_elements.return_value = {
+            "result": [{"ID": "5", "NAME": "Форма", "CODE": "77", "PROPERTY_64": {"9": "77"}}]
+        }
+
+        with patch("app.services.integration_service.settings.CACHE_ENABLED", False):
+            poll_form = service.find_poll_form(77)
+            service.find_educational_programs(["Форма"])
+
+        assert poll_form == {"ID": "5", "NAME": "Форма", "CODE": "77"}
+        selects = [c.kwargs["select"] for c in client.get_list_elements.call_args_list]
+        assert selects == [POLL_FORM.select(), EDUCATIONAL_PROGRAM.select()]
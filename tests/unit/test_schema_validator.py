@@ -0,0 +1,131 @@
+"""
+Юнит-тесты локальной проверки полей по схемам Bitrix24
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.schemas.webhook import WebhookPayload
+from app.services.bitrix24_client import Bitrix24Client
+from app.services.field_mapping import FieldMappingPlan
+from app.services.schema_validator import SchemaRegistry, SchemaValidationError
+from app.utils.cache import cache_manager
+from tests.fixtures import FULL_WEBHOOK_PAYLOAD
+
+
+@pytest.fixture
+def registry():
+    return SchemaRegistry()
+
+
+class TestSchemaValidation:
+    """Тесты проверки и приведения полей"""
+
+    def test_service_payloads_are_valid(self, registry):
+        """Поля, которые строит сервис, проходят проверку без изменений"""
+        plan = FieldMappingPlan()
+        analytics = WebhookPayload(**FULL_WEBHOOK_PAYLOAD).header_data.analytics
+        contact = plan.build_contact_fields({"email": "a@example.com"}, analytics)
+        deal = plan.build_deal_fields(contact_id=5, program_id=101, poll_form_id=7)
+        enrich = plan.build_enrich_fields(analytics, "{}")
+
+        assert registry.get("contact").validate(contact) == contact
+        assert registry.get("deal").validate(deal) == deal
+        assert registry.get("deal").validate(enrich, partial=True) == enrich
+
+    def test_coercion(self, registry):
+        """Значения приводятся к типам полей"""
+        fields = registry.get("deal").validate(
+            {
+                "TITLE": 42,
+                "OPPORTUNITY": "1500,50",
+                "CONTACT_IDS": 5,
+                "OPENED": True,
+                "ID": 1,
+            },
+            partial=True,
+        )
+
+        assert fields == {"TITLE": "42", "OPPORTUNITY": 1500.5, "CONTACT_IDS": [5], "OPENED": "Y"}
+
+        contact = registry.get("contact").validate(
+            {"NAME": "", "LAST_NAME": "", "SECOND_NAME": "", "EMAIL": "a@example.com"}
+        )
+        assert contact["EMAIL"] == [{"VALUE": "a@example.com", "VALUE_TYPE": "WORK"}]
+
+    def test_errors(self, registry):
+        """Неизвестные UF поля, неверные типы и отсутствие обязательных полей"""
+        with pytest.raises(SchemaValidationError) as exc_info:
+            registry.get("contact").validate(
+                {"NAME": {"first": "Иван"}, "UF_CRM_UNKNOWN": 1, "EMAIL": [42]}
+            )
+
+        errors = exc_info.value.errors
+        assert any(e.startswith("NAME:") for e in errors)
+        assert any(e.startswith("UF_CRM_UNKNOWN:") for e in errors)
+        assert any(e.startswith("EMAIL:") for e in errors)
+        assert "LAST_NAME: обязательное поле" in errors
+
+        # При обновлении обязательные поля не требуются
+        assert registry.get("contact").validate({"NAME": "Иван"}, partial=True) == {"NAME": "Иван"}
+
+    def test_list_element(self, registry):
+        """Элемент универсального списка: схема по IBLOCK_ID, служебные ключи как есть"""
+        params = registry.validate_command(
+            "lists.element.add",
+            {
+                "IBLOCK_ID": 17,
+                "FIELDS": {
+                    "NAME": "Опрос",
+                    "CODE": "1",
+                    "PROPERTY_64": 1,
+                    "PROPERTY_65": "https://portal.hse.ru/1",
+                    "PROPERTY_66": 0,
+                },
+            },
+        )
+        assert params["FIELDS"]["PROPERTY_64"] == "1"
+        assert params["FIELDS"]["CODE"] == "1"
+
+        with pytest.raises(SchemaValidationError):
+            registry.validate_command(
+                "lists.element.add", {"IBLOCK_ID": 17, "FIELDS": {"NAME": "Опрос"}}
+            )
+
+        # Для списка без схемы проверка не выполняется
+        params = {"IBLOCK_ID": 99, "FIELDS": {"PROPERTY_1": "x"}}
+        assert registry.validate_command("lists.element.add", params) is params
+
+    def test_invalid_batch_command_not_sent(self):
+        """Невалидная команда batch отклоняется локально, остальные отправляются"""
+        client = Bitrix24Client()
+        commands = {
+            "bad": {"method": "crm.deal.add", "params": {"fields": {"UF_CRM_UNKNOWN": 1}}},
+            "good": {"method": "crm.deal.add", "params": {"fields": {"TITLE": "x"}}},
+        }
+
+        with patch.object(
+            client, "_make_request", return_value={"result": {"result": {"good": 1}}}
+        ) as mock_request:
+            results, errors = client.call_batch(commands)
+
+        assert results == {"good": 1}
+        assert "UF_CRM_UNKNOWN" in errors["bad"]
+        assert "bad" not in mock_request.call_args[0][1]["cmd"]
+
+    def test_live_refresh_is_cached(self, registry):
+        """Схема обновляется из *.fields и кешируется на SCHEMA_REFRESH_INTERVAL"""
+        live = {"TITLE": {"type": "string"}, "UF_CRM_NEW": {"type": "integer"}}
+        cache_manager.invalidate("bitrix_schema")
+
+        with (
+            patch("app.services.schema_validator.settings.SCHEMA_REFRESH_INTERVAL", 60),
+            patch.object(registry, "_fetch", return_value=live) as mock_fetch,
+        ):
+            schema = registry.get("deal")
+            assert schema.validate({"UF_CRM_NEW": "7"}) == {"UF_CRM_NEW": 7}
+            registry.get("deal")
+
+        mock_fetch.assert_called_once_with("deal")
+        cache_manager.invalidate("bitrix_schema")
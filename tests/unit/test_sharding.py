@@ -0,0 +1,231 @@
+"""
+Юнит-тесты упорядоченной обработки по email
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+from app.utils import sharding
+from app.utils.lanes import Lane, bitrix_lane, current_lane
+from app.utils.sharding import ShardedExecutor
+
+
+def keys_on_same_shard(executor):
+    """Два разных ключа, попадающие в один шард"""
+    first = "a@example.com"
+    for n in range(1000):
+        other = f"user{n}@example.com"
+        if executor.shard_for(other) == executor.shard_for(first):
+            return first, other
+    raise AssertionError("no keys on one shard")
+
+
+def start_queued(executor, key, target, *args):
+    """Запустить поток и дождаться, пока его задача встанет в очередь ключа"""
+    shard = executor._shards[executor.shard_for(key)]
+    depth = shard.depth()
+    thread = threading.Thread(target=target, args=args)
+    thread.start()
+    while shard.depth() == depth:
+        time.sleep(0.001)
+    return thread
+
+
+class TestShardedExecutor:
+    """Тесты ShardedExecutor"""
+
+    def test_same_key_processed_in_order(self):
+        """Задачи одного ключа выполняются последовательно в порядке поступления"""
+        executor = ShardedExecutor("test", 4)
+        order = []
+        running = []
+
+        def task(n):
+            running.append(n)
+            assert len(running) == 1
+            time.sleep(0.001)
+            order.append(n)
+            running.remove(n)
+
+        with executor.hold(["a@example.com"]):
+            threads = [
+                start_queued(executor, "a@example.com", executor.call, ["a@example.com"], task, n)
+                for n in range(10)
+            ]
+            assert order == []
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert order == list(range(10))
+
+    def test_other_key_on_same_shard_not_blocked(self):
+        """Занятый ключ не задерживает другой ключ того же шарда"""
+        executor = ShardedExecutor("test", 1)
+        blocked, other = keys_on_same_shard(executor)
+
+        with executor.hold([blocked]):
+            assert executor.call([other], lambda: "done") == "done"
+
+    def test_concurrency_not_capped_by_shards(self):
+        """Один шард не ограничивает число одновременно выполняемых задач"""
+        executor = ShardedExecutor("test", 1)
+        barrier = threading.Barrier(8, timeout=5)
+        threads = [
+            threading.Thread(target=executor.call, args=([f"user{n}@example.com"], barrier.wait))
+            for n in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert not barrier.broken
+
+    def test_bulk_holds_only_its_keys(self):
+        """Пакет задерживает одиночные задачи своих email и не задерживает чужие"""
+        executor = ShardedExecutor("test", 2)
+        release = threading.Event()
+        order = []
+
+        def bulk():
+            order.append("bulk-start")
+            release.wait(5)
+            order.append("bulk-end")
+
+        bulk_thread = start_queued(
+            executor, "a@example.com", executor.call, ["a@example.com", "b@example.com"], bulk
+        )
+        while "bulk-start" not in order:
+            time.sleep(0.001)
+
+        assert executor.call(["c@example.com"], lambda: "free") == "free"
+        live = start_queued(
+            executor, "b@example.com", executor.call, ["b@example.com"], order.append, "live"
+        )
+        assert "live" not in order
+
+        release.set()
+        bulk_thread.join(timeout=5)
+        live.join(timeout=5)
+        assert order == ["bulk-start", "bulk-end", "live"]
+
+    def test_overlapping_key_sets_do_not_deadlock(self):
+        """Пересекающиеся наборы ключей из многих потоков завершаются"""
+        executor = ShardedExecutor("test", 3)
+        keys = [f"user{n}@example.com" for n in range(6)]
+        done = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(50):
+                executor.call(rng.sample(keys, rng.randint(1, 4)), lambda: None)
+            done.append(seed)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        assert sorted(done) == list(range(8))
+        assert all(shard.depth() == 0 for shard in executor._shards)
+
+    def test_exception_releases_key(self):
+        executor = ShardedExecutor("test", 2)
+
+        def fail():
+            raise ValueError("boom")
+
+        try:
+            executor.call(["a@example.com"], fail)
+        except ValueError as e:
+            assert str(e) == "boom"
+        else:
+            raise AssertionError("exception expected")
+
+        assert executor.call(["a@example.com"], lambda: 1) == 1
+
+    def test_shard_is_stable(self):
+        executor = ShardedExecutor("test", 8)
+        assert executor.shard_for("a@example.com") == executor.shard_for("a@example.com")
+        assert 0 <= executor.shard_for("a@example.com") < 8
+
+    def test_run_carries_context(self):
+        """Полоса Bitrix24 вызывающего переносится в поток пула"""
+        executor = ShardedExecutor("test", 2)
+
+        async def run():
+            with bitrix_lane(Lane.WEBHOOK):
+                return await executor.run("a@example.com", current_lane.get)
+
+        assert asyncio.run(run()) == Lane.WEBHOOK
+
+    def test_run_keeps_arrival_order(self, monkeypatch):
+        """Порядок задач ключа - порядок вызовов run, даже если пул запустит их в обратном"""
+        executor = ShardedExecutor("test", 2)
+        order = []
+        calls = []
+        threadpool = sharding.run_in_threadpool
+
+        async def reversed_threadpool(func, *args):
+            calls.append(func)
+            if len(calls) == 1:
+                await asyncio.sleep(0.05)
+            return await threadpool(func, *args)
+
+        monkeypatch.setattr(sharding, "run_in_threadpool", reversed_threadpool)
+
+        async def run():
+            await asyncio.gather(
+                executor.run("a@example.com", order.append, 1),
+                executor.run("a@example.com", order.append, 2),
+            )
+
+        asyncio.run(run())
+
+        assert order == [1, 2]
+        assert executor._shards[executor.shard_for("a@example.com")].depth() == 0
+
+    def test_run_cancelled_before_start_releases_key(self, monkeypatch):
+        """Отмена до запуска в пуле потоков освобождает место в очереди ключа"""
+        executor = ShardedExecutor("test", 2)
+
+        async def never_started(func, *args):
+            await asyncio.sleep(10)
+
+        monkeypatch.setattr(sharding, "run_in_threadpool", never_started)
+
+        async def run():
+            task = asyncio.ensure_future(executor.run("a@example.com", lambda: None))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+
+        assert executor._shards[executor.shard_for("a@example.com")].depth() == 0
+        assert executor.call(["a@example.com"], lambda: 1) == 1
+
+    def test_disabled_runs_directly(self):
+        executor = ShardedExecutor("test", 0)
+        with executor.hold(["a@example.com"]):
+            assert executor.call(["a@example.com"], lambda: 2) == 2
+        assert asyncio.run(executor.run(None, lambda: 3)) == 3
+
+    def test_lag_and_depth(self):
+        """Лаг шарда - возраст самой старой задачи, ожидающей ключ"""
+        executor = ShardedExecutor("test", 1)
+        shard = executor._shards[0]
+
+        with executor.hold(["a"]):
+            waiting = start_queued(executor, "a", executor.call, ["a"], lambda: None)
+            time.sleep(0.02)
+
+            assert shard.depth() == 2
+            assert shard.lag() >= 0.02
+
+        waiting.join(timeout=5)
+        assert shard.depth() == 0
+        assert shard.lag() == 0.0
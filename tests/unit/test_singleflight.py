@@ -0,0 +1,128 @@
+"""
+Юнит-тесты объединения одинаковых параллельных запросов
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from app.services.bitrix24_client import Bitrix24Client, request_fingerprint
+from app.utils.singleflight import SingleFlight
+
+
+def run_concurrently(group: SingleFlight, calls: int, func, key="key"):
+    """calls параллельных вызовов; func не завершается, пока все не присоединились"""
+    release = threading.Event()
+
+    def leader_func():
+        release.wait(5)
+        return func()
+
+    with ThreadPoolExecutor(calls) as pool:
+        futures = [pool.submit(group.do, key, leader_func) for _ in range(calls)]
+        deadline = time.monotonic() + 5
+        while group.shared < calls - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        return [f.exception() or f.result() for f in futures]
+
+
+class TestSingleFlight:
+    """Тесты SingleFlight"""
+
+    def test_concurrent_calls_share_result(self):
+        """Один вызов функции, каждый получает свою копию результата"""
+        group = SingleFlight("test_share")
+        executed = []
+
+        results = run_concurrently(group, 8, lambda: executed.append(1) or {"result": [1]})
+
+        assert len(executed) == 1
+        assert all(r == {"result": [1]} for r in results)
+        assert len({id(r) for r in results}) == 8
+        assert group.coalesced_ratio() == pytest.approx(7 / 8)
+        assert group.in_flight() == 0
+
+    def test_error_shared_and_key_released(self):
+        """Исключение получают все ожидающие, следующий вызов выполняется заново"""
+        group = SingleFlight("test_error")
+
+        def fail():
+            raise RuntimeError("boom")
+
+        results = run_concurrently(group, 4, fail)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert group.do("key", lambda: "ok") == "ok"
+
+
+class TestClientCoalescing:
+    """Объединение запросов в Bitrix24Client"""
+
+    def test_reads_coalesced_writes_not(self):
+        """Одинаковые crm.contact.get делят запрос, update выполняется каждый раз"""
+        client = Bitrix24Client()
+        release = threading.Event()
+        calls = []
+
+        def send(method, params=None):
+            calls.append(method)
+            if method == "crm.contact.get":
+                release.wait(5)
+            return {"result": {"ID": "1"}}
+
+        with patch.object(client, "_send", side_effect=send):
+            with ThreadPoolExecutor(5) as pool:
+                futures = [pool.submit(client.get_contact, 1) for _ in range(5)]
+                deadline = time.monotonic() + 5
+                while client._reads.shared < 4 and time.monotonic() < deadline:
+                    time.sleep(0.001)
+                release.set()
+                assert all(f.result() == {"result": {"ID": "1"}} for f in futures)
+
+            client._make_request("crm.contact.update", {"id": 1, "fields": {}})
+            client._make_request("crm.contact.update", {"id": 1, "fields": {}})
+
+        assert calls.count("crm.contact.get") == 1
+        assert calls.count("crm.contact.update") == 2
+
+    def test_read_after_write_not_coalesced_with_earlier_read(self):
+        """Чтение после записи не получает ответ чтения, начатого до записи"""
+        client = Bitrix24Client()
+        release = threading.Event()
+        elements = []
+
+        def send(method, params=None):
+            if method == "lists.element.add":
+                elements.append({"ID": "7"})
+                return {"result": 7}
+            snapshot = list(elements)
+            if not snapshot:
+                # Поиск до создания: отвечает после записи, но с данными до нее
+                release.wait(5)
+            return {"result": snapshot}
+
+        params = {"IBLOCK_TYPE_ID": "lists", "IBLOCK_ID": 17, "FILTER": {"=CODE": "1"}}
+        with patch.object(client, "_send", side_effect=send):
+            with ThreadPoolExecutor(1) as pool:
+                early = pool.submit(client._make_request, "lists.element.get", params)
+                while client._reads.in_flight() == 0:
+                    time.sleep(0.001)
+
+                client._make_request("lists.element.add", {"IBLOCK_ID": 17})
+                after_write = client._make_request("lists.element.get", params)
+
+                release.set()
+                assert early.result(timeout=5) == {"result": []}
+
+        assert after_write == {"result": [{"ID": "7"}]}
+        assert client._reads.shared == 0
+
+    def test_fingerprint_canonical(self):
+        """Порядок ключей параметров не влияет на отпечаток"""
+        assert request_fingerprint("crm.deal.list", {"a": 1, "b": {"y": 2, "x": 1}}) == (
+            request_fingerprint("crm.deal.list", {"b": {"x": 1, "y": 2}, "a": 1})
+        )
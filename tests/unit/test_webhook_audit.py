@@ -0,0 +1,108 @@
+"""
+Юнит-тесты для журнала обработки ответов WebhookAuditStore
+
+Используют временную SQLite БД.
+"""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, utcnow
+from app.models.webhook_audit import WebhookAudit
+from app.schemas.webhook import WebhookPayload
+from app.services.buffered_writer import BufferedWriter
+from app.services.webhook_audit import WebhookAuditStore, hash_email
+from app.utils.tracing import CallTrace, current_trace, record_bitrix_call
+from tests.fixtures import FULL_WEBHOOK_PAYLOAD
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Фабрика сессий временной SQLite БД"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def store(session_factory):
+    """Журнал с буфером без фоновой записи по таймеру"""
+    writer = BufferedWriter(WebhookAudit, flush_interval=60, session_factory=session_factory)
+    yield WebhookAuditStore(writer=writer, session_factory=session_factory)
+    writer.stop()
+
+
+@pytest.fixture
+def payload():
+    return WebhookPayload(**FULL_WEBHOOK_PAYLOAD)
+
+
+def all_rows(session_factory):
+    with session_factory() as db:
+        return db.execute(select(WebhookAudit).order_by(WebhookAudit.id)).scalars().all()
+
+
+class TestWebhookAudit:
+    """Тесты для WebhookAuditStore"""
+
+    def test_record_success_with_trace(self, store, session_factory, payload):
+        """Успешная обработка: фиксированные колонки и детали трассы"""
+        trace = CallTrace()
+        token = current_trace.set(trace)
+        record_bitrix_call("crm.contact.list")
+        record_bitrix_call("crm.deal.add")
+        current_trace.reset(token)
+        trace.mark("contact")
+
+        result = {
+            "poll_form_id": "7",
+            "contact_id": 42,
+            "deals": [{"deal_id": 100, "program_id": 5, "is_new": True}],
+        }
+        store.record(payload, result=result, trace=trace)
+        store.writer.flush()
+
+        (row,) = all_rows(session_factory)
+        assert row.answer_id == payload.header_data.answer_id
+        assert row.poll_id == payload.header_data.poll_id
+        assert row.email_hash == hash_email(payload.data.email.upper())
+        assert row.status == "success"
+        assert row.contact_id == 42
+        assert row.deals_count == 1
+        assert row.bitrix_calls == 2
+        assert row.details["calls"] == {"crm.contact.list": 1, "crm.deal.add": 1}
+        assert "contact" in row.details["stages"]
+
+    def test_record_error(self, store, session_factory, payload):
+        """Ошибка обработки сохраняется в журнал"""
+        store.record(payload, result={"contact_id": 42}, error=Exception("boom"), source="bulk")
+        store.writer.flush()
+
+        (row,) = all_rows(session_factory)
+        assert row.status == "error"
+        assert row.error == "boom"
+        assert row.source == "bulk"
+        assert row.bitrix_calls is None
+
+    def test_purge_in_chunks(self, store, session_factory, payload, monkeypatch):
+        """Старые записи удаляются порциями, свежие остаются"""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "WEBHOOK_AUDIT_PURGE_CHUNK", 2)
+        for _ in range(5):
+            store.record(payload)
+        store.writer.flush()
+
+        cutoff = utcnow() - timedelta(days=1)
+        with session_factory() as db:
+            db.query(WebhookAudit).update({"created_at": cutoff - timedelta(days=1)})
+            db.commit()
+        store.record(payload)
+        store.writer.flush()
+
+        assert store.purge(before=cutoff) == 5
+        assert len(all_rows(session_factory)) == 1